@@ -110,6 +110,8 @@ CREATE TABLE campaign_stats.report (
 	previous_filepath text NULL, -- Путь/ссылка к файлу предыдущего отчёта
 	to_delete bool DEFAULT false NOT NULL, -- Флаг об удалении, выставляемый пользователем
 	content_report_filepath text NULL,
+	sections text NULL, -- Профиль пунктов docx-отчёта (full, text, draft или пункты через запятую)
+	s3_purged_at timestamp NULL, -- Дата-время удаления файлов удалённого отчёта из хранилища
 	CONSTRAINT chk_report_dates CHECK ((to_datetime > from_datetime)),
 	CONSTRAINT report_pkey PRIMARY KEY (id)
 );
@@ -122,6 +124,7 @@ CREATE INDEX idx_report_specification_purpose_id ON campaign_stats.report USING
 CREATE INDEX idx_report_status_id ON campaign_stats.report USING btree (status_id);
 CREATE INDEX idx_report_to_datetime ON campaign_stats.report USING btree (to_datetime);
 CREATE INDEX idx_report_user_id ON campaign_stats.report USING btree (user_id);
+CREATE INDEX idx_report_to_purge ON campaign_stats.report USING btree (id) WHERE (to_delete AND s3_purged_at IS NULL);
 COMMENT ON TABLE campaign_stats.report IS 'Таблица отчётов';
 
 -- Column comments
@@ -139,6 +142,8 @@ COMMENT ON COLUMN campaign_stats.report.to_datetime IS 'Дата-время ок
 COMMENT ON COLUMN campaign_stats.report.filepath IS 'Путь/ссылка к файлу отчёта';
 COMMENT ON COLUMN campaign_stats.report.previous_filepath IS 'Путь/ссылка к файлу предыдущего отчёта';
 COMMENT ON COLUMN campaign_stats.report.to_delete IS 'Флаг об удалении, выставляемый пользователем';
+COMMENT ON COLUMN campaign_stats.report.sections IS 'Профиль пунктов docx-отчёта (full, text, draft или пункты через запятую)';
+COMMENT ON COLUMN campaign_stats.report.s3_purged_at IS 'Дата-время удаления файлов удалённого отчёта из хранилища';
 
 
 -- campaign_stats.report внешние включи
@@ -147,6 +152,87 @@ ALTER TABLE campaign_stats.report ADD CONSTRAINT report_product_id_fkey FOREIGN
 ALTER TABLE campaign_stats.report ADD CONSTRAINT report_status_id_fkey FOREIGN KEY (status_id) REFERENCES campaign_stats.status(id);
 
 
+-- campaign_stats.worker_heartbeat определение
+
+-- Drop table
+
+-- DROP TABLE campaign_stats.worker_heartbeat;
+
+CREATE TABLE campaign_stats.worker_heartbeat (
+	replica_id text NOT NULL, -- Идентификатор реплики генератора docx-отчетов
+	heartbeat_at timestamp DEFAULT now() NOT NULL, -- Дата-время последней отметки о работе
+	CONSTRAINT worker_heartbeat_pkey PRIMARY KEY (replica_id)
+);
+COMMENT ON TABLE campaign_stats.worker_heartbeat IS 'Живые реплики генератора docx-отчетов (распределение отчетов по product_id)';
+
+-- Column comments
+
+COMMENT ON COLUMN campaign_stats.worker_heartbeat.replica_id IS 'Идентификатор реплики генератора docx-отчетов';
+COMMENT ON COLUMN campaign_stats.worker_heartbeat.heartbeat_at IS 'Дата-время последней отметки о работе';
+
+
+-- campaign_stats.report_usage определение
+
+-- Drop table
+
+-- DROP TABLE campaign_stats.report_usage;
+
+CREATE TABLE campaign_stats.report_usage (
+	id int8 GENERATED ALWAYS AS IDENTITY( INCREMENT BY 1 MINVALUE 1 MAXVALUE 9223372036854775807 START 1 CACHE 1 NO CYCLE) NOT NULL, -- Уникальный идентификатор
+	report_id int8 NOT NULL, -- Айди отчёта
+	product_id int4 NULL, -- Айди продукта
+	replica_id text NULL, -- Идентификатор реплики генератора docx-отчетов
+	created_at timestamp DEFAULT now() NOT NULL, -- Дата-время обработки
+	profile text NULL, -- Профиль пунктов docx-отчёта
+	success bool NOT NULL, -- Отчёт сформирован и отправлен в хранилище
+	fetch_seconds float8 NULL, -- Время загрузки входных данных, сек
+	render_seconds float8 NULL, -- Время формирования docx-файла, сек
+	upload_seconds float8 NULL, -- Время отправки docx-файла в хранилище, сек
+	total_seconds float8 NULL, -- Общее время обработки, сек
+	cpu_seconds float8 NULL, -- Процессорное время, сек
+	peak_rss_bytes int8 NULL, -- Пиковый объём памяти (RSS) процесса при формировании, байт
+	input_bytes int8 NULL, -- Объём входных данных, байт
+	input_rows int8 NULL, -- Количество строк входных данных
+	action_rows int4 NULL, -- Количество строк текущей РК (действий)
+	chart_count int4 NULL, -- Количество диаграмм
+	output_bytes int8 NULL, -- Размер docx-файла, байт
+	overrun_seconds float8 NULL, -- Превышение ограничения времени формирования (REPORT_DEADLINE), сек
+	degraded_sections int4 NULL, -- Количество пунктов, упрощённых или пропущенных из-за нехватки времени
+	CONSTRAINT report_usage_pkey PRIMARY KEY (id)
+);
+CREATE INDEX idx_report_usage_created_at ON campaign_stats.report_usage USING btree (created_at);
+CREATE INDEX idx_report_usage_report_id ON campaign_stats.report_usage USING btree (report_id);
+COMMENT ON TABLE campaign_stats.report_usage IS 'Затраты ресурсов на обработку отчётов (одна запись на каждую обработку)';
+
+-- Column comments
+
+COMMENT ON COLUMN campaign_stats.report_usage.id IS 'Уникальный идентификатор';
+COMMENT ON COLUMN campaign_stats.report_usage.report_id IS 'Айди отчёта';
+COMMENT ON COLUMN campaign_stats.report_usage.product_id IS 'Айди продукта';
+COMMENT ON COLUMN campaign_stats.report_usage.replica_id IS 'Идентификатор реплики генератора docx-отчетов';
+COMMENT ON COLUMN campaign_stats.report_usage.created_at IS 'Дата-время обработки';
+COMMENT ON COLUMN campaign_stats.report_usage.profile IS 'Профиль пунктов docx-отчёта';
+COMMENT ON COLUMN campaign_stats.report_usage.success IS 'Отчёт сформирован и отправлен в хранилище';
+COMMENT ON COLUMN campaign_stats.report_usage.fetch_seconds IS 'Время загрузки входных данных, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.render_seconds IS 'Время формирования docx-файла, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.upload_seconds IS 'Время отправки docx-файла в хранилище, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.total_seconds IS 'Общее время обработки, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.cpu_seconds IS 'Процессорное время, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.peak_rss_bytes IS 'Пиковый объём памяти (RSS) процесса при формировании, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.input_bytes IS 'Объём входных данных, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.input_rows IS 'Количество строк входных данных';
+COMMENT ON COLUMN campaign_stats.report_usage.action_rows IS 'Количество строк текущей РК (действий)';
+COMMENT ON COLUMN campaign_stats.report_usage.chart_count IS 'Количество диаграмм';
+COMMENT ON COLUMN campaign_stats.report_usage.output_bytes IS 'Размер docx-файла, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.overrun_seconds IS 'Превышение ограничения времени формирования (REPORT_DEADLINE), сек';
+COMMENT ON COLUMN campaign_stats.report_usage.degraded_sections IS 'Количество пунктов, упрощённых или пропущенных из-за нехватки времени';
+
+
+-- campaign_stats.report_usage внешние включи
+
+ALTER TABLE campaign_stats.report_usage ADD CONSTRAINT report_usage_report_id_fkey FOREIGN KEY (report_id) REFERENCES campaign_stats.report(id) ON DELETE CASCADE;
+
+
 -- заполнение campaign_stats.status --
 INSERT INTO campaign_stats.status
 (id, "name", description)
@@ -166,6 +252,9 @@ VALUES(5, 'completed', 'Завершен успешно');
 INSERT INTO campaign_stats.status
 (id, "name", description)
 VALUES(2, 'stage 1 ready', 'Готов к формированию docx-отчета');
+INSERT INTO campaign_stats.status
+(id, "name", description)
+VALUES(6, 'draft ready', 'Сформирован черновик docx-отчета (без диаграмм), ожидает полной генерации');
 
 
 -- тестовая запись в campaign_stats.product --
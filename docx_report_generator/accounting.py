@@ -0,0 +1,218 @@
+import argparse
+import logging
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import case, func, insert, select
+
+from database.db import db, session_maker
+from database.models import Product, ReportUsage
+from memory import MB, peak_rss_bytes, reset_peak_rss
+from settings import REPLICA_ID
+
+logger = logging.getLogger(__name__)
+
+# границы групп отчетов по количеству строк входных данных
+SIZE_BUCKETS = (1_000, 10_000, 100_000)
+STAGES = ('fetch', 'render', 'upload')
+
+
+def cpu_seconds() -> float:
+    """
+    Процессорное время процесса (всех его потоков), сек. Время процессов общего пула построения диаграмм
+    (report_generator.chart_pool) не учитывается: процессы пула не завершаются между отчетами, и RUSAGE_CHILDREN
+    их не включает, а время завершённых дочерних процессов не относится к конкретному отчёту
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def input_bytes(data: dict) -> int:
+    """
+    Объём входных данных отчёта
+    :param data: словарь - имя параметра ReportGenerator: содержимое файла (см. Processor.get_data_content)
+    :return: объём, байт
+    """
+    return sum(len(content) for content in data.values() if isinstance(content, (bytes, str)))
+
+
+@contextmanager
+def measure(stats: dict):
+    """
+    Учёт процессорного времени и пикового RSS процесса за время выполнения блока (без процессов
+    пула построения диаграмм, см. cpu_seconds)
+    :param stats: словарь, в который записываются cpu_seconds и peak_rss_bytes
+    """
+    reset_peak_rss()
+    start = cpu_seconds()
+    try:
+        yield stats
+    finally:
+        stats['cpu_seconds'] = cpu_seconds() - start
+        stats['peak_rss_bytes'] = peak_rss_bytes()
+
+
+@dataclass
+class UsageRecord:
+    """
+    Затраты ресурсов на обработку одного отчёта (строка таблицы report_usage)
+    """
+    report_id: int
+    product_id: int | None = None
+    profile: str | None = None
+    success: bool = False
+    # длительность этапов обработки (STAGES), сек
+    stages: dict[str, float] = field(default_factory=dict)
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    input_bytes: int = 0
+    input_rows: int = 0
+    action_rows: int = 0
+    chart_count: int = 0
+    output_bytes: int = 0
+    # превышение ограничения времени формирования (REPORT_DEADLINE), сек, и количество упрощённых пунктов
+    overrun_seconds: float = 0.0
+    degraded_sections: int = 0
+    started: float | None = None
+    finished: float | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Учёт длительности этапа обработки
+        :param name: название этапа (STAGES)
+        """
+        start = time.perf_counter()
+        if self.started is None:
+            self.started = start
+        try:
+            yield
+        finally:
+            self.finished = time.perf_counter()
+            self.stages[name] = self.stages.get(name, 0.0) + self.finished - start
+
+    def update(self, stats: dict):
+        """
+        Добавляет показатели формирования отчёта (ReportGenerator.usage_stats, measure)
+        :param stats: словарь - имя поля: значение
+        :return: None
+        """
+        for name, value in stats.items():
+            if name in self.__dataclass_fields__:
+                setattr(self, name, value)
+
+    def to_row(self) -> dict:
+        """
+        Значения столбцов таблицы report_usage
+        """
+        total = self.finished - self.started if self.started is not None else 0.0
+        return {
+            'report_id': self.report_id, 'product_id': self.product_id, 'replica_id': REPLICA_ID,
+            'profile': self.profile, 'success': self.success,
+            **{f'{name}_seconds': self.stages.get(name) for name in STAGES},
+            'total_seconds': total, 'cpu_seconds': self.cpu_seconds, 'peak_rss_bytes': self.peak_rss_bytes,
+            'input_bytes': self.input_bytes, 'input_rows': self.input_rows, 'action_rows': self.action_rows,
+            'chart_count': self.chart_count, 'output_bytes': self.output_bytes,
+            'overrun_seconds': self.overrun_seconds, 'degraded_sections': self.degraded_sections,
+        }
+
+
+def save_usage(records: list[UsageRecord]):
+    """
+    Сохранение записей об обработке отчетов одним запросом в отдельной транзакции:
+    ошибка учёта (например, отсутствие таблицы) не влияет на обработку отчетов
+    :param records: записи UsageRecord
+    :return: None
+    """
+    if not records:
+        return
+    rows = [record.to_row() for record in records]
+
+    def execute(session):
+        session.execute(insert(ReportUsage), rows)
+        session.commit()
+
+    try:
+        with session_maker() as session:
+            db.call(execute, session, retry=False)
+    except Exception as err:
+        logger.warning(f'Не удалось сохранить учёт ресурсов для {len(rows)} отчетов: {err}')
+
+
+def size_bucket():
+    """
+    Выражение SQL: группа отчёта по количеству строк входных данных (SIZE_BUCKETS)
+    """
+    labels = [f'< {SIZE_BUCKETS[0]}']
+    labels += [f'{low}-{high}' for low, high in zip(SIZE_BUCKETS, SIZE_BUCKETS[1:])]
+    labels.append(f'>= {SIZE_BUCKETS[-1]}')
+    whens = [(ReportUsage.input_rows < bound, label) for bound, label in zip(SIZE_BUCKETS, labels)]
+    return case(*whens, else_=labels[-1])
+
+
+def summarize(days: float, recent_days: float) -> list:
+    """
+    Сводка затрат ресурсов по продуктам и группам размера отчетов
+    :param days: период сводки, дней
+    :param recent_days: последние дни периода, по которым оценивается рост входных данных
+    :return: строки сводки
+    """
+    bucket = size_bucket().label('bucket')
+    recent = ReportUsage.created_at >= func.now() - timedelta(days=recent_days)
+    stmt = (
+        select(
+            Product.name.label('product'), bucket,
+            func.count().label('reports'),
+            func.count().filter(ReportUsage.success == False).label('failed'),
+            func.avg(ReportUsage.total_seconds).label('avg_seconds'),
+            func.percentile_cont(0.95).within_group(ReportUsage.total_seconds).label('p95_seconds'),
+            func.avg(ReportUsage.cpu_seconds).label('avg_cpu'),
+            func.max(ReportUsage.peak_rss_bytes).label('max_rss'),
+            func.avg(ReportUsage.input_bytes).label('avg_input'),
+            func.avg(ReportUsage.input_rows).label('avg_rows'),
+            func.avg(ReportUsage.chart_count).label('avg_charts'),
+            func.avg(ReportUsage.output_bytes).label('avg_output'),
+            func.count().filter(ReportUsage.degraded_sections > 0).label('degraded'),
+            # отношение среднего количества строк за последние дни к среднему за остальной период
+            (func.avg(ReportUsage.input_rows).filter(recent) /
+             func.nullif(func.avg(ReportUsage.input_rows).filter(~recent), 0)).label('rows_growth'),
+        ).
+        join(Product, ReportUsage.product_id == Product.id, isouter=True).
+        where(ReportUsage.created_at >= func.now() - timedelta(days=days)).
+        group_by(Product.name, bucket).
+        order_by(func.sum(ReportUsage.cpu_seconds).desc())
+    )
+    with session_maker() as session:
+        return db.call(lambda: session.execute(stmt).all(), on_error=session.rollback)
+
+
+def print_summary(rows: list):
+    """
+    Вывод сводки затрат ресурсов
+    :param rows: строки summarize
+    :return: None
+    """
+    print(f'{"product":<30} {"rows":<14} {"reports":>7} {"failed":>6} {"avg s":>8} {"p95 s":>8} {"cpu s":>8} '
+          f'{"rss MB":>8} {"in MB":>8} {"rows":>9} {"charts":>6} {"docx KB":>8} {"degr":>5} {"growth":>6}')
+    for row in rows:
+        growth = f'{row.rows_growth:.2f}' if row.rows_growth is not None else '-'
+        print(f'{(row.product or "-")[:30]:<30} {row.bucket:<14} {row.reports:>7} {row.failed:>6} '
+              f'{row.avg_seconds or 0:>8.2f} {row.p95_seconds or 0:>8.2f} {row.avg_cpu or 0:>8.2f} '
+              f'{(row.max_rss or 0) / MB:>8.1f} {float(row.avg_input or 0) / MB:>8.2f} {float(row.avg_rows or 0):>9.0f} '
+              f'{float(row.avg_charts or 0):>6.1f} {float(row.avg_output or 0) / 1024:>8.0f} {row.degraded:>5} {growth:>6}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сводка затрат ресурсов на формирование отчетов (report_usage)')
+    parser.add_argument('--days', type=float, default=30, help='период сводки, дней')
+    parser.add_argument('--recent-days', type=float, default=7,
+                        help='последние дни периода для оценки роста входных данных (столбец growth)')
+    args = parser.parse_args()
+    print_summary(summarize(args.days, args.recent_days))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from input_files import select_input_files
+from report_generator import ReportGenerator, disable_chart_pool
+
+logging.basicConfig(level=logging.INFO, format='[{asctime}] #{levelname:4} {name}:{lineno} - {message}', style='{')
+logger = logging.getLogger(__file__)
+
+
+def read_input_dir(path: str) -> dict:
+    """
+    Чтение входных файлов отчёта (csv, csv.gz, csv.zst, parquet) из директории
+    :param path: директория с файлами одного отчёта
+    :return: словарь - имя параметра ReportGenerator: содержимое файла (и форматы файлов в input_formats)
+    """
+    data, input_formats = {}, {}
+    files = [entry.path for entry in os.scandir(path) if entry.is_file()]
+    for key, (file_path, input_format) in select_input_files(files).items():
+        with open(file_path, 'rb') as f:
+            data[key] = f.read()
+        input_formats[key] = input_format
+    if data:
+        data['input_formats'] = input_formats
+    return data
+
+
+def generate_report(report_id: str, path: str, header: str, output_dir: str, outlier_rate: float,
+                    use_cache: bool, profile: str = None, output_format: str = 'docx', deadline: float = 0) -> dict:
+    """
+    Формирование одного отчёта из локальной директории (выполняется в отдельном процессе)
+    :param report_id: идентификатор отчёта
+    :param path: директория с csv-файлами отчёта
+    :param header: заголовок отчёта
+    :param output_dir: директория для сохранения docx-файла
+    :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
+    :param use_cache: использовать кэш пунктов отчёта
+    :param profile: профиль пунктов отчёта (см. ReportGenerator.resolve_sections)
+    :param output_format: формат файла отчёта (docx, json, html)
+    :param deadline: время на формирование отчёта, сек (0 - без ограничения, см. deadline.ReportDeadline)
+    :return: словарь с результатом и временем выполнения этапов, сек
+    """
+    result = {'report_id': report_id, 'status': 'ok', 'error': '', 'read': 0.0, 'render': 0.0, 'save': 0.0}
+    start = time.perf_counter()
+    try:
+        data = read_input_dir(path)
+        if not data:
+            raise IOError('Нет данных для создания отчета')
+        data['header'] = header
+        data['outlier_rate'] = outlier_rate
+        data['deadline'] = deadline
+        if use_cache:
+            from fragment_cache import fragment_cache
+            data['fragment_cache'] = fragment_cache
+        read_end = time.perf_counter()
+        result['read'] = read_end - start
+
+        report = ReportGenerator(**data)
+        if output_format == 'docx':
+            report.write_sections(profile)
+        else:
+            report.build_model(profile)
+        render_end = time.perf_counter()
+        result['render'] = render_end - read_end
+
+        file_path = os.path.join(output_dir, ReportGenerator.file_name(header, report_id, output_format))
+        if output_format == 'docx':
+            report.save_report(file_path, binary=False)
+        else:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(report.model.to_json() if output_format == 'json' else report.model.to_html())
+        result['save'] = time.perf_counter() - render_end
+    except Exception as err:
+        result['status'] = 'error'
+        result['error'] = str(err)
+    result['total'] = time.perf_counter() - start
+    return result
+
+
+def find_jobs(input_dir: str = None, manifest: str = None) -> list[tuple[str, str, str]]:
+    """
+    Формирует список отчётов для генерации
+    :param input_dir: директория вида <report_id>/<csv-файлы>
+    :param manifest: csv-файл с колонками report_id, path и (необязательно) header;
+    относительные пути считаются от директории манифеста
+    :return: список (report_id, директория с данными, заголовок)
+    """
+    jobs = []
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                report_id = row['report_id'].strip()
+                path = os.path.join(base_dir, row['path'].strip())
+                jobs.append((report_id, path, (row.get('header') or report_id).strip()))
+    else:
+        for entry in sorted(os.scandir(input_dir), key=lambda e: e.name):
+            if entry.is_dir():
+                jobs.append((entry.name, entry.path, entry.name))
+    return jobs
+
+
+def percentile(values: list[float], rate: float) -> float:
+    """
+    Перцентиль (ближайший ранг) отсортированного списка значений
+    :param values: отсортированный список
+    :param rate: доля от 0 до 1
+    :return: значение перцентиля
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(rate * len(values)) - 1))]
+
+
+def print_summary(results: list[dict], wall_time: float):
+    """
+    Вывод сводки по времени формирования отчётов
+    :param results: результаты generate_report
+    :param wall_time: общее время работы, сек
+    :return: None
+    """
+    print(f'{"report_id":<20} {"status":<6} {"read":>8} {"render":>8} {"save":>8} {"total":>8}')
+    for res in sorted(results, key=lambda r: r['total'], reverse=True):
+        print(f'{res["report_id"]:<20} {res["status"]:<6} {res["read"]:>8.3f} {res["render"]:>8.3f} '
+              f'{res["save"]:>8.3f} {res["total"]:>8.3f} {res["error"]}')
+
+    totals = sorted(res['total'] for res in results if res['status'] == 'ok')
+    failed = len(results) - len(totals)
+    print(f'\nОтчетов: {len(results)}, успешно: {len(totals)}, с ошибкой: {failed}')
+    print(f'Общее время: {wall_time:.2f} сек, отчетов в минуту: {len(totals) / wall_time * 60 if wall_time else 0:.1f}')
+    if totals:
+        print(f'Время на отчет, сек: среднее {statistics.mean(totals):.3f}, p50 {percentile(totals, 0.5):.3f}, '
+              f'p95 {percentile(totals, 0.95):.3f}, max {totals[-1]:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетная генерация отчетов из локальной директории (без БД и S3)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input-dir', help='директория вида <report_id>/<csv-файлы>')
+    source.add_argument('--manifest', help='csv-файл с колонками report_id, path, header')
+    parser.add_argument('--output-dir', required=True, help='директория для сохранения docx-файлов')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='количество процессов')
+    parser.add_argument('--outlier-rate', type=float, default=1.5)
+    parser.add_argument('--cache', action='store_true', help='использовать кэш пунктов отчёта')
+    parser.add_argument('--profile', help='профиль (full, text, draft) или пункты отчёта через запятую')
+    parser.add_argument('--format', choices=('docx', 'json', 'html'), default='docx',
+                        help='формат файлов отчетов (json и html формируются без диаграмм)')
+    parser.add_argument('--deadline', type=float, default=0,
+                        help='время на формирование отчёта, сек: при нехватке времени отчёт сокращается')
+    parser.add_argument('--summary', help='путь для сохранения сводки в csv')
+    args = parser.parse_args()
+
+    jobs = find_jobs(args.input_dir, args.manifest)
+    if not jobs:
+        logger.warning('Нет отчетов для формирования')
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+    logger.info(f'Формирование {len(jobs)} отчетов ({args.workers} процессов)...')
+
+    results = []
+    start = time.perf_counter()
+    # при нескольких процессах диаграммы строятся в процессе отчёта (см. disable_chart_pool)
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             initializer=disable_chart_pool if args.workers > 1 else None) as executor:
+        futures = [executor.submit(generate_report, report_id, path, header, args.output_dir, args.outlier_rate,
+                                   args.cache, args.profile, args.format, args.deadline)
+                   for report_id, path, header in jobs]
+        for future in as_completed(futures):
+            res = future.result()
+            if res['status'] != 'ok':
+                logger.warning(f'Отчет [{res["report_id"]}] не сформирован: {res["error"]}')
+            results.append(res)
+    wall_time = time.perf_counter() - start
+
+    print_summary(results, wall_time)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['report_id', 'status', 'read', 'render', 'save', 'total', 'error'])
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
+import psycopg2
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from resilience import Dependency
 from settings import DB_USER, DB_NAME, DB_PORT, DB_HOST, DB_PASSWORD, DB_SCHEME
 
 DATABASE_URL = f'postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
@@ -11,4 +14,17 @@ class Base(DeclarativeBase):
 
 
 engine = create_engine(DATABASE_URL)
-session_maker = sessionmaker(bind=engine)
\ No newline at end of file
+session_maker = sessionmaker(bind=engine)
+
+
+def is_transient(err: Exception) -> bool:
+    """
+    Временными считаются ошибки соединения (ошибки запросов не повторяются), в т.ч. ошибки
+    psycopg2 при работе с соединением напрямую (COPY)
+    """
+    if isinstance(err, DBAPIError):
+        return err.connection_invalidated or isinstance(err.orig, psycopg2.OperationalError)
+    return isinstance(err, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+db = Dependency('БД', is_transient=is_transient)
@@ -0,0 +1,111 @@
+import io
+import json
+import logging
+
+from database.db import db, engine
+from settings import DB_INPUT_QUERIES, DB_SCHEME
+
+logger = logging.getLogger(__name__)
+
+# столбцы входных данных в порядке столбцов csv-выгрузок (см. report_generator.Data)
+RK_COLUMNS = ('action', 'views', 'conv_views', 'visits', 'conv_visits', 'aborted', 'perc_aborted', 'depth', 'time',
+              'new_users_with_abort', 'perc_new_users_with_abort', 'new_users', 'perc_new_users')
+CAMPAIGN_COLUMNS = ('action', 'views', 'visits', 'aborted', 'perc_aborted', 'depth', 'time', 'new_users_with_abort',
+                    'perc_new_users_with_abort', 'new_users', 'perc_new_users')
+ORG_COLUMNS = ('service', 'views', 'visits', 'perc_aborted', 'depth', 'time', 'perc_new_users')
+INPUT_COLUMNS = {'cur_rk': RK_COLUMNS, 'prev_rk': RK_COLUMNS, 'org': ORG_COLUMNS,
+                 'groups': CAMPAIGN_COLUMNS, 'campaigns': CAMPAIGN_COLUMNS}
+# обязательные входные данные (без них отчёт не формируется)
+REQUIRED_INPUTS = ('cur_rk', 'org', 'groups', 'campaigns')
+
+
+def default_query(key: str) -> str:
+    """
+    Запрос по-умолчанию: представление report_input_<key> со столбцом report_id, столбцами INPUT_COLUMNS
+    (доли - от 0 до 1, время - interval или строка ЧЧ:ММ:СС) и порядком строк position
+    (первая строка РК - лендинг)
+    :param key: имя параметра ReportGenerator
+    :return: шаблон запроса с подстановкой {report_id}
+    """
+    return (f'SELECT {", ".join(INPUT_COLUMNS[key])} FROM {DB_SCHEME}.report_input_{key} '
+            f'WHERE report_id = {{report_id}} ORDER BY position')
+
+
+def load_queries(path: str = None) -> dict[str, str]:
+    """
+    Запросы входных данных
+    :param path: json-файл - имя параметра ReportGenerator: шаблон запроса с подстановкой {report_id}
+    (столбцы - в порядке csv-выгрузок); для отсутствующих в файле данных используется default_query
+    :return: словарь - имя параметра: шаблон запроса
+    """
+    queries = {key: default_query(key) for key in INPUT_COLUMNS}
+    if path:
+        with open(path, encoding='utf-8') as f:
+            queries.update(json.load(f))
+    return queries
+
+
+QUERIES = load_queries(DB_INPUT_QUERIES)
+
+
+def copy_query(sql: str) -> bytes:
+    """
+    Выгрузка результата запроса в формате csv (с заголовком) через COPY ... TO STDOUT:
+    строки формируются на сервере БД и передаются потоком без построчной обработки в Python
+    :param sql: запрос
+    :return: содержимое csv
+    """
+    buffer = io.BytesIO()
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)', buffer)
+        connection.commit()
+    finally:
+        connection.close()
+    return buffer.getvalue()
+
+
+def read_report_inputs(report_id: int) -> dict | None:
+    """
+    Загрузка входных данных отчёта из БД (вместо csv-файлов из хранилища)
+    :param report_id: идентификатор отчёта
+    :return: словарь - имя параметра ReportGenerator: содержимое csv или None, если нет обязательных данных
+    """
+    result = {}
+    for key, query in QUERIES.items():
+        # идентификатор подставляется в текст запроса: COPY не поддерживает параметры
+        content = db.call(copy_query, query.format(report_id=int(report_id)))
+        # данные без строк (только заголовок) считаются отсутствующими, как и отсутствующий файл
+        if content.find(b'\n') < len(content) - 1:
+            result[key] = content
+    missing = [key for key in REQUIRED_INPUTS if key not in result]
+    if missing:
+        logger.warning(f'Нет данных для создания отчета [{report_id}]: {", ".join(missing)}')
+        return None
+    return result
+
+
+def report_input_sizes(report_id: int, row_bytes: int) -> dict[str, int]:
+    """
+    Оценка объёма входных данных отчёта (для планировщика) по количеству строк - одним запросом
+    :param report_id: идентификатор отчёта
+    :param row_bytes: средний размер строки csv, байт
+    :return: словарь - имя параметра: примерный размер csv, байт
+    """
+    counts = ', '.join(f'(SELECT count(*) FROM ({query.format(report_id=int(report_id))}) AS "{key}") AS "{key}"'
+                       for key, query in QUERIES.items())
+
+    def execute():
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT {counts}')
+                row = cursor.fetchone()
+            connection.commit()
+        finally:
+            connection.close()
+        return row
+
+    row = db.call(execute)
+    return {key: count * row_bytes for key, count in zip(QUERIES, row) if count}
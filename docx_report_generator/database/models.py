@@ -1,4 +1,4 @@
-from sqlalchemy import select, Column, Integer, String, Boolean, ForeignKey, and_
+from sqlalchemy import select, BigInteger, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, and_, func
 
 from database.db import Base, session_maker
 from settings import DB_SCHEME
@@ -13,6 +13,8 @@ class Report(Base):
     filepath = Column(String)
     to_delete = Column(Boolean)
     content_report_filepath = Column(String)
+    sections = Column(String)
+    s3_purged_at = Column(DateTime)
 
     # product = relationship('Product', uselist=False, backref='reports')
 
@@ -24,6 +26,38 @@ class Product(Base):
     name = Column(String)
 
 
+class WorkerHeartbeat(Base):
+    __tablename__ = 'worker_heartbeat'
+
+    replica_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime)
+
+
+class ReportUsage(Base):
+    __tablename__ = 'report_usage'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    report_id = Column(Integer, ForeignKey(f'{DB_SCHEME}.report.id', ondelete='CASCADE'), index=True)
+    product_id = Column(Integer)
+    replica_id = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    profile = Column(String)
+    success = Column(Boolean)
+    fetch_seconds = Column(Float)
+    render_seconds = Column(Float)
+    upload_seconds = Column(Float)
+    total_seconds = Column(Float)
+    cpu_seconds = Column(Float)
+    peak_rss_bytes = Column(BigInteger)
+    input_bytes = Column(BigInteger)
+    input_rows = Column(BigInteger)
+    action_rows = Column(Integer)
+    chart_count = Column(Integer)
+    output_bytes = Column(BigInteger)
+    overrun_seconds = Column(Float)
+    degraded_sections = Column(Integer)
+
+
 # отладка
 if __name__ == '__main__':
     with session_maker() as session:
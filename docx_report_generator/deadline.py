@@ -0,0 +1,99 @@
+import threading
+import time
+
+from settings import REPORT_DEGRADED_CHARTS, REPORT_DEGRADED_ITEMS
+
+# названия пунктов отчёта (для перечня упрощений)
+SECTION_TITLES = {
+    'general': 'Общие показатели',
+    'page_views': 'Посещение страниц',
+    'funnel_graph': 'Диаграммы выполнения целевых действий',
+    'outliers': 'Анализ выбросов по действиям',
+    'groups': 'Группы',
+}
+
+
+class ReportDeadline:
+    """
+    Ограничение времени формирования отчёта. По мере расходования времени затратные части отчёта
+    упрощаются в установленном порядке: сначала ограничивается количество диаграмм, затем в перечнях
+    остаются только первые элементы, после истечения времени не начатые пункты пропускаются.
+    Выполненные упрощения перечисляются в конце отчёта
+    """
+
+    # уровни упрощения
+    FULL, FEWER_CHARTS, TOP_ITEMS, SKIP_SECTIONS = range(4)
+    # доля оставшегося времени, при которой включается уровень
+    FEWER_CHARTS_AT = 0.5
+    TOP_ITEMS_AT = 0.25
+
+    def __init__(self, budget: float, max_charts: int = REPORT_DEGRADED_CHARTS,
+                 top_items: int = REPORT_DEGRADED_ITEMS):
+        """
+        :param budget: время на формирование отчёта, сек (0 - без ограничения)
+        :param max_charts: количество диаграмм при нехватке времени
+        :param top_items: количество элементов каждого перечня при нехватке времени
+        """
+        self.budget = budget
+        self.max_charts = max_charts
+        self.top_items = top_items
+        self.started = time.monotonic()
+        # упрощённые пункты (не сохраняются в кэш фрагментов) и описания упрощений
+        self.degraded: set[str] = set()
+        self.notes: list[str] = []
+        # пункты формируются одновременно в нескольких потоках
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def overrun(self) -> float:
+        """
+        Превышение ограничения времени, сек
+        """
+        if not self.budget:
+            return 0.0
+        return max(0.0, self.elapsed() - self.budget)
+
+    def level(self) -> int:
+        """
+        Текущий уровень упрощения (FULL, FEWER_CHARTS, TOP_ITEMS, SKIP_SECTIONS)
+        """
+        if not self.budget:
+            return self.FULL
+        share = 1 - self.elapsed() / self.budget
+        if share <= 0:
+            return self.SKIP_SECTIONS
+        if share < self.TOP_ITEMS_AT:
+            return self.TOP_ITEMS
+        if share < self.FEWER_CHARTS_AT:
+            return self.FEWER_CHARTS
+        return self.FULL
+
+    def chart_limit(self) -> int | None:
+        """
+        Максимальное количество диаграмм пункта (None - без ограничения)
+        """
+        return self.max_charts if self.level() >= self.FEWER_CHARTS else None
+
+    def item_limit(self) -> int | None:
+        """
+        Максимальное количество элементов перечня (None - без ограничения)
+        """
+        return self.top_items if self.level() >= self.TOP_ITEMS else None
+
+    def skip_section(self) -> bool:
+        return self.level() >= self.SKIP_SECTIONS
+
+    def shorten(self, section: str, note: str):
+        """
+        Регистрирует упрощение пункта
+        :param section: название пункта (SECTION_TITLES)
+        :param note: описание упрощения
+        """
+        note = f'пункт «{SECTION_TITLES.get(section, section)}»: {note}'
+        with self._lock:
+            self.degraded.add(section)
+            if note not in self.notes:
+                self.notes.append(note)
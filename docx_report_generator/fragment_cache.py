@@ -0,0 +1,179 @@
+import hashlib
+import io
+import logging
+import os
+import pickle
+from collections import OrderedDict
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+from settings import FRAGMENT_CACHE_DIR, FRAGMENT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# версия формата фрагментов - увеличивается при изменении логики формирования пунктов отчёта,
+# чтобы не использовать фрагменты, сохранённые предыдущей версией генератора
+FRAGMENT_VERSION = 5
+
+
+class Fragment:
+    """
+    Фрагмент документа (пункт отчёта): сериализованные XML-элементы тела документа, изображения
+    и модель пункта (report_model.Section)
+    """
+
+    def __init__(self, elements: list[bytes], images: dict[str, bytes], section=None):
+        """
+        :param elements: XML-элементы тела документа (параграфы, таблицы) в сериализованном виде
+        :param images: изображения фрагмента - идентификатор связи (rId): содержимое
+        :param section: модель пункта отчёта, из которой сформированы элементы
+        """
+        self.elements = elements
+        self.images = images
+        self.section = section
+
+    @property
+    def size(self) -> int:
+        return sum(len(el) for el in self.elements) + sum(len(img) for img in self.images.values())
+
+    @staticmethod
+    def body_elements(document) -> list:
+        """
+        Элементы тела документа без завершающих параметров раздела (w:sectPr)
+        :param document: объект docx.Document
+        :return: список XML-элементов
+        """
+        return [el for el in document.element.body.iterchildren() if el.tag != qn('w:sectPr')]
+
+    @classmethod
+    def capture(cls, document, start: int, section=None) -> 'Fragment':
+        """
+        Формирует фрагмент из элементов тела документа, добавленных после позиции start
+        :param document: объект docx.Document
+        :param start: количество элементов тела документа до записи пункта
+        :param section: модель пункта отчёта
+        :return: объект Fragment
+        """
+        elements, images = [], {}
+        for el in cls.body_elements(document)[start:]:
+            for r_id in el.xpath('.//a:blip/@r:embed'):
+                images[r_id] = document.part.related_parts[r_id].blob
+            elements.append(etree.tostring(el))
+        return cls(elements, images, section)
+
+    def restore(self, document):
+        """
+        Добавляет фрагмент в конец документа
+        :param document: объект docx.Document
+        :return: None
+        """
+        # изображения заново регистрируются в документе, идентификаторы связей могут отличаться
+        r_ids = {}
+        for old_r_id, blob in self.images.items():
+            r_ids[old_r_id], _ = document.part.get_or_add_image(io.BytesIO(blob))
+
+        body = document.element.body
+        for xml in self.elements:
+            el = parse_xml(xml)
+            for blip in el.xpath('.//a:blip'):
+                blip.set(qn('r:embed'), r_ids[blip.get(qn('r:embed'))])
+            if body.sectPr is not None:
+                body.sectPr.addprevious(el)
+            else:
+                body.append(el)
+            # идентификаторы объектов рисунков должны быть уникальны в пределах документа
+            for doc_pr in el.xpath('.//wp:docPr'):
+                doc_pr.set('id', str(document.part.next_id))
+
+
+class FragmentCache:
+    """
+    Кэш пунктов отчёта. Ключ фрагмента - хэш входных данных, которые использует пункт, и outlier_rate.
+    Фрагменты хранятся в ОЗУ (LRU с ограничением по объему) и, опционально, в директории на диске
+    """
+
+    def __init__(self, max_size: int, cache_dir: str = None):
+        """
+        :param max_size: максимальный объём фрагментов в ОЗУ, байт
+        :param cache_dir: директория для хранения фрагментов между перезапусками (None - не сохранять)
+        """
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._fragments: OrderedDict[str, Fragment] = OrderedDict()
+        self._size = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def digest(content: str | bytes | None) -> str:
+        """
+        Хэш содержимого входного файла
+        :param content: содержимое файла
+        :return: hex-строка
+        """
+        if content is None:
+            content = b''
+        elif isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def make_key(section: str, input_digests: list[str], outlier_rate: float) -> str:
+        """
+        Формирует ключ фрагмента
+        :param section: название пункта отчёта
+        :param input_digests: хэши входных данных, используемых пунктом
+        :param outlier_rate: множитель выбросов
+        :return: ключ
+        """
+        key = '|'.join((str(FRAGMENT_VERSION), section, repr(float(outlier_rate)), *input_digests))
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Fragment | None:
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            return fragment
+
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        fragment = pickle.load(f)
+                except Exception as err:
+                    logger.warning(f'Не удалось прочитать фрагмент {key}: {err}')
+                    return None
+                self._store(key, fragment)
+                return fragment
+        return None
+
+    def put(self, key: str, fragment: Fragment):
+        self._store(key, fragment)
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key)
+            # директория может использоваться несколькими процессами одновременно
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(fragment, f)
+                os.replace(tmp_path, path)
+            except OSError as err:
+                logger.warning(f'Не удалось сохранить фрагмент {key}: {err}')
+
+    def _store(self, key: str, fragment: Fragment):
+        if fragment.size > self.max_size:
+            return
+        if key in self._fragments:
+            self._size -= self._fragments.pop(key).size
+        self._fragments[key] = fragment
+        self._size += fragment.size
+        # вытеснение давно не использованных фрагментов
+        while self._size > self.max_size:
+            _, old = self._fragments.popitem(last=False)
+            self._size -= old.size
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_MAX_BYTES, FRAGMENT_CACHE_DIR)
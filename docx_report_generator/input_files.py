@@ -0,0 +1,50 @@
+# соответствие имён входных файлов (без учета регистра и расширения) параметрам ReportGenerator
+TARGET_FILES = {'текущая рк': 'cur_rk', 'органический трафик': 'org',
+                'группы по типу рк': 'groups',
+                'все кампании': 'campaigns', 'предыдущая рк': 'prev_rk'}
+
+# поддерживаемые форматы входных файлов (определяются по расширению) в порядке предпочтения:
+# если для одних данных есть файлы в нескольких форматах, используется первый из них
+INPUT_FORMATS = {'.parquet': 'parquet', '.csv.zst': 'csv.zst', '.csv.gz': 'csv.gz', '.csv': 'csv'}
+# сжатие csv-файлов (параметр compression pandas.read_csv); для zst требуется пакет zstandard
+CSV_COMPRESSION = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+# примерная степень сжатия каждого из форматов - для оценки объёма данных по размеру файла
+SIZE_RATIO = {'parquet': 4.0, 'csv.zst': 8.0, 'csv.gz': 6.0, 'csv': 1.0}
+
+
+def split_input_file(path: str) -> tuple[str | None, str | None]:
+    """
+    Определяет, каким входным данным отчёта соответствует файл, и его формат
+    :param path: путь к файлу (в хранилище или файловой системе)
+    :return: имя параметра ReportGenerator и формат (INPUT_FORMATS) или (None, None), если файл не используется
+    """
+    filename = path.replace('\\', '/').split('/')[-1].lower()
+    for extension, input_format in INPUT_FORMATS.items():
+        if filename.endswith(extension):
+            key = TARGET_FILES.get(filename[:-len(extension)])
+            return (key, input_format) if key else (None, None)
+    return None, None
+
+
+def match_input_file(path: str) -> str | None:
+    """
+    Определяет, каким входным данным отчёта соответствует файл
+    :param path: путь к файлу (в хранилище или файловой системе)
+    :return: имя параметра ReportGenerator или None, если файл не используется
+    """
+    return split_input_file(path)[0]
+
+
+def select_input_files(paths) -> dict[str, tuple[str, str]]:
+    """
+    Отбирает входные файлы отчёта: для каждого из параметров - файл в наиболее предпочтительном формате
+    :param paths: пути к файлам
+    :return: словарь - имя параметра ReportGenerator: (путь к файлу, формат)
+    """
+    priority = list(INPUT_FORMATS.values())
+    selected = {}
+    for path in paths:
+        key, input_format = split_input_file(path)
+        if key and (key not in selected or priority.index(input_format) < priority.index(selected[key][1])):
+            selected[key] = (path, input_format)
+    return selected
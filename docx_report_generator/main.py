@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import multiprocessing
 from typing import Sequence
 import time
 import io
@@ -6,10 +8,42 @@ import io
 from sqlalchemy import select, update, and_, Row
 from sqlalchemy.orm import Session
 
-from database.db import session_maker
+from database.db import db, engine, session_maker
+from database.inputs import read_report_inputs, report_input_sizes
 from database.models import Report, Product
-from s3_storage import storage
-from report_generator import ReportGenerator
+from s3_storage import s3, storage
+from report_generator import render_report
+from fragment_cache import fragment_cache
+from accounting import UsageRecord, input_bytes, measure, save_usage
+from input_files import SIZE_RATIO, TARGET_FILES, select_input_files
+from pipeline import ReportPipeline, render_executor
+from reaper import run_reaper
+from scheduler import AVG_ROW_BYTES, ReportScheduler
+from memory import MB, MemoryMonitor
+from resilience import wait_for
+from sharding import ShardRouter
+from settings import (
+    DRAFT_STATUS_ID,
+    INPUT_SOURCE,
+    PIPELINE_MODE,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_IO_CONCURRENCY,
+    PIPELINE_RENDER_WORKERS,
+    REAPER_MODE,
+    REPLICA_ID,
+    SCHEDULER_AGING_RATE,
+    SCHEDULER_BATCH_BUDGET,
+    SHARDING_MODE,
+    SHARD_HEARTBEAT_TTL,
+    SHARD_VNODES,
+    SHARD_STEAL_AFTER,
+    SHARD_STEAL_LIMIT,
+    USAGE_ACCOUNTING,
+    WORKER_MAX_REPORTS,
+    WORKER_MAX_RSS_MB,
+    WORKER_POLL_INTERVAL,
+    WORKER_TRACEMALLOC,
+)
 
 logging.basicConfig(level=logging.INFO, format='[{asctime}] #{levelname:4} {name}:{lineno} - {message}', style='{')
 logger = logging.getLogger(__file__)
@@ -20,9 +54,9 @@ class Processor:
         self.session: Session = session
         self.csv_path_template = 'products_report_generator/{{REPORT_ID}}/csv_exports/'
         self.docx_report_path_template = 'products_report_generator/{{REPORT_ID}}/docx_report/'
-        self.target_files = {'текущая рк.csv': 'cur_rk', 'органический трафик.csv': 'org',
-                             'группы по типу рк.csv': 'groups',
-                             'все кампании.csv': 'campaigns', 'предыдущая рк.csv': 'prev_rk'}
+        self.target_files = TARGET_FILES
+        # списки объектов, полученные при оценке размера отчетов
+        self._listings: dict[int, list[str]] = {}
 
     def get_reports(self, target_status_id: int) -> Sequence[Row[tuple]]:
         """
@@ -30,82 +64,152 @@ class Processor:
         :return: список идентификаторов
         """
         logger.info('Поиск запросов для подготовки отчетов...')
+        # вместе с новыми запросами выбираются черновики, ожидающие добавления диаграмм
         stmt = (
-            select(Report.id, Product.name).
+            select(Report.id, Product.name, Report.sections, Report.status_id, Report.product_id).
             join(Product, Report.product_id == Product.id).
-            where(and_(Report.status_id == target_status_id, Report.to_delete == False))
+            where(and_(Report.status_id.in_((target_status_id, DRAFT_STATUS_ID)), Report.to_delete == False))
         )
 
-        reports_to_process = self.session.execute(stmt).all()
+        # при ошибке соединения транзакция откатывается перед повтором
+        reports_to_process = db.call(lambda: self.session.execute(stmt).all(), on_error=self.session.rollback)
         logger.info(f'Найдено {len(reports_to_process)} запросов, готовых к обработке')
         return reports_to_process
 
-    def process_report(self, report_id: int, header: str, outlier_rate: float = 1.5):
+    @staticmethod
+    def report_profile(report: Row) -> str | None:
+        """
+        Профиль пунктов отчёта для строки запроса
+        :param report: строка get_reports
+        :return: профиль (см. ReportGenerator.resolve_sections)
+        """
+        # для черновика повторно формируется полный отчёт - текстовые пункты берутся из кэша фрагментов
+        if report.status_id == DRAFT_STATUS_ID:
+            return 'full'
+        return report.sections
+
+    def result_status(self, report: Row, success_status_id: int) -> int:
+        """
+        Статус, устанавливаемый для запроса после успешной обработки
+        :param report: строка get_reports
+        :param success_status_id: статус завершённого отчёта
+        :return: идентификатор статуса
+        """
+        if self.report_profile(report) == 'draft':
+            return DRAFT_STATUS_ID
+        return success_status_id
+
+    def process_report(self, report_id: int, header: str, outlier_rate: float = 1.5, profile: str = None,
+                       usage: UsageRecord = None):
+        """
+        Формирование отчёта и отправка его в хранилище
+        :param usage: запись, в которую заносятся затраты ресурсов на обработку (см. accounting)
+        :return: путь к docx-файлу в хранилище
+        """
         logger.info(f'Обработка отчета [{report_id}]...')
-        data = self.get_data_content(report_id)
-        if not data:
-            raise IOError('Нет данных для создания отчета')
-        data['header'] = header
-        data['outlier_rate'] = outlier_rate
-
-        logger.info(f'Формирование файла...')
-        new_report = ReportGenerator(**data)
-        new_report.write_general_params()
-        new_report.write_page_views()
-        new_report.write_funnel_graph_section()
-        new_report.write_outliers_section()
-        new_report.write_groups_section()
-        file = new_report.save_report(f'Отчет_{header.replace(" ", "_")}_{report_id}.docx', binary=True)
-        logger.info('Файл сформирован')
-        logger.info('Отправка файла в хранилище...')
-        s3_filepath = self.upload_to_s3(file, file.name, report_id)
+        usage = usage or UsageRecord(report_id)
+        resources = {}
+        try:
+            with measure(resources):
+                with usage.stage('fetch'):
+                    data = self.get_data_content(report_id)
+                if not data:
+                    raise IOError('Нет данных для создания отчета')
+                usage.input_bytes = input_bytes(data)
+
+                logger.info(f'Формирование файла...')
+                stats = {}
+                with usage.stage('render'):
+                    file = render_report(data, header, report_id, outlier_rate, fragment_cache, profile,
+                                         stats=stats)
+                usage.update(stats)
+                usage.output_bytes = len(file.getvalue())
+                logger.info('Файл сформирован')
+                logger.info('Отправка файла в хранилище...')
+                with usage.stage('upload'):
+                    s3_filepath = self.upload_to_s3(file, file.name, report_id)
+        finally:
+            # затраты учитываются и для отчетов, обработка которых завершилась ошибкой
+            usage.update(resources)
         return s3_filepath
 
+    def complete_report(self, report_id: int, s3_filepath: str, success_status_id: int):
+        """
+        Отмечает запрос как успешно обработанный
+        :param report_id: идентификатор отчёта
+        :param s3_filepath: путь к docx-файлу в хранилище
+        :param success_status_id: статус, устанавливаемый для запроса
+        :return: None
+        """
+        # изменения фиксируются одной транзакцией в конце цикла - повтор отдельного запроса невозможен
+        db.call(self.session.execute,
+                update(Report).
+                values(content_report_filepath=s3_filepath, status_id=success_status_id).
+                where(Report.id == report_id),
+                retry=False)
+
     def get_data_content(self, report_id: int) -> dict | None:
         """
-        Загрузка данных из S3-хранилища
+        Загрузка данных из S3-хранилища (или из БД, см. INPUT_SOURCE)
         :param report_id:
-        :return: словарь - имя параметра: csv-данные
+        :return: словарь - имя параметра: содержимое файла (и форматы файлов в input_formats)
         """
+        if INPUT_SOURCE == 'postgres':
+            logger.info(f'Загрузка данных отчета [{report_id}] из БД...')
+            return read_report_inputs(report_id)
+
         path = self.csv_path_template.replace('{{REPORT_ID}}', str(report_id))
         logger.info(f'Скачивание данных из {path}...')
 
         result = {}
-        obj_names = [obj.object_name for obj in storage.get_list_objects(path)]
+        obj_names = self._listings.pop(report_id, None)
+        if obj_names is None:
+            obj_names = [obj.object_name for obj in storage.get_list_objects(path)]
         if not obj_names:
             logger.warning('Нет данных для создания отчета')
             return None
 
-        # поиск и загрузка необходимых файлов бех учета регистра
-        for obj_name in obj_names:
-            filename = obj_name.split('/')[-1].lower()
-            if filename in self.target_files:
-                key = self.target_files[filename]
-                content = self.download_data(obj_name)
-                result[key] = content
+        # поиск и загрузка необходимых файлов бех учета регистра (csv, csv.gz, csv.zst или parquet)
+        input_formats = {}
+        for key, (obj_name, input_format) in select_input_files(obj_names).items():
+            result[key] = self.download_data(obj_name)
+            input_formats[key] = input_format
+        if result:
+            result['input_formats'] = input_formats
         logger.info('Данные успешно загружены')
         return result
 
+    def get_input_sizes(self, report_id: int) -> dict[str, int]:
+        """
+        Размеры входных файлов отчёта в хранилище (для оценки стоимости формирования).
+        Список объектов сохраняется и повторно используется при скачивании данных
+        :param report_id:
+        :return: словарь - имя параметра: размер файла, байт
+        """
+        if INPUT_SOURCE == 'postgres':
+            return report_input_sizes(report_id, AVG_ROW_BYTES)
+
+        path = self.csv_path_template.replace('{{REPORT_ID}}', str(report_id))
+        objects = {obj.object_name: obj.size or 0 for obj in storage.get_list_objects(path)}
+        self._listings[report_id] = list(objects)
+        # размер сжатых файлов приводится к примерному размеру csv
+        return {key: objects[obj_name] * SIZE_RATIO[input_format]
+                for key, (obj_name, input_format) in select_input_files(objects).items()}
+
     @staticmethod
-    def download_data(obj_name):
+    def download_data(obj_name) -> bytes:
         """
         Метод для скачивание csv-контента из хранилища
         :param obj_name:
-        :return:
+        :return: содержимое файла без декодирования (передаётся в pandas.read_csv как есть)
         """
         logger.info(f'Скачивание файла {obj_name}...')
-        for retry in range(3):
-            try:
-                content, status = storage.download_file(obj_name)
-                if status != 200:
-                    raise IOError(f'Ошибка скачивания файла: {content}')
-                logger.info('Успех')
-                return content
-            except Exception as err:
-                logger.warning(f'Ошибка при скачивании {obj_name}: {str(err)}')
-                if retry == 2:
-                    raise err
-                logger.info(f'Попытка скачивания {retry + 1}...')
+        # повторы при сбоях хранилища выполняет MyStorage (resilience.Dependency)
+        content, status = storage.download_file(obj_name)
+        if status != 200:
+            raise IOError(f'Ошибка скачивания файла {obj_name}: статус {status}')
+        logger.info('Успех')
+        return content
 
     def upload_to_s3(self, file: io.BytesIO, file_name: str, report_id: int):
         """
@@ -115,64 +219,158 @@ class Processor:
         :param file_name: имя файла - критически важно чтобы содержало ID отчёта для которого файл создан (19/filename.docx)
         :return:
         """
-        error = None
-        for _ in range(3):
-            try:
-                s3_report_path = self.docx_report_path_template.replace('{{REPORT_ID}}', str(report_id))
-                output_path = ''.join((s3_report_path, file_name))
-                storage.upload_memory_file(output_path, file, len(file.getvalue()))
-                print(f'Файл отправлен в хранилище: {output_path}')
-                return output_path
-            except Exception as e:
-                print(f'Ошибка отправки отчёта (попытка {_ + 1}) {file_name} в хранилище: {e}')
-                error = e
-                file.seek(0)
-                continue
-        print('Критическая ошибка отправки отчёта')
-        raise error
-
-
-def main_cycle(target_status_id: int, success_status_id: int):
+        s3_report_path = self.docx_report_path_template.replace('{{REPORT_ID}}', str(report_id))
+        output_path = ''.join((s3_report_path, file_name))
+        try:
+            # повторы при сбоях хранилища выполняет MyStorage (resilience.Dependency)
+            storage.upload_memory_file(output_path, file, len(file.getvalue()))
+        except Exception as e:
+            print(f'Ошибка отправки отчёта {file_name} в хранилище: {e}')
+            raise
+        print(f'Файл отправлен в хранилище: {output_path}')
+        return output_path
+
+
+def main_cycle(target_status_id: int, success_status_id: int, pipeline: bool = PIPELINE_MODE,
+               sharding: bool = SHARDING_MODE):
     """
     Бесконечный цикл ожидающий новых запросов на обработку
     :param target_status_id: целевой статус для взятия запроса в обработку
     :param succses_status_id: статус, устанавливаемый для запросов в случае успешной обработки
-    :return:
+    :param pipeline: конвейерная обработка (скачивание, формирование и отправка отчетов выполняются одновременно)
+    :param sharding: обрабатывать преимущественно отчеты продуктов, закреплённых за репликой (см. ShardRouter)
+    :return: None - при необходимости перезапуска процесса (см. run_worker)
     """
+    # соединения, унаследованные от родительского процесса, не используются
+    engine.dispose(close=False)
+    # процессы-исполнители конвейера перезапускаются после WORKER_MAX_REPORTS отчетов
+    executor = render_executor(PIPELINE_RENDER_WORKERS, WORKER_MAX_REPORTS) if pipeline else None
+    scheduler = ReportScheduler(SCHEDULER_AGING_RATE, SCHEDULER_BATCH_BUDGET)
+    monitor = MemoryMonitor(WORKER_MAX_REPORTS, WORKER_MAX_RSS_MB, WORKER_TRACEMALLOC)
+    router = ShardRouter(REPLICA_ID, SHARD_HEARTBEAT_TTL, SHARD_VNODES, SHARD_STEAL_AFTER,
+                         SHARD_STEAL_LIMIT) if sharding else None
+    recycle = False
     while True:
+        # пока БД или хранилище недоступны, новые запросы не берутся в обработку
+        delay = wait_for(db, s3)
+        if delay:
+            logger.warning(f'Зависимости недоступны, новые запросы не обрабатываются {delay:.0f} сек')
+            time.sleep(delay)
+            continue
         corrupted_count = 0
         errors = {}
+        usage = []
+        if router is not None:
+            router.heartbeat()
         with session_maker() as session:
             processor = Processor(session)
-            reports = processor.get_reports(target_status_id)
-
-            for report in reports:
-                try:
-                    report_id, header = report[0], report[1]
-                    s3_filepath = processor.process_report(report_id, header)
+            try:
+                reports = processor.get_reports(target_status_id)
+            except Exception as err:
+                logger.error(f'Ошибка получения запросов: {err}')
+                reports = []
+            if router is not None:
+                reports = router.select(reports)
+            reports = scheduler.plan(reports, processor.get_input_sizes)
 
-                    session.execute(update(Report).
-                                    values(content_report_filepath=s3_filepath, status_id=success_status_id).
-                                    where(Report.id == report_id))
-                    logger.info(f'Обработка отчета [{report[0]}] завершена')
+            if pipeline and reports:
+                report_pipeline = ReportPipeline(processor, executor, PIPELINE_RENDER_WORKERS, PIPELINE_QUEUE_SIZE,
+                                                 PIPELINE_IO_CONCURRENCY)
+                completed, errors = asyncio.run(report_pipeline.run(reports))
+                usage = list(report_pipeline.usage.values())
+                for report in reports:
+                    if report.id in completed:
+                        processor.complete_report(report.id, completed[report.id],
+                                                  processor.result_status(report, success_status_id))
+                corrupted_count = len(errors)
+                # после аварийного завершения процесса-исполнителя пул непригоден: отчеты пакета, не успевшие
+                # сформироваться, обрабатываются в следующем цикле новым пулом. Память формирования отчетов
+                # растёт в процессах-исполнителях, поэтому WORKER_MAX_RSS_MB проверяется и для них
+                reason = None
+                if report_pipeline.broken:
+                    reason = 'Процесс-исполнитель аварийно завершился'
+                elif monitor.rss_exceeded(report_pipeline.max_worker_rss):
+                    reason = (f'RSS процесса-исполнителя {report_pipeline.max_worker_rss / MB:.1f} МБ '
+                              f'превышает {WORKER_MAX_RSS_MB} МБ')
+                if reason is not None:
+                    logger.warning(f'{reason} - пересоздание пула')
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = render_executor(PIPELINE_RENDER_WORKERS, WORKER_MAX_REPORTS)
+                monitor.report_done('пакет отчетов', len(reports))
+                recycle = monitor.should_recycle()
+            else:
+                for report in reports:
+                    usage.append(UsageRecord(report.id, report.product_id, processor.report_profile(report)))
+                    try:
+                        report_id, header = report[0], report[1]
+                        s3_filepath = processor.process_report(report_id, header,
+                                                               profile=processor.report_profile(report),
+                                                               usage=usage[-1])
+                        processor.complete_report(report_id, s3_filepath,
+                                                  processor.result_status(report, success_status_id))
+                        usage[-1].success = True
+                        logger.info(f'Обработка отчета [{report[0]}] завершена')
 
-                except Exception as err:
-                    corrupted_count += 1
-                    errors[str(report_id)] = str(err)
+                    except Exception as err:
+                        corrupted_count += 1
+                        errors[str(report_id)] = str(err)
+                    monitor.report_done(report[0])
+                    if monitor.should_recycle():
+                        recycle = True
+                        break
+                    # оставшиеся запросы обрабатываются после восстановления зависимостей
+                    if wait_for(db, s3):
+                        break
             if reports:
-                session.commit()
+                try:
+                    db.call(session.commit, retry=False)
+                except Exception as err:
+                    logger.error(f'Ошибка сохранения результатов обработки: {err}')
             logger.info('Обработка завершена')
+        if USAGE_ACCOUNTING:
+            save_usage(usage)
         if corrupted_count:
             print(f'{corrupted_count}/{len(reports)} отчетов не удалось создать:')
             for k, v in errors.items():
                 print('Отчет ' + k + ': ' + v)
+        if recycle:
+            if executor is not None:
+                executor.shutdown()
+            return
+
+        # отложенные планировщиком отчеты обрабатываются без ожидания
+        if scheduler.deferred:
+            continue
+        print(f'Новый поиск запросов через {WORKER_POLL_INTERVAL:g} сек...')
+        time.sleep(WORKER_POLL_INTERVAL)
+
 
-        print('Новый поиск запросов через 60 сек...')
-        time.sleep(60)
+def run_worker(target_status_id: int, success_status_id: int):
+    """
+    Запуск обработчика в дочернем процессе с перезапуском. Дочерний процесс завершается после
+    WORKER_MAX_REPORTS отчетов или превышения WORKER_MAX_RSS_MB, что возвращает всю накопленную
+    (в т.ч. фрагментированную) память ОС
+    :param target_status_id: целевой статус для взятия запроса в обработку
+    :param success_status_id: статус, устанавливаемый для запросов в случае успешной обработки
+    :return:
+    """
+    while True:
+        worker = multiprocessing.Process(target=main_cycle, args=(target_status_id, success_status_id))
+        worker.start()
+        worker.join()
+        if worker.exitcode:
+            logger.warning(f'Процесс-обработчик завершился с кодом {worker.exitcode}, перезапуск через 10 сек...')
+            time.sleep(10)
+        else:
+            logger.info('Перезапуск процесса-обработчика')
 
 
 if __name__ == '__main__':
-    main_cycle(2, 5)
+    # отдельная реплика с WORKER_MODE=reaper удаляет из хранилища файлы удалённых отчетов
+    if REAPER_MODE:
+        run_reaper()
+    else:
+        run_worker(2, 5)
     # with session_maker() as session:
     #     pr = Processor(session)
     #     pr.process_report(114, 'test', 1.5)
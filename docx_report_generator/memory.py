@@ -0,0 +1,139 @@
+import ctypes
+import ctypes.util
+import gc
+import logging
+import os
+import resource
+import sys
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """
+    Текущий объём резидентной памяти процесса (RSS), байт
+    :return: RSS (0, если определить не удалось)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """
+    Пиковый объём резидентной памяти процесса, байт. В Linux читается VmHWM из /proc/self/status -
+    пик с последнего сброса (reset_peak_rss); ru_maxrss сбросом не изменяется и используется,
+    только если VmHWM недоступен (пик за всё время работы процесса)
+    :return: пиковый RSS
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # в Linux значение в килобайтах, в macOS - в байтах
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Сброс пикового RSS процесса (VmHWM) до текущего значения (Linux 4.0+), чтобы peak_rss_bytes
+    возвращал пик за время обработки одного отчёта
+    :return: True, если сброс выполнен
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _load_malloc_trim():
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+        return None
+    try:
+        return getattr(ctypes.CDLL(libc_name), 'malloc_trim', None)
+    except OSError:
+        return None
+
+
+# malloc_trim есть только в glibc (в musl, например в alpine-образе, отсутствует)
+_malloc_trim = _load_malloc_trim()
+
+
+def release_memory():
+    """
+    Освобождение памяти после формирования отчёта: сборка циклических ссылок (деревья python-docx/lxml,
+    DataFrame) и возврат свободной памяти ОС
+    :return: None
+    """
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+class MemoryMonitor:
+    """
+    Контроль потребления памяти процессом-обработчиком: логирование RSS и (опционально) tracemalloc
+    после каждого отчёта и определение необходимости перезапуска процесса
+    """
+
+    def __init__(self, max_reports: int = 0, max_rss_mb: int = 0, use_tracemalloc: bool = False):
+        """
+        :param max_reports: количество отчетов, после которого процесс перезапускается (0 - без ограничения)
+        :param max_rss_mb: объём RSS, МБ, при превышении которого процесс перезапускается (0 - без ограничения)
+        :param use_tracemalloc: отслеживать выделение памяти python-объектами (замедляет работу)
+        """
+        self.max_reports = max_reports
+        self.max_rss_mb = max_rss_mb
+        self.processed = 0
+        if use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def report_done(self, report_id: int | str, count: int = 1):
+        """
+        Освобождает память после обработки отчёта и логирует показатели памяти
+        :param report_id: идентификатор отчёта (или пакета отчетов)
+        :param count: количество обработанных отчетов
+        :return: None
+        """
+        self.processed += count
+        release_memory()
+        message = f'Память после [{report_id}]: RSS {rss_bytes() / MB:.1f} МБ, пик {peak_rss_bytes() / MB:.1f} МБ'
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            message += f', tracemalloc {current / MB:.1f} МБ (пик {peak / MB:.1f} МБ)'
+            tracemalloc.reset_peak()
+        logger.info(message)
+
+    def should_recycle(self) -> bool:
+        """
+        Проверка необходимости перезапуска процесса (по количеству отчетов или объёму RSS)
+        :return: True, если процесс нужно перезапустить
+        """
+        if self.max_reports and self.processed >= self.max_reports:
+            logger.info(f'Обработано {self.processed} отчетов - перезапуск процесса')
+            return True
+        rss = rss_bytes()
+        if self.rss_exceeded(rss):
+            logger.info(f'RSS {rss / MB:.1f} МБ превышает {self.max_rss_mb} МБ - перезапуск процесса')
+            return True
+        return False
+
+    def rss_exceeded(self, rss: int) -> bool:
+        """
+        Проверка превышения max_rss_mb (в т.ч. для процессов-исполнителей конвейера)
+        :param rss: RSS процесса, байт
+        :return: True, если ограничение задано и превышено
+        """
+        return bool(self.max_rss_mb) and rss / MB >= self.max_rss_mb
@@ -0,0 +1,153 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from accounting import UsageRecord, input_bytes, measure
+from fragment_cache import fragment_cache
+from memory import MB, release_memory, rss_bytes
+from report_generator import disable_chart_pool, render_report
+
+logger = logging.getLogger(__name__)
+
+# маркер завершения работы этапа конвейера
+_STOP = object()
+
+
+def render_job(data: dict, header: str, report_id: int, outlier_rate: float,
+               profile: str = None) -> tuple[str, bytes, int, dict]:
+    """
+    Формирование отчёта в процессе-исполнителе
+    :return: имя файла, содержимое docx-файла, RSS процесса-исполнителя после формирования, байт,
+    и показатели формирования (процессорное время и пиковый RSS исполнителя, объём отчёта)
+    """
+    with measure({}) as stats:
+        file = render_report(data, header, report_id, outlier_rate, fragment_cache, profile, stats=stats)
+        name, content = file.name, file.getvalue()
+    del file
+    release_memory()
+    return name, content, rss_bytes(), stats
+
+
+def render_executor(workers: int, max_reports: int = 0) -> ProcessPoolExecutor:
+    """
+    Пул процессов-исполнителей конвейера
+    :param workers: количество процессов
+    :param max_reports: количество отчетов, после которого процесс-исполнитель перезапускается (0 - без ограничения)
+    :return: ProcessPoolExecutor
+    """
+    # при нескольких процессах-исполнителях диаграммы строятся в процессе отчёта (см. disable_chart_pool)
+    return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_reports or None,
+                               initializer=disable_chart_pool if workers > 1 else None)
+
+
+class ReportPipeline:
+    """
+    Конвейер обработки отчетов: скачивание данных -> формирование docx -> отправка в хранилище.
+    Этапы связаны очередями ограниченного размера: пока формируется текущий отчёт, данные следующих
+    уже скачиваются, а предыдущий отправляется в хранилище. При заполнении очереди предыдущий этап
+    приостанавливается, поэтому заранее скачивается не больше queue_size отчетов
+    """
+
+    def __init__(self, processor, executor: Executor, render_concurrency: int, queue_size: int = 2,
+                 io_concurrency: int = 4, outlier_rate: float = 1.5):
+        """
+        :param processor: объект main.Processor (скачивание данных и отправка файлов)
+        :param executor: пул процессов для формирования отчетов
+        :param render_concurrency: количество одновременно формируемых отчетов (размер пула)
+        :param queue_size: размер очередей между этапами
+        :param io_concurrency: количество одновременных скачиваний и отправок
+        :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
+        """
+        self.processor = processor
+        self.executor = executor
+        self.queue_size = queue_size
+        self.io_concurrency = io_concurrency
+        self.render_concurrency = render_concurrency
+        self.outlier_rate = outlier_rate
+
+        self.completed: dict[int, str] = {}
+        self.errors: dict[str, str] = {}
+        # затраты ресурсов на отчеты; процессорное время и пиковый RSS - только этапа формирования
+        self.usage: dict[int, UsageRecord] = {}
+        # процесс-исполнитель аварийно завершился (OOM, segfault) - пул непригоден и должен быть пересоздан
+        self.broken = False
+        # максимальный RSS процессов-исполнителей после формирования отчетов пакета, байт
+        self.max_worker_rss = 0
+
+    async def run(self, reports) -> tuple[dict[int, str], dict[str, str]]:
+        """
+        Обработка пакета отчетов
+        :param reports: строки main.Processor.get_reports
+        :return: словарь успешно обработанных отчетов (идентификатор: путь в хранилище) и словарь ошибок
+        """
+        todo = asyncio.Queue()
+        for report in reports:
+            todo.put_nowait((report[0], report[1], self.processor.report_profile(report)))
+            self.usage[report.id] = UsageRecord(report.id, report.product_id, self.processor.report_profile(report))
+        to_render = asyncio.Queue(maxsize=self.queue_size)
+        to_upload = asyncio.Queue(maxsize=self.queue_size)
+
+        fetchers = [asyncio.create_task(self._fetch(todo, to_render)) for _ in range(self.io_concurrency)]
+        renderers = [asyncio.create_task(self._render(to_render, to_upload)) for _ in range(self.render_concurrency)]
+        uploaders = [asyncio.create_task(self._upload(to_upload)) for _ in range(self.io_concurrency)]
+
+        await asyncio.gather(*fetchers)
+        for _ in renderers:
+            await to_render.put(_STOP)
+        await asyncio.gather(*renderers)
+        for _ in uploaders:
+            await to_upload.put(_STOP)
+        await asyncio.gather(*uploaders)
+        return self.completed, self.errors
+
+    async def _fetch(self, todo: asyncio.Queue, to_render: asyncio.Queue):
+        while not todo.empty():
+            report_id, header, profile = todo.get_nowait()
+            try:
+                with self.usage[report_id].stage('fetch'):
+                    data = await asyncio.to_thread(self.processor.get_data_content, report_id)
+                if not data:
+                    raise IOError('Нет данных для создания отчета')
+                self.usage[report_id].input_bytes = input_bytes(data)
+            except Exception as err:
+                self.errors[str(report_id)] = str(err)
+                continue
+            await to_render.put((report_id, header, profile, data))
+
+    async def _render(self, to_render: asyncio.Queue, to_upload: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while (item := await to_render.get()) is not _STOP:
+            report_id, header, profile, data = item
+            logger.info(f'Формирование файла [{report_id}]...')
+            try:
+                with self.usage[report_id].stage('render'):
+                    file_name, content, worker_rss, stats = await loop.run_in_executor(
+                        self.executor, render_job, data, header, report_id, self.outlier_rate, profile)
+                self.usage[report_id].update(stats)
+                self.usage[report_id].output_bytes = len(content)
+                self.max_worker_rss = max(self.max_worker_rss, worker_rss)
+                logger.info(f'Файл [{report_id}] сформирован, RSS процесса-исполнителя {worker_rss / MB:.1f} МБ')
+            except BrokenProcessPool as err:
+                self.broken = True
+                self.errors[str(report_id)] = f'процесс-исполнитель аварийно завершился: {err}'
+                continue
+            except Exception as err:
+                self.errors[str(report_id)] = str(err)
+                continue
+            await to_upload.put((report_id, file_name, content))
+
+    async def _upload(self, to_upload: asyncio.Queue):
+        while (item := await to_upload.get()) is not _STOP:
+            report_id, file_name, content = item
+            try:
+                with self.usage[report_id].stage('upload'):
+                    s3_filepath = await asyncio.to_thread(
+                        self.processor.upload_to_s3, io.BytesIO(content), file_name, report_id)
+            except Exception as err:
+                self.errors[str(report_id)] = str(err)
+                continue
+            self.completed[report_id] = s3_filepath
+            self.usage[report_id].success = True
+            logger.info(f'Обработка отчета [{report_id}] завершена')
@@ -0,0 +1,145 @@
+import logging
+import time
+
+from sqlalchemy import func, select, update, and_
+
+from database.db import db, session_maker
+from database.models import Report
+from resilience import wait_for
+from s3_storage import REMOVE_BATCH_SIZE, s3, storage
+from settings import REAPER_BATCH_SIZE, REAPER_INTERVAL, REAPER_OBJECTS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+# все файлы отчёта (выгрузки csv, docx-отчёт) хранятся под общим префиксом
+REPORT_PREFIX = 'products_report_generator/{report_id}/'
+
+
+class RateLimiter:
+    """
+    Ограничение скорости: в среднем не больше rate единиц в секунду
+    """
+
+    def __init__(self, rate: float):
+        """
+        :param rate: единиц в секунду (0 - без ограничения)
+        """
+        self.rate = rate
+        self.next_at = time.monotonic()
+
+    def acquire(self, amount: int):
+        """
+        Ожидание возможности выполнить операцию над amount единицами
+        :param amount: количество единиц
+        :return: None
+        """
+        if not self.rate:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + amount / self.rate
+
+
+class S3Reaper:
+    """
+    Удаление из хранилища файлов отчетов с флагом to_delete. Отчеты обрабатываются пакетами,
+    объекты нескольких отчетов удаляются общими запросами remove_objects (до REMOVE_BATCH_SIZE объектов)
+    с ограничением скорости, чтобы не создавать нагрузку на хранилище. Обработанные отчеты отмечаются
+    в БД (s3_purged_at) и больше не выбираются
+    """
+
+    def __init__(self, batch_size: int = REAPER_BATCH_SIZE, objects_per_second: float = REAPER_OBJECTS_PER_SECOND):
+        """
+        :param batch_size: количество отчетов за один цикл
+        :param objects_per_second: максимальная скорость удаления, объектов в секунду (0 - без ограничения)
+        """
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(objects_per_second)
+
+    def get_reports(self, session) -> list[int]:
+        """
+        Идентификаторы удалённых пользователем отчетов, файлы которых ещё не удалены из хранилища
+        :param session: сессия БД
+        :return: список идентификаторов
+        """
+        stmt = (
+            select(Report.id).
+            where(and_(Report.to_delete == True, Report.s3_purged_at.is_(None))).
+            order_by(Report.id).
+            limit(self.batch_size)
+        )
+        return db.call(lambda: session.scalars(stmt).all(), on_error=session.rollback)
+
+    def remove(self, obj_names: list[str]):
+        """
+        Удаление объектов запросами по REMOVE_BATCH_SIZE объектов с ограничением скорости
+        :param obj_names: имена объектов
+        :return: None
+        """
+        for i in range(0, len(obj_names), REMOVE_BATCH_SIZE):
+            chunk = obj_names[i:i + REMOVE_BATCH_SIZE]
+            self.limiter.acquire(len(chunk))
+            storage.remove_objects(chunk)
+
+    def purge(self, session) -> int:
+        """
+        Один цикл удаления: файлы пакета отчетов удаляются из хранилища, отчеты отмечаются в БД.
+        При ошибке отчеты пакета не отмечаются и обрабатываются повторно (удаление идемпотентно)
+        :param session: сессия БД
+        :return: количество обработанных отчетов
+        """
+        report_ids = self.get_reports(session)
+        if not report_ids:
+            return 0
+
+        pending, removed = [], 0
+        for report_id in report_ids:
+            # листинг тоже нагружает хранилище и учитывается ограничением скорости
+            self.limiter.acquire(1)
+            pending += storage.list_object_names(REPORT_PREFIX.format(report_id=report_id))
+            # полные пакеты удаляются сразу, остаток - вместе с объектами следующих отчетов
+            full = len(pending) - len(pending) % REMOVE_BATCH_SIZE
+            self.remove(pending[:full])
+            removed += full
+            pending = pending[full:]
+        self.remove(pending)
+        removed += len(pending)
+
+        db.call(session.execute,
+                update(Report).values(s3_purged_at=func.now()).where(Report.id.in_(report_ids)),
+                retry=False)
+        db.call(session.commit, retry=False)
+        logger.info(f'Удалены файлы {len(report_ids)} отчетов ({removed} объектов)')
+        return len(report_ids)
+
+
+def run_reaper(reaper: S3Reaper = None):
+    """
+    Бесконечный цикл удаления файлов отчетов. Пока находятся полные пакеты отчетов, следующий пакет
+    обрабатывается без ожидания (скорость ограничивается S3Reaper), иначе - через REAPER_INTERVAL секунд
+    :param reaper: объект S3Reaper
+    :return: None
+    """
+    reaper = reaper or S3Reaper()
+    while True:
+        delay = wait_for(db, s3)
+        if delay:
+            logger.warning(f'Зависимости недоступны, удаление файлов отложено на {delay:.0f} сек')
+            time.sleep(delay)
+            continue
+        with session_maker() as session:
+            try:
+                purged = reaper.purge(session)
+            except Exception as err:
+                logger.error(f'Ошибка удаления файлов отчетов: {err}')
+                session.rollback()
+                purged = 0
+        if purged < reaper.batch_size:
+            time.sleep(REAPER_INTERVAL)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[{asctime}] #{levelname:4} {name}:{lineno} - {message}',
+                        style='{')
+    run_reaper()
@@ -1,18 +1,34 @@
-import datetime
 import io
+import logging
 import math
+import multiprocessing
 import os
 import textwrap
-from datetime import timedelta
-import re
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cached_property
+from xml.sax.saxutils import escape
 
 import numpy as np
-import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
 import pandas as pd
 from docx import Document
-from docx.shared import Inches, Pt, Cm
+from docx.shared import Inches, Pt, Cm, Emu
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from deadline import ReportDeadline
+from fragment_cache import Fragment, FragmentCache
+from input_files import CSV_COMPRESSION
+from report_model import Chart, ReportModel, Section, Table
+from section_graph import SectionGraph
+from settings import REPORT_CHART_PROCESSES, REPORT_DEADLINE, REPORT_DETAILED_ITEMS, REPORT_SECTION_WORKERS
+
+logger = logging.getLogger(__name__)
 
 
 class FormatterMixin:
@@ -21,26 +37,22 @@ class FormatterMixin:
     """
 
     @staticmethod
-    def great_or_less_string(a: int | float | np.int64 | datetime.time,
-                             b: int | float | np.int64 | datetime.time) -> str:
+    def great_or_less_string(a: int | float | np.number, b: int | float | np.number) -> str:
         """
         Метод для генерирования строки, информирующей о том больше или меньше параметр a параметра b
-        :param a: левый операнд
-        :param b: правый операнд
+        :param a: левый операнд (число или время в секундах)
+        :param b: правый операнд (число или время в секундах)
         :return: строку больше|меньше|значительно/незначительно больше|значительно/незначительно меньше
         """
         state_flags = ['больше', 'меньше']
         ind = bool(a < b)
-        if isinstance(a, int | float | np.int64) and isinstance(b, int | float | np.int64):
-            data = (a, b)
-        elif isinstance(a, datetime.time) and isinstance(b, datetime.time):
-            d1 = timedelta(hours=a.hour, minutes=a.minute, seconds=a.second)
-            d2 = timedelta(hours=b.hour, minutes=b.minute, seconds=b.second)
-            data = (d1, d2)
-        else:
+        if not (isinstance(a, int | float | np.number) and isinstance(b, int | float | np.number)):
             return NotImplemented
 
-        ratio = max(data) / min(data)
+        if min(a, b) == 0:
+            ratio = math.inf if max(a, b) else 1
+        else:
+            ratio = max(a, b) / min(a, b)
         if ratio >= 1.5:
             return 'значительно ' + state_flags[ind]
         elif ratio <= 1.02:
@@ -49,23 +61,17 @@ class FormatterMixin:
             return state_flags[ind]
 
     @staticmethod
-    def great_or_less_range(a: int | float, b: int | float) -> str:
+    def great_or_less_range(a: int | float | np.number, b: int | float | np.number) -> str:
         """
         Метод проверяет во сколько раз больше (меньше) параметр a параметра b
-        :param a: левый операнд
-        :param b: правый операнд
+        :param a: левый операнд (число или время в секундах)
+        :param b: правый операнд (число или время в секундах)
         :return: str - в N раз больше
         """
-        if isinstance(a, int | float) and isinstance(b, int | float):
-            data = (a, b)
-        elif isinstance(a, datetime.time) and isinstance(b, datetime.time):
-            d1 = timedelta(hours=a.hour, minutes=a.minute, seconds=a.second)
-            d2 = timedelta(hours=b.hour, minutes=b.minute, seconds=b.second)
-            data = (d1, d2)
-        else:
+        if not (isinstance(a, int | float | np.number) and isinstance(b, int | float | np.number)):
             return NotImplemented
 
-        ratio = round(max(data) / min(data), 2)
+        ratio = round(float(max(a, b) / min(a, b)), 2)
         if a > b:
             return f'в {ratio} раз больше'
         elif a < b:
@@ -81,12 +87,9 @@ class FormatterMixin:
         :param label: метка столбца, по которому происходит поиск выбросов
         :return: объект DataFrame, содержащий строки с наличием выбросов в столбце label
         """
-        df = df.copy(deep=True)
         if not is_campaigns:
             # удаляем строку лендинг из выборки для всех наборов меток кроме CAMPAIGN_LABELS
             df = df.drop([0])
-        # переводим время в число для сравнения
-        df.time = df.time.apply(lambda t: (t.hour * 60 + t.minute) * 60 + t.second)
         df = df[df[label] > 0]
         # квартили распределения
         # если количество элементов больше 2 ищем квартиль на основе медиан
@@ -102,13 +105,6 @@ class FormatterMixin:
         pos_outliers = df[df[label] >= IQR * outliers_rate]
         normal_distribution = df[df[label].between(-abs(IQR * outliers_rate), IQR * outliers_rate)]
         neg_outliers = df[df[label] <= -abs(IQR * outliers_rate)]
-        # возвращаем число секунд в объект datetime.time
-        pos_outliers = pos_outliers.assign(time=pos_outliers['time'].apply(
-            lambda ts: datetime.time(hour=ts // 3600 // 60, minute=ts % 3600 // 60, second=ts % 60)))
-        normal_distribution = normal_distribution.assign(time=normal_distribution['time'].apply(
-            lambda ts: datetime.time(hour=ts // 3600 // 60, minute=ts % 3600 // 60, second=ts % 60)))
-        neg_outliers = neg_outliers.assign(time=neg_outliers['time'].apply(
-            lambda ts: datetime.time(hour=ts // 3600 // 60, minute=ts % 3600 // 60, second=ts % 60)))
         return pos_outliers, normal_distribution, neg_outliers
 
     @staticmethod
@@ -121,15 +117,27 @@ class FormatterMixin:
         return f"{num:,}".replace(",", " ")
 
     @staticmethod
-    def time_to_str(time: datetime.time):
+    def float_to_str(num) -> str:
         """
-        Метод форматирует объект datetime.time в удобочитаемую строку
-        :param time:
+        Метод форматирует дробное число (в т.ч. float32) с точностью до 2 знаков после запятой
+        :param num:
         :return:
         """
-        if time.hour:
-            return time.strftime('%H:%M:%S')
-        return time.strftime('%M:%S')
+        return str(round(float(num), 2))
+
+    @staticmethod
+    def time_to_str(seconds: int, full: bool = False) -> str:
+        """
+        Метод форматирует время в секундах в удобочитаемую строку
+        :param seconds: время, сек
+        :param full: всегда выводить часы (ЧЧ:ММ:СС)
+        :return:
+        """
+        hours, rest = divmod(int(seconds), 3600)
+        minutes, seconds = divmod(rest, 60)
+        if hours or full:
+            return f'{hours:02}:{minutes:02}:{seconds:02}'
+        return f'{minutes:02}:{seconds:02}'
 
     @staticmethod
     def end_word_formatter(word: str, number: int) -> str:
@@ -156,165 +164,271 @@ class FormatterMixin:
 
 class Data:
     """
-    Класс для считывания и первичного форматирования данных из csv-файлов
+    Класс для считывания и первичного форматирования данных из csv-файлов (в т.ч. сжатых) и parquet-файлов
     """
 
-    def __init__(self, cur_rk_path, org_path, prev_rk_path, groups_path, campaign_path):
-        self.RK_LABELS = ['action', 'views', 'conv_views', 'visits', 'conv_visits', 'aborted', 'perc_aborted', 'depth',
-                          'time',
-                          'new_users_with_abort', 'perc_new_users_with_abort', 'new_users', 'perc_new_users']
-        self.CAMPAIGN_LABELS = ['action', 'views', 'visits', 'aborted', 'perc_aborted', 'depth', 'time',
-                                'new_users_with_abort', 'perc_new_users_with_abort', 'new_users', 'perc_new_users']
-        self.ORG_LABELS = ['serivce', 'views', 'visists', 'perc_aborted', 'depth', 'time', 'perc_new_users']
-        self.cur_rk_df = self.read_rk_csv(cur_rk_path)
-        self.org_df = self.read_org_csv(org_path)
-        self.prev_rk_df = self.read_rk_csv(prev_rk_path)
-        self.groups_df = self.read_campaign_csv(groups_path)
-        self.campaigns_df = self.read_campaign_csv(campaign_path)
-
-    def read_rk_csv(self, content: str):
+    # типы столбцов для каждого из форматов csv-файлов: строковый тип pandas для названий (хранится в формате
+    # Arrow, если установлен pyarrow; категории не используются - названия действий и кампаний уникальны),
+    # int32 для количеств, float32 для долей и средних значений, время - целое число секунд
+    RK_DTYPES = {
+        'action': 'str', 'views': 'int32', 'conv_views': 'float32', 'visits': 'int32', 'conv_visits': 'float32',
+        'aborted': 'int32', 'perc_aborted': 'float32', 'depth': 'float32', 'time': 'int32',
+        'new_users_with_abort': 'int32', 'perc_new_users_with_abort': 'float32', 'new_users': 'int32',
+        'perc_new_users': 'float32'
+    }
+    CAMPAIGN_DTYPES = {
+        'action': 'str', 'views': 'int32', 'visits': 'int32', 'aborted': 'int32', 'perc_aborted': 'float32',
+        'depth': 'float32', 'time': 'int32', 'new_users_with_abort': 'int32', 'perc_new_users_with_abort': 'float32',
+        'new_users': 'int32', 'perc_new_users': 'float32'
+    }
+    ORG_DTYPES = {
+        'serivce': 'str', 'views': 'int32', 'visists': 'int32', 'perc_aborted': 'float32', 'depth': 'float32',
+        'time': 'int32', 'perc_new_users': 'float32'
+    }
+    RK_LABELS = list(RK_DTYPES)
+    CAMPAIGN_LABELS = list(CAMPAIGN_DTYPES)
+    ORG_LABELS = list(ORG_DTYPES)
+    # столбцы с долями, которые переводятся в проценты
+    PERCENT_LABELS = {'conv_views', 'conv_visits', 'perc_aborted', 'perc_new_users', 'perc_new_users_with_abort'}
+
+    def __init__(self, cur_rk_path, org_path, prev_rk_path, groups_path, campaign_path,
+                 input_formats: dict[str, str] = None):
+        # файлы считываются при первом обращении к соответствующему DataFrame
+        self.cur_rk_content = cur_rk_path
+        self.org_content = org_path
+        self.prev_rk_content = prev_rk_path
+        self.groups_content = groups_path
+        self.campaigns_content = campaign_path
+        # форматы входных файлов (input_files.INPUT_FORMATS), по-умолчанию - csv
+        self.input_formats = input_formats or {}
+
+    @cached_property
+    def cur_rk_df(self) -> pd.DataFrame:
+        return self.read_rk_csv(self.cur_rk_content, input_format=self.input_formats.get('cur_rk', 'csv'))
+
+    @cached_property
+    def prev_rk_df(self) -> pd.DataFrame:
+        # из предыдущей РК используется только строка лендинга
+        return self.read_rk_csv(self.prev_rk_content, nrows=1, input_format=self.input_formats.get('prev_rk', 'csv'))
+
+    @cached_property
+    def org_df(self) -> pd.DataFrame:
+        # из органического трафика используется только первая строка
+        return self.read_org_csv(self.org_content, nrows=1, input_format=self.input_formats.get('org', 'csv'))
+
+    @cached_property
+    def groups_df(self) -> pd.DataFrame:
+        return self.read_campaign_csv(self.groups_content, input_format=self.input_formats.get('groups', 'csv'))
+
+    @cached_property
+    def campaigns_df(self) -> pd.DataFrame:
+        return self.read_campaign_csv(self.campaigns_content,
+                                      input_format=self.input_formats.get('campaigns', 'csv'))
+
+    def row_counts(self) -> dict[str, int]:
+        """
+        Количество строк входных данных (без заголовка) - по считанному DataFrame, иначе по числу строк
+        csv-файла без его разбора; для не считанных сжатых и parquet-файлов не определяется
+        :return: словарь - имя параметра ReportGenerator: количество строк
+        """
+        counts = {}
+        for key in ('cur_rk', 'prev_rk', 'org', 'groups', 'campaigns'):
+            df = self.__dict__.get(f'{key}_df')
+            # из предыдущей РК и органического трафика считывается только первая строка
+            if df is not None and key not in ('prev_rk', 'org'):
+                counts[key] = len(df)
+                continue
+            content = getattr(self, f'{key}_content')
+            if content and self.input_formats.get(key, 'csv') == 'csv':
+                newline = '\n' if isinstance(content, str) else b'\n'
+                counts[key] = max(0, content.count(newline) - content.endswith(newline))
+        return counts
+
+    @staticmethod
+    def read_table(content: str | bytes, nrows: int = None, input_format: str = 'csv') -> pd.DataFrame:
+        """
+        Чтение входного файла в DataFrame (столбцы - как в исходном файле)
+        :param content: содержимое файла (bytes) или уже декодированный csv (str)
+        :param nrows: количество считываемых строк (None - все строки)
+        :param input_format: формат файла (csv, csv.gz, csv.zst, parquet)
+        :return: объект pandas.DataFrame
+        """
+        if isinstance(content, str):
+            return pd.read_csv(io.StringIO(content), nrows=nrows)
+        # BytesIO использует переданный буфер без копирования, декодирование выполняет парсер pandas;
+        # выгрузки содержат BOM, который отбрасывается кодировкой utf-8-sig
+        if input_format == 'parquet':
+            df = pd.read_parquet(io.BytesIO(content))
+            return df if nrows is None else df.head(nrows)
+        return pd.read_csv(io.BytesIO(content), nrows=nrows, encoding='utf-8-sig',
+                           compression=CSV_COMPRESSION[input_format])
+
+    def read_rk_csv(self, content: str | bytes, nrows: int = None, input_format: str = 'csv'):
         """
         Чтение данных из csv формата RK_LABELS
         :param filename: путь к файлу
+        :param nrows: количество считываемых строк (None - все строки)
+        :param input_format: формат файла (см. read_table)
         :return: объект pandas.DataFrame
         """
         if not content:
             return pd.DataFrame()
 
-        rk_df = pd.read_csv(io.StringIO(content))
-        if len(rk_df.values[0]) != len(self.RK_LABELS):
+        rk_df = self.read_table(content, nrows, input_format)
+        if len(rk_df.columns) != len(self.RK_LABELS):
             return pd.DataFrame()
         rk_df.columns = self.RK_LABELS
+        return self.apply_dtypes(rk_df, self.RK_DTYPES)
 
-        rk_df.conv_views = pd.to_numeric(rk_df.conv_views)
-        rk_df.conv_views = rk_df.conv_views.apply(self.percent_formatter)
-
-        rk_df.conv_visits = pd.to_numeric(rk_df.conv_visits)
-        rk_df.conv_visits = rk_df.conv_visits.apply(self.percent_formatter)
-
-        rk_df.perc_aborted = rk_df.perc_aborted.apply(self.percent_formatter)
-        rk_df.depth = rk_df.depth.apply(self.float_formatter)
-        rk_df.time = rk_df.time.apply(self.str_to_time)
-        rk_df.perc_new_users = rk_df.perc_new_users.apply(self.percent_formatter)
-        rk_df.perc_new_users_with_abort = rk_df.perc_new_users_with_abort.apply(self.percent_formatter)
-
-        return rk_df
-
-    def read_org_csv(self, content: str):
+    def read_org_csv(self, content: str | bytes, nrows: int = None, input_format: str = 'csv'):
         """
         Чтение данных из csv формата ORG_LABELS
         :param filename: путь к файлу
+        :param nrows: количество считываемых строк (None - все строки)
+        :param input_format: формат файла (см. read_table)
         :return: объект pandas.DataFrame
         """
-        org_df = pd.read_csv(io.StringIO(content))
+        org_df = self.read_table(content, nrows, input_format)
         org_df.columns = self.ORG_LABELS
-        org_df.perc_aborted = org_df.perc_aborted.apply(self.percent_formatter)
-        org_df.depth = org_df.depth.apply(self.float_formatter)
-        org_df.time = org_df.time.apply(self.str_to_time)
-        org_df.perc_new_users = org_df.perc_new_users.apply(self.percent_formatter)
+        return self.apply_dtypes(org_df, self.ORG_DTYPES)
 
-        return org_df
-
-    def read_campaign_csv(self, content: str):
+    def read_campaign_csv(self, content: str | bytes, input_format: str = 'csv'):
         """
         Чтение данных из csv формата CAMPAIGN_LABELS
         :param filename: путь к файлу
+        :param input_format: формат файла (см. read_table)
         :return: объект pandas.DataFrame
         """
         if content:
-            campaign_df = pd.read_csv(io.StringIO(content))
+            campaign_df = self.read_table(content, input_format=input_format)
             campaign_df.columns = self.CAMPAIGN_LABELS
+            return self.apply_dtypes(campaign_df, self.CAMPAIGN_DTYPES)
 
-            campaign_df.perc_aborted = campaign_df.perc_aborted.apply(self.percent_formatter)
-            campaign_df.depth = campaign_df.depth.apply(self.float_formatter)
-            campaign_df.time = campaign_df.time.apply(self.str_to_time)
-            campaign_df.perc_new_users = campaign_df.perc_new_users.apply(self.percent_formatter)
-            campaign_df.perc_new_users_with_abort = campaign_df.perc_new_users_with_abort.apply(self.percent_formatter)
-
-            return campaign_df
+    @classmethod
+    def apply_dtypes(cls, df: pd.DataFrame, dtypes: dict[str, str]) -> pd.DataFrame:
+        """
+        Приведение столбцов к компактным типам: доли переводятся в проценты, дробные числа округляются
+        до 2 знаков после запятой, время (ЧЧ:ММ:СС) - в число секунд
+        :param df: DataFrame с переименованными столбцами
+        :param dtypes: типы столбцов (RK_DTYPES, CAMPAIGN_DTYPES, ORG_DTYPES)
+        :return: объект pandas.DataFrame
+        """
+        for label, dtype in dtypes.items():
+            column = df[label]
+            if label == 'time':
+                df[label] = cls.time_to_seconds(column)
+            elif dtype == 'str':
+                df[label] = column.astype(dtype)
+            elif dtype == 'float32':
+                column = pd.to_numeric(column, errors='coerce')
+                if label in cls.PERCENT_LABELS:
+                    column = column * 100
+                df[label] = column.round(2).astype(dtype)
+            else:
+                df[label] = pd.to_numeric(column, errors='coerce').fillna(0).astype(dtype)
+        return df
 
     @staticmethod
-    def percent_formatter(num):
+    def time_to_seconds(column: pd.Series) -> pd.Series:
         """
-        Метод форматирует дробные числа в проценты
-        :param num:
+        Метод переводит строки формата ЧЧ:ММ:СС в число секунд (некорректные значения - 0)
+        :param column:
         :return:
         """
-        return round(float(num) * 100, 2)
+        # в parquet-файлах время может храниться в виде интервала
+        if pd.api.types.is_timedelta64_dtype(column):
+            return column.dt.total_seconds().fillna(0).astype('int32')
+        parsed = column.astype(str).str.extract(r'^(\d\d):(\d\d):(\d\d)')
+        parsed = parsed.apply(pd.to_numeric).fillna(0)
+        return (parsed[0] * 3600 + parsed[1] * 60 + parsed[2]).astype('int32')
 
-    @staticmethod
-    def str_to_time(t: str):
+
+class SectionWriter(FormatterMixin):
+    """
+    Класс для формирования пунктов отчёта (объектов report_model.Section) по входным данным
+    """
+
+    # входные данные, используемые каждым из пунктов отчёта (для ключей кэша фрагментов)
+    SECTION_INPUTS = {
+        'general': ('cur_rk', 'prev_rk', 'org'),
+        'page_views': ('cur_rk',),
+        'funnel_graph': ('cur_rk',),
+        'outliers': ('cur_rk',),
+        'groups': ('groups', 'campaigns'),
+    }
+
+    def __init__(self, cur_rk, org, prev_rk, groups, campaigns, input_formats: dict[str, str] = None,
+                 deadline: ReportDeadline = None, detailed_items: int = REPORT_DETAILED_ITEMS):
         """
-        Метод форматирует строку, соответствующего формата в объект datetime.time
-        :param t:
-        :return:
+        :param deadline: ограничение времени формирования отчёта (None - без ограничения)
+        :param detailed_items: количество элементов перечня, описываемых подробно, остальные
+        выводятся таблицей (0 - все элементы описываются подробно)
         """
-        t_format = r'\d\d:\d\d:\d\d'
-        if isinstance(t, str) and re.match(t_format, t):
-            return datetime.datetime.strptime(t, '%H:%M:%S').time()
-        else:
-            new_t = datetime.date.today()
-            return datetime.datetime(new_t.year, new_t.month, new_t.day, 0, 0, 0)
+        self.data = Data(cur_rk, org, prev_rk, groups, campaigns, input_formats)
+        self.deadline = deadline
+        self.detailed_items = detailed_items
 
-    @staticmethod
-    def float_formatter(num):
+    def item_limit(self) -> int | None:
         """
-        Метод форматирует float-числа до 2 знаков после запятой
-        :param num:
-        :return:
+        Максимальное количество элементов перечня с учетом оставшегося времени (None - без ограничения)
         """
-        return round(float(num), 2)
+        return self.deadline.item_limit() if self.deadline is not None else None
 
+    @property
+    def cur_rk_df(self) -> pd.DataFrame:
+        return self.data.cur_rk_df
 
-class SectionWriter(FormatterMixin):
-    """
-    Класс для записи пунктов в формирующийся документ (отчёт)
-    """
+    @property
+    def prev_rk_df(self) -> pd.DataFrame:
+        return self.data.prev_rk_df
+
+    @property
+    def org_df(self) -> pd.DataFrame:
+        return self.data.org_df
 
-    def __init__(self, document, cur_rk, org, prev_rk, groups, campaigns):
-        self.document = document
+    @property
+    def groups_df(self) -> pd.DataFrame:
+        return self.data.groups_df
 
-        data = Data(cur_rk, org, prev_rk, groups, campaigns)
-        self.cur_rk_df = data.cur_rk_df
-        self.prev_rk_df = data.prev_rk_df
-        self.org_df = data.org_df
-        self.groups_df = data.groups_df
-        self.campaigns_df = data.campaigns_df
+    @property
+    def campaigns_df(self) -> pd.DataFrame:
+        return self.data.campaigns_df
 
-    def write_general_section(self):
+    def write_general_section(self) -> Section:
         """
         Общие показатели
-        :return:
+        :return: объект Section
         """
+        section = Section('general')
 
         # ВИЗИТЫ
-        self.document.add_paragraph('Общие показатели:', style='List Number')
-        p = self.document.add_paragraph(style='List Bullet')
+        section.add_paragraph('Общие показатели:', style='List Number')
+        p = section.add_paragraph(style='List Bullet')
         p.add_run(f'Было привлечено ')
         p.add_run(f'{self.number_formatter(self.cur_rk_df.views.iloc[0])} уникальных посетителей').bold = True
         p.add_run(f' и совершено ')
         p.add_run(f'{self.number_formatter(self.cur_rk_df.visits.iloc[0])} визитов.').bold = True
 
         # ДОЛЯ ОТКАЗОВ
-        p = self.document.add_paragraph(style='List Bullet')
+        p = section.add_paragraph(style='List Bullet')
         p.add_run('Доля отказов').bold = True
         if not self.prev_rk_df.empty:
             p.add_run(
-                f' составила {self.cur_rk_df.perc_aborted.iloc[0]} % что ' \
+                f' составила {self.float_to_str(self.cur_rk_df.perc_aborted.iloc[0])} % что ' \
                 f'{self.great_or_less_string(self.prev_rk_df.perc_aborted.iloc[0], self.org_df.perc_aborted.iloc[0])}, ' \
-                f'чем в органическом трафике ({self.org_df.perc_aborted.iloc[0]} %) и ' \
+                f'чем в органическом трафике ({self.float_to_str(self.org_df.perc_aborted.iloc[0])} %) и ' \
                 f'{self.great_or_less_string(self.cur_rk_df.perc_aborted.iloc[0], self.prev_rk_df.perc_aborted.iloc[0])}, ' \
-                f'чем в предыдущей РК ({self.prev_rk_df.perc_aborted.iloc[0]} %).'
+                f'чем в предыдущей РК ({self.float_to_str(self.prev_rk_df.perc_aborted.iloc[0])} %).'
             )
         else:
             p.add_run(
-                f' составила {self.cur_rk_df.perc_aborted.iloc[0]} % что ' \
+                f' составила {self.float_to_str(self.cur_rk_df.perc_aborted.iloc[0])} % что ' \
                 f'{self.great_or_less_string(self.cur_rk_df.perc_aborted.iloc[0], self.org_df.perc_aborted.iloc[0])}, ' \
-                f'чем в органическом трафике ({self.org_df.perc_aborted.iloc[0]} %).'
+                f'чем в органическом трафике ({self.float_to_str(self.org_df.perc_aborted.iloc[0])} %).'
             )
 
         # ГЛУБИНА ПРОСМОТРА
-        p_depth = self.document.add_paragraph(style='List Bullet')
+        p_depth = section.add_paragraph(style='List Bullet')
 
         cur_depth = self.cur_rk_df.depth.iloc[0]
         org_depth = self.org_df.depth.iloc[0]
@@ -325,22 +439,22 @@ class SectionWriter(FormatterMixin):
             prev_depth = self.prev_rk_df.depth.iloc[0]
             cur_prev_compare_list = [cur_depth, prev_depth]
             p_depth.add_run(
-                f' составляет в среднем {self.cur_rk_df.depth.iloc[0]} стр., это ' \
+                f' составляет в среднем {self.float_to_str(self.cur_rk_df.depth.iloc[0])} стр., это ' \
                 f'{self.great_or_less_string(cur_depth, org_depth)} ' \
-                f'(в {round(max(cur_org_compare_list) / min(cur_org_compare_list), 2)} раз), ' \
-                f'чем по органике ({org_depth} стр.), и ' \
+                f'(в {self.float_to_str(max(cur_org_compare_list) / min(cur_org_compare_list))} раз), ' \
+                f'чем по органике ({self.float_to_str(org_depth)} стр.), и ' \
                 f'{self.great_or_less_string(cur_depth, prev_depth)} ' \
-                f'(в {round(max(cur_prev_compare_list) / min(cur_prev_compare_list), 2)} раз) '
-                f'чем в предыдущей РК ({prev_depth} стр.).')
+                f'(в {self.float_to_str(max(cur_prev_compare_list) / min(cur_prev_compare_list))} раз) '
+                f'чем в предыдущей РК ({self.float_to_str(prev_depth)} стр.).')
         else:
             p_depth.add_run(
-                f' составляет в среднем {self.cur_rk_df.depth.iloc[0]} стр., это ' \
+                f' составляет в среднем {self.float_to_str(self.cur_rk_df.depth.iloc[0])} стр., это ' \
                 f'{self.great_or_less_string(cur_depth, org_depth)} ' \
-                f'(в {round(max(cur_org_compare_list) / min(cur_org_compare_list), 2)} раз), ' \
-                f'чем по органике ({org_depth} стр.).')
+                f'(в {self.float_to_str(max(cur_org_compare_list) / min(cur_org_compare_list))} раз), ' \
+                f'чем по органике ({self.float_to_str(org_depth)} стр.).')
 
         # ВРЕМЯ ПРОСМОТРА
-        p_time = self.document.add_paragraph(style='List Bullet')
+        p_time = section.add_paragraph(style='List Bullet')
 
         cur_time = self.cur_rk_df.time.iloc[0]
         org_time = self.org_df.time.iloc[0]
@@ -359,156 +473,138 @@ class SectionWriter(FormatterMixin):
         cur_perc_new_users = self.cur_rk_df.perc_new_users.iloc[0]
         org_perc_new_users = self.org_df.perc_new_users.iloc[0]
 
-        p_new_users = self.document.add_paragraph(style='List Bullet')
+        p_new_users = section.add_paragraph(style='List Bullet')
         p_new_users.add_run('Доля новых посетителей').bold = True
         if not self.prev_rk_df.empty:
             prev_perc_new_users = self.prev_rk_df.perc_new_users.iloc[0]
-            p_new_users.add_run(f' составила {cur_perc_new_users} % (c учётом отказов),' \
+            p_new_users.add_run(f' составила {self.float_to_str(cur_perc_new_users)} % (c учётом отказов),' \
                                 f' что {self.great_or_less_string(cur_perc_new_users, org_perc_new_users)} результата по ' \
-                                f'органике ({org_perc_new_users} %) и {self.great_or_less_string(cur_perc_new_users, prev_perc_new_users)},' \
-                                f' чем по предыдущей РК ({prev_perc_new_users} % с учётом отказов)')
+                                f'органике ({self.float_to_str(org_perc_new_users)} %) и ' \
+                                f'{self.great_or_less_string(cur_perc_new_users, prev_perc_new_users)},' \
+                                f' чем по предыдущей РК ({self.float_to_str(prev_perc_new_users)} % с учётом отказов)')
         else:
-            p_new_users.add_run(f' составила {cur_perc_new_users} % (c учётом отказов),' \
+            p_new_users.add_run(f' составила {self.float_to_str(cur_perc_new_users)} % (c учётом отказов),' \
                                 f' что {self.great_or_less_string(cur_perc_new_users, org_perc_new_users)} результата по ' \
-                                f'органике ({org_perc_new_users} %).')
+                                f'органике ({self.float_to_str(org_perc_new_users)} %).')
+        return section
 
-    def write_page_views_section(self):
+    def write_page_views_section(self) -> Section:
         """
         Данные посещаемости страниц
-        :return:
+        :return: объект Section
         """
-        p2 = self.document.add_paragraph('Посещение страниц:', style='List Number')
-        p2.paragraph_format.line_spacing = 1.5
-        p2.style.font.size = Pt(12)
+        section = Section('page_views')
+        p2 = section.add_paragraph('Посещение страниц:', style='List Number')
+        p2.line_spacing = 1.5
 
         # ПОСЕЩАЕМОСТЬ
         # замена NaN-значений на 0
         # self.cur_rk_df.fillna(0)
         zeros_actions = self.cur_rk_df[self.cur_rk_df['views'] == 0]
         cur_df = self.cur_rk_df.sort_values(by='views', ascending=False)
+        written = 0
+        rest = None
         for i in range(1, len(cur_df)):
             item = cur_df.iloc[i].replace(np.nan, 0)
             if item.views != 0:
-                p = self.document.add_paragraph(style='List Bullet')
+                # при нехватке времени приводятся только действия с наибольшим числом посетителей
+                limit = self.item_limit()
+                if limit is not None and written >= limit:
+                    total = int((cur_df['views'].iloc[1:].fillna(0) != 0).sum())
+                    self.deadline.shorten(section.name, f'приведены {written} из {total} действий '
+                                                        f'с наибольшим числом посетителей')
+                    break
+                # при большом количестве действий подробно описываются первые detailed_items,
+                # остальные выводятся одной таблицей
+                if self.detailed_items and written >= self.detailed_items:
+                    rest = cur_df.iloc[i:]
+                    break
+                written += 1
+                p = section.add_paragraph(style='List Bullet')
                 if 'посещен' in item.action.lower():
                     p.add_run('Действие ')
                     p.add_run(f'«{item.action}»').bold = True
                     p.add_run(
                         f' привлекло {item.views} {self.end_word_formatter("views", item.views)}. '
-                        f'Конверсия посетителей из лендинга составила {item.conv_views} % '
-                        f'а доля отказов {item.perc_aborted} % '
-                        f'(относительно визитов). Глубина просмотра равна {item.depth} стр. (в среднем, '
+                        f'Конверсия посетителей из лендинга составила {self.float_to_str(item.conv_views)} % '
+                        f'а доля отказов {self.float_to_str(item.perc_aborted)} % '
+                        f'(относительно визитов). Глубина просмотра равна {self.float_to_str(item.depth)} стр. (в среднем, '
                         f'без учёта отказников), время просмотра {self.time_to_str(item.time)} (в среднем, без учёта отказников). '
-                        f'Доля новых пользователей (с учётом отказов) {item.perc_new_users} %.')
+                        f'Доля новых пользователей (с учётом отказов) {self.float_to_str(item.perc_new_users)} %.')
                 else:
                     p.add_run('Действие ')
                     p.add_run(f'«{item.action}»').bold = True
                     p.add_run(
                         f' привлекло {item.views} {self.end_word_formatter("views", item.views)}. '
-                        f'Конверсия посетителей составила {item.conv_views} % '
-                        f'а доля отказов {item.perc_aborted} % '
-                        f'(относительно визитов). Глубина просмотра равна {item.depth} стр. (в среднем, '
+                        f'Конверсия посетителей составила {self.float_to_str(item.conv_views)} % '
+                        f'а доля отказов {self.float_to_str(item.perc_aborted)} % '
+                        f'(относительно визитов). Глубина просмотра равна {self.float_to_str(item.depth)} стр. (в среднем, '
                         f'без учёта отказников), время просмотра {self.time_to_str(item.time)} (в среднем, без учёта отказников);')
 
+        if rest is not None:
+            self.write_page_views_table(section, rest[rest['views'].fillna(0) != 0])
+
         if not zeros_actions.empty:
-            p = self.document.add_paragraph(style='List Bullet')
+            p = section.add_paragraph(style='List Bullet')
             p.add_run('По действиям ')
             p.add_run(f', '.join(f'«{zeros_item}»' for zeros_item in zeros_actions['action'].tolist()))
             # p.add_run(f'«{item.action}» ').bold = True
             p.add_run(' посещений не зафиксировано.')
+        return section
 
-    def write_funnel_graph_section(self):
+    def write_page_views_table(self, section: Section, df: pd.DataFrame):
+        """
+        Таблица посещаемости действий, не описанных подробно
+        :param section: пункт отчёта, в который добавляется таблица
+        :param df: строки действий (Текущая РК)
+        :return: None
+        """
+        df = df.fillna(0)
+        rows = [[action, self.number_formatter(int(views)), self.float_to_str(conv_views),
+                 self.float_to_str(perc_aborted), self.float_to_str(depth), self.time_to_str(seconds)]
+                for action, views, conv_views, perc_aborted, depth, seconds in
+                zip(df['action'], df['views'], df['conv_views'], df['perc_aborted'], df['depth'], df['time'])]
+        section.add_table(['Действие', 'Посетителей', 'Конверсия, %', 'Доля отказов, %', 'Глубина, стр.', 'Время'],
+                          rows, f'Остальные действия ({len(rows)}):', left_indent=0.5)
+
+    def write_funnel_graph_section(self) -> Section:
         """
         Графики-воронки выполнения целевых действий
-        :return:
+        :return: объект Section
         """
-        p3 = self.document.add_paragraph()
-        p3.add_run().add_break(WD_BREAK.PAGE)
-        p3 = self.document.add_paragraph(f'Диаграммы выполнения целевых действий:', style='List Number')
+        section = Section('funnel_graph')
+        p3 = section.add_paragraph()
+        p3.add_run(page_break=True)
+        p3 = section.add_paragraph(f'Диаграммы выполнения целевых действий:', style='List Number')
 
-        picture = self.document.add_paragraph()
+        picture = section.add_paragraph()
 
-        blocks_dict = dict()
-
-        for action in self.cur_rk_df.action[1:]:
-            block_name = action.split(': ')[0]
-            if block_name not in blocks_dict:
-                blocks_dict[block_name] = [action]
-            else:
-                blocks_dict[block_name].append(action)
+        # название блока и подпись действия ("<блок>: <подпись>") выделяются один раз для всех действий
+        # кроме лендинга, после чего действия группируются по блокам в порядке первого появления
+        actions = self.cur_rk_df.iloc[1:]
+        parts = actions['action'].str.split(': ', n=1, expand=True).reindex(columns=[0, 1])
+        actions = actions.assign(block=parts[0], sub_label=parts[1].fillna(''))
+        blocks = actions.groupby('block', sort=False)
+        block_sizes = blocks.size()
 
         # colors = ["#a9d18e", "#ffc000", "#ed7d31", "#5b9bd5", "#4472c4"]
-        if not [1 for item in blocks_dict.values() if len(item) > 2]:
-            picture.paragraph_format.left_indent = Inches(0.5)
+        if not (block_sizes > 2).any():
+            picture.left_indent = 0.5
             picture.add_run('Недостаточно данных для построения диаграмм.').italic = True
-            return
-
-        for action in blocks_dict:
-            if len(blocks_dict[action]) >= 2:
-                df = self.cur_rk_df[self.cur_rk_df['action'].str.contains(action + ':')]
-                fig = plt.figure(figsize=(12, 8))
-
-                # код для создания воронок
-                # y = [1, 3.6]
-                # x1 = [8, 12]
-                # x2 = [6, 2]
-                # for i in range(len(df)):
-                #     # cmap = plt.get_cmap('summer')
-                #     plt.fill_betweenx(y=y, x1=x1, x2=x2, color=colors[i % 5])
-                #     y = [i + 3 for i in y]
-                #     x1 = [i + 4.3 for i in x1]
-                #     x2 = [i - 4.3 for i in x2]
-                # plt.xticks([], [])
-                # plt.yticks([i for i in range(2, len(df) * 3, 3)], df["action"].apply(lambda s: s.split(': ')[1])[::-1],
-                #            wrap=True, fontsize=18)
-                #
-                # for y, value in zip([i for i in range(2, len(df) * 3, 3)],
-                #                     df["views"].apply(self.number_formatter)[::-1]):
-                #     plt.text(7.3, y, value, fontsize=17, fontweight="bold", color="white", ha="center")
-                #
-                # # plt.ylabel("Stages")
-                #
-                # plt.title(f'Воронка трафика "{action}"', loc="center", fontsize=18, fontweight="bold", pad=30)
-                # plt.subplots_adjust(left=0.3)
-
-                # код для создания столбчатой диаграммы
-                labels, values = df['action'].apply(lambda s: ': '.join(s.split(': ')[1:]))[::-1], df['views']
-                plt.title(f'Диаграмма трафика: раздел "{action}"', loc="center", fontsize=18, fontweight="bold", pad=30)
-                plt.subplots_adjust(left=0.2)
-                plt.xticks(fontsize=14)
-                plt.yticks(fontsize=14)
-                plt.xlabel('Посетителей, чел', fontsize=16)
-                # градиентная окраска столбцов в зависимости от величины значений
-                # norm = Normalize(min(values), max(values))
-                # normilized_values = norm(values)
-                # cmap = plt.cm.plasma
-                # colors = cmap(normilized_values)
-
-                annotation = None
-
-                if len(labels) <= 6 or len(''.join(labels)) <= 200:
-                    wraps_labels = [textwrap.fill(label, width=19) for label in labels]
-                    plt.barh(wraps_labels, values, color='skyblue')
-
-                # если слишком много элементов, метки не влезают. Поэтому решил делать аннотацию под рисунком
-                else:
-                    annotation = '; '.join([f"{i+1} - {labels.tolist()[i]}" for i in range(len(labels))])
-                    num_labels = [str(i + 1) for i in range(len(labels))]
-                    plt.barh(num_labels[::-1], values, color='skyblue')
-
-                # сохранение графика
-                img = io.BytesIO()
-                plt.savefig(img)
-                plt.close(fig)
-                img.seek(0)
-                picture.add_run().add_picture(img, width=Cm(16.2), height=Cm(10.8))
-                if annotation:
-                    picture.add_run('; '.join([f"{i+1} - {labels.tolist()[i]}" for i in range(len(labels))]))
-
-    def write_items_by_outliers(self, min_items_num: int, df: pd.DataFrame, label: str, is_campaign: bool,
-                                outlier_rate: float, write_best: bool = True):
+            return section
+
+        for action, df in blocks:
+            if len(df) >= 2:
+                chart = Chart(f'Диаграмма трафика: раздел "{action}"', df['sub_label'].tolist(),
+                              [int(views) for views in df['views']], 'Посетителей, чел')
+                picture.add_run(chart=chart)
+        return section
+
+    def write_items_by_outliers(self, section: Section, min_items_num: int, df: pd.DataFrame, label: str,
+                                is_campaign: bool, outlier_rate: float, write_best: bool = True):
         """
         Метод для формирования групп (пунктов) 'наибольшие/наименьшие' параметры для действий или кампаний
+        :param section: пункт отчёта, в который добавляются абзацы
         :param min_items_num: минимальное количество элементов в каждой из групп
         :param df: DataFrame на основе которого отбираются данные
         :param label: метка столбца, на основе которого отбираются данные
@@ -532,6 +628,10 @@ class SectionWriter(FormatterMixin):
             df,
             'time', is_campaigns=is_campaign,
             outliers_rate=outlier_rate)
+        # проверка принадлежности к выбросам выполняется для каждого элемента перечня - по множествам названий
+        pos_outliers_perc_abort, neg_outliers_perc_abort = (set(pos_outliers_perc_abort.action),
+                                                            set(neg_outliers_perc_abort.action))
+        pos_outliers_time, neg_outliers_time = set(pos_outliers_time.action), set(neg_outliers_time.action)
 
         if write_best:
             cur_outliers = pos_outliers
@@ -540,158 +640,201 @@ class SectionWriter(FormatterMixin):
             cur_outliers = neg_outliers
             normal = normal.sort_values(by=label, ascending=True)
 
+        # при нехватке времени в перечень попадают только первые limit элементов
+        limit = self.item_limit()
+        if limit is not None and max(len(cur_outliers), min_items_num) > limit:
+            cur_outliers = cur_outliers.sort_values(by=label, ascending=not write_best).iloc[:limit]
+            min_items_num = min(min_items_num, limit)
+            self.deadline.shorten(section.name, f'в перечнях оставлено не более {limit} элементов')
+
+        # при большом количестве элементов подробно описываются первые detailed_items, остальные - таблицей
+        rest = None
+        if limit is None and self.detailed_items and max(len(cur_outliers), min_items_num) > self.detailed_items:
+            cur_outliers = cur_outliers.sort_values(by=label, ascending=not write_best)
+            normal = normal.iloc[:max(0, min_items_num - len(cur_outliers))]
+            rest = pd.concat([cur_outliers, normal]).iloc[self.detailed_items:]
+            cur_outliers = cur_outliers.iloc[:self.detailed_items]
+            min_items_num = self.detailed_items
+
         num_items = len(cur_outliers)
         for i in range(num_items):
             item = cur_outliers.iloc[i]
-            p = self.document.add_paragraph(style='List Bullet')
-            p.paragraph_format.left_indent = Inches(1)
+            item_time = self.time_to_str(item.time, full=True)
+            p = section.add_paragraph(style='List Bullet')
+            p.left_indent = 1
             p.add_run(
                 f'«{item.action}» ({self.number_formatter(item[label])} {self.end_word_formatter(label, item[label])}).')  # выброс
 
             # проверка на высокие показатели отказов + время
-            if item.action in pos_outliers_perc_abort.action.values:
+            if item.action in pos_outliers_perc_abort:
                 p.add_run(
-                    f' Так же наблюдается сравнительно высокая доля отказов ({item.perc_aborted} %).')
-                if item.action in pos_outliers_time.action.values:
-                    p.add_run(f' Но и относительно высокое время просмотра ({item.time}).')
-                elif item.action in pos_outliers_time.action.values:
-                    p.add_run(f' И относительно малое время просмотра ({item.time}).')
+                    f' Так же наблюдается сравнительно высокая доля отказов ({self.float_to_str(item.perc_aborted)} %).')
+                if item.action in pos_outliers_time:
+                    p.add_run(f' Но и относительно высокое время просмотра ({item_time}).')
+                elif item.action in pos_outliers_time:
+                    p.add_run(f' И относительно малое время просмотра ({item_time}).')
 
             # проверка на низкие показатели отказов + время
-            elif item.action in neg_outliers_perc_abort.action.values:
+            elif item.action in neg_outliers_perc_abort:
                 p.add_run(
-                    f' Так же наблюдается относительно низкая доля отказов ({item.perc_aborted} %).')
-                if item.action in pos_outliers_time.action.values:
-                    p.add_run(f' И относительно высокое время просмотра ({item.time}).')
-                elif item.action in pos_outliers_time.action.values:
-                    p.add_run(f' Но и относительно низкое время просмотра ({item.time}).')
+                    f' Так же наблюдается относительно низкая доля отказов ({self.float_to_str(item.perc_aborted)} %).')
+                if item.action in pos_outliers_time:
+                    p.add_run(f' И относительно высокое время просмотра ({item_time}).')
+                elif item.action in pos_outliers_time:
+                    p.add_run(f' Но и относительно низкое время просмотра ({item_time}).')
 
             # если отказыв в пределах нормы, ищем выбросы для данного действия по времени
-            elif item.action in pos_outliers_time.action.values:
+            elif item.action in pos_outliers_time:
                 p.add_run(
-                    f' Так же наблюдается относительно высокое время просмотра ({item.time}).')
-            elif item.action in neg_outliers_time.action.values:
+                    f' Так же наблюдается относительно высокое время просмотра ({item_time}).')
+            elif item.action in neg_outliers_time:
                 p.add_run(
-                    f' Так же наблюдается относительно низкое время просмотра ({item.time}).')
+                    f' Так же наблюдается относительно низкое время просмотра ({item_time}).')
 
         if num_items < min_items_num:
             for i in range(len(normal[:min_items_num - num_items])):
                 item = normal.iloc[i]
-                p = self.document.add_paragraph(style='List Bullet')
-                p.paragraph_format.left_indent = Inches(1)
+                item_time = self.time_to_str(item.time, full=True)
+                p = section.add_paragraph(style='List Bullet')
+                p.left_indent = 1
                 p.add_run(
                     f'«{item.action}» ({self.number_formatter(item[label])} {self.end_word_formatter(label, item[label])}).')
 
                 # проверка на высокие показатели отказов + время
-                if item.action in pos_outliers_perc_abort.action.values:
+                if item.action in pos_outliers_perc_abort:
                     p.add_run(
-                        f' Так же наблюдается сравнительно высокая доля отказов ({item.perc_aborted} %).')
-                    if item.action in pos_outliers_time.action.values:
-                        p.add_run(f' Но и сравнительно высокое время просмотра ({item.time}).')
-                    elif item.action in pos_outliers_time.action.values:
-                        p.add_run(f' И сравнительно низкое время просмотра ({item.time}).')
+                        f' Так же наблюдается сравнительно высокая доля отказов ({self.float_to_str(item.perc_aborted)} %).')
+                    if item.action in pos_outliers_time:
+                        p.add_run(f' Но и сравнительно высокое время просмотра ({item_time}).')
+                    elif item.action in pos_outliers_time:
+                        p.add_run(f' И сравнительно низкое время просмотра ({item_time}).')
 
                 # проверка на низкие показатели отказов + время
-                elif item.action in neg_outliers_perc_abort.action.values:
+                elif item.action in neg_outliers_perc_abort:
                     p.add_run(
-                        f' Так же наблюдается сравнительно низкая доля отказов ({item.perc_aborted} %).')
-                    if item.action in pos_outliers_time.action.values:
-                        p.add_run(f' Но и сравнительно высокое время просмотра ({item.time}).')
-                    elif item.action in pos_outliers_time.action.values:
-                        p.add_run(f' И сравнительно низкое время просмотра ({item.time}).')
+                        f' Так же наблюдается сравнительно низкая доля отказов ({self.float_to_str(item.perc_aborted)} %).')
+                    if item.action in pos_outliers_time:
+                        p.add_run(f' Но и сравнительно высокое время просмотра ({item_time}).')
+                    elif item.action in pos_outliers_time:
+                        p.add_run(f' И сравнительно низкое время просмотра ({item_time}).')
 
                 # если отказы в пределах нормы, ищем выбросы для данного действия по времени
-                elif item.action in pos_outliers_time.action.values:
+                elif item.action in pos_outliers_time:
                     p.add_run(
-                        f' Так же, стоит отметить, сравнительно высокое время просмотра ({item.time}).')
-                elif item.action in neg_outliers_time.action.values:
+                        f' Так же, стоит отметить, сравнительно высокое время просмотра ({item_time}).')
+                elif item.action in neg_outliers_time:
                     p.add_run(
-                        f' Так же, стоит отметить, сравнительно низкое время просмотра ({item.time}).')
+                        f' Так же, стоит отметить, сравнительно низкое время просмотра ({item_time}).')
 
-    def write_outliers_section(self, outlier_rate: float):
+        if rest is not None and not rest.empty:
+            rows = [[action, self.number_formatter(int(value)), self.float_to_str(perc_aborted),
+                     self.time_to_str(seconds, full=True)]
+                    for action, value, perc_aborted, seconds in
+                    zip(rest['action'], rest[label].fillna(0), rest['perc_aborted'].fillna(0), rest['time'])]
+            section.add_table(['Название', 'Посетителей' if label == 'views' else 'Визитов', 'Доля отказов, %',
+                               'Время'], rows, f'Остальные ({len(rows)}):', left_indent=1)
+
+    def write_outliers_section(self, outlier_rate: float) -> Section:
         """
         Данные с анализом выбросов (если есть) в видеть наибольших или наименьших значений
         :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
-        :return:
+        :return: объект Section
         """
-        self.document.add_paragraph(f'Анализ выбросов по действиям:', style='List Number')
-        self.document.add_paragraph(
-            'Наибольшее число визитов включают действия:').paragraph_format.left_indent = Inches(0.5)
+        section = Section('outliers')
+        section.add_paragraph(f'Анализ выбросов по действиям:', style='List Number')
+        section.add_paragraph('Наибольшее число визитов включают действия:', left_indent=0.5)
 
         # четверть значений от общего числа - кол-во значений в минимальных или максимальных данных
         min_items_count = math.ceil(len(self.cur_rk_df) * 0.25)
 
         # записываем наибольшие по визитам строки
-        self.write_items_by_outliers(min_items_count, self.cur_rk_df, 'visits', is_campaign=False,
+        self.write_items_by_outliers(section, min_items_count, self.cur_rk_df, 'visits', is_campaign=False,
                                      outlier_rate=outlier_rate)
 
-        self.document.add_paragraph(
-            'Наименьшее число визитов включают действия:').paragraph_format.left_indent = Inches(0.5)
-        self.write_items_by_outliers(min_items_count, self.cur_rk_df, 'visits', is_campaign=False, write_best=False,
-                                     outlier_rate=outlier_rate)
+        section.add_paragraph('Наименьшее число визитов включают действия:', left_indent=0.5)
+        self.write_items_by_outliers(section, min_items_count, self.cur_rk_df, 'visits', is_campaign=False,
+                                     write_best=False, outlier_rate=outlier_rate)
+        return section
 
-    def write_groups_section(self, outlier_rate: float):
+    def write_groups_section(self, outlier_rate: float) -> Section:
         """
         данные с анализом групп, кампаний. Анализ схожий с пунктом write_outliers_section
         :param outlier_rate:
-        :return:
+        :return: объект Section
         """
-        self.document.add_paragraph(f'Группы:', style='List Number')
+        section = Section('groups')
+        section.add_paragraph(f'Группы:', style='List Number')
         if len(self.groups_df) == 2:
-            p = self.document.add_paragraph(style='List Bullet')
+            p = section.add_paragraph(style='List Bullet')
             group_item1 = self.groups_df.iloc[0]
             group_item2 = self.groups_df.iloc[1]
             p.add_run(
                 f'«{group_item1.action}» привлекла {self.great_or_less_string(group_item1.views, group_item2.views)} посетителей '
                 f'({self.number_formatter(group_item1.views)}) и имеет '
                 f'{self.great_or_less_string(group_item1.perc_aborted, group_item2.perc_aborted)} отказников '
-                f'({group_item1.perc_aborted} %) чем группа «{group_item2.action}» ({self.number_formatter(group_item2.views)} '
+                f'({self.float_to_str(group_item1.perc_aborted)} %) чем группа «{group_item2.action}» '
+                f'({self.number_formatter(group_item2.views)} '
                 f'{self.end_word_formatter("views", group_item2.views)}; '
-                f'{group_item2.perc_aborted} % отказников), и при этом имеет'
+                f'{self.float_to_str(group_item2.perc_aborted)} % отказников), и при этом имеет'
                 f' {self.great_or_less_string(group_item1.time, group_item2.time)} среднее время на сайте '
                 f'({self.time_to_str(group_item1.time)} у «{group_item1.action}» '
                 f'против {self.time_to_str(group_item2.time)} у «{group_item2.action}»).'
             )
         elif len(self.groups_df) == 1:
-            p = self.document.add_paragraph(style='List Bullet')
+            p = section.add_paragraph(style='List Bullet')
             group_item1 = self.groups_df.iloc[0]
             p.add_run(
                 f'«{group_item1.action}» привлекла {self.number_formatter(group_item1.views)} '
                 f'{self.end_word_formatter("views", group_item1.views)} '
                 f'({self.number_formatter(group_item1.views)}) и имеет '
-                f'{group_item1.perc_aborted} % отказников а среднее время '
+                f'{self.float_to_str(group_item1.perc_aborted)} % отказников а среднее время '
                 f'просмотра составило {self.time_to_str(group_item1.time)}'
             )
         else:
             min_items_count = math.ceil(len(self.groups_df) * 0.25)
 
-            self.document.add_paragraph('Лучшие показатели посещаемости демонстируют следующие группы: ',
-                                        style='List Bullet')
-            self.write_items_by_outliers(min_items_count, self.groups_df, 'views', is_campaign=True, write_best=True,
-                                         outlier_rate=outlier_rate)
-            self.document.add_paragraph('Худшие показатели посещаемости демонстируют следующие группы: ',
-                                        style='List Bullet')
-            self.write_items_by_outliers(min_items_count, self.groups_df, 'views', is_campaign=True, write_best=False,
-                                         outlier_rate=outlier_rate)
+            section.add_paragraph('Лучшие показатели посещаемости демонстируют следующие группы: ',
+                                  style='List Bullet')
+            self.write_items_by_outliers(section, min_items_count, self.groups_df, 'views', is_campaign=True,
+                                         write_best=True, outlier_rate=outlier_rate)
+            section.add_paragraph('Худшие показатели посещаемости демонстируют следующие группы: ',
+                                  style='List Bullet')
+            self.write_items_by_outliers(section, min_items_count, self.groups_df, 'views', is_campaign=True,
+                                         write_best=False, outlier_rate=outlier_rate)
 
         min_items_count = math.ceil(len(self.campaigns_df) * 0.25)
-        self.document.add_paragraph('Лучшие показатели посещаемости демонстрируют кампании:', style='List Bullet')
-        self.write_items_by_outliers(min_items_count, self.campaigns_df, 'views', is_campaign=True,
+        section.add_paragraph('Лучшие показатели посещаемости демонстрируют кампании:', style='List Bullet')
+        self.write_items_by_outliers(section, min_items_count, self.campaigns_df, 'views', is_campaign=True,
                                      outlier_rate=outlier_rate)
 
-        self.document.add_paragraph('Худшие показатели посещаемости у следующих кампаний:', style='List Bullet')
-        self.write_items_by_outliers(min_items_count, self.campaigns_df, 'views', is_campaign=True, write_best=False,
-                                     outlier_rate=outlier_rate)
+        section.add_paragraph('Худшие показатели посещаемости у следующих кампаний:', style='List Bullet')
+        self.write_items_by_outliers(section, min_items_count, self.campaigns_df, 'views', is_campaign=True,
+                                     write_best=False, outlier_rate=outlier_rate)
+        return section
 
 
 class ReportGenerator(FormatterMixin):
     """
     Класс для управления формированием файла, создаёт объект документа, принимает пути к файлам с данными
-    управляет записью пунктов в документ
+    управляет записью пунктов в документ. Пункты формируются в виде промежуточной модели (ReportModel),
+    которая затем записывается в docx-файл или может быть выгружена в JSON/HTML без формирования docx
     """
 
-    def __init__(self, header: str, cur_rk: str, org: str, groups: str, campaigns: str,
-                 prev_rk: str = None, outlier_rate: float = 1.5):
+    # пункты отчёта в порядке следования в документе
+    SECTIONS = ('general', 'page_views', 'funnel_graph', 'outliers', 'groups')
+    # профили пунктов: full - полный отчёт, text - только текстовые выводы (без диаграмм),
+    # draft - черновик без диаграмм, которые добавляются последующей полной генерацией
+    PROFILES = {
+        'full': SECTIONS,
+        'text': ('general', 'page_views', 'outliers', 'groups'),
+        'draft': ('general', 'page_views', 'outliers', 'groups'),
+    }
+
+    def __init__(self, header: str, cur_rk: bytes | str, org: bytes | str, groups: bytes | str,
+                 campaigns: bytes | str, prev_rk: bytes | str = None, outlier_rate: float = 1.5,
+                 fragment_cache: FragmentCache = None, input_formats: dict[str, str] = None,
+                 deadline: float = 0, section_workers: int = REPORT_SECTION_WORKERS,
+                 chart_processes: int = None):
         """
 
         :param header: заголовок документа
@@ -701,11 +844,28 @@ class ReportGenerator(FormatterMixin):
         :param campaigns_path: путь к файлу с данными о кампаниях
         :param prev_rk_path: путь к файлу с данными предыдущей РК
         :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
+        :param fragment_cache: кэш пунктов отчёта (None - пункты формируются заново при каждом вызове)
+        :param input_formats: форматы входных данных - имя параметра: формат (input_files.INPUT_FORMATS),
+        по-умолчанию csv
+        :param deadline: время на формирование отчёта, сек (0 - без ограничения, см. ReportDeadline)
+        :param section_workers: количество потоков, в которых одновременно формируются пункты отчёта
+        (1 - пункты формируются последовательно)
+        :param chart_processes: количество процессов общего пула для построения диаграмм (см. chart_pool;
+        0 или 1 - диаграммы строятся в потоке пункта), по-умолчанию REPORT_CHART_PROCESSES
         """
         self.document = Document()
-        self.general_writer = SectionWriter(self.document, cur_rk, org, prev_rk, groups, campaigns)
+        self.deadline = ReportDeadline(deadline) if deadline else None
+        self.general_writer = SectionWriter(cur_rk, org, prev_rk, groups, campaigns, input_formats, self.deadline)
+        self.model = ReportModel(header)
 
         self.outlier_rate = outlier_rate
+        self.fragment_cache = fragment_cache
+        self.section_workers = section_workers
+        self.chart_processes = REPORT_CHART_PROCESSES if chart_processes is None else chart_processes
+        self.input_digests = {}
+        if self.fragment_cache is not None:
+            inputs = {'cur_rk': cur_rk, 'org': org, 'prev_rk': prev_rk, 'groups': groups, 'campaigns': campaigns}
+            self.input_digests = {key: FragmentCache.digest(content) for key, content in inputs.items()}
 
         self.__write_header(header)
         # self.write_general_params()
@@ -726,6 +886,16 @@ class ReportGenerator(FormatterMixin):
         list_bullet_font.size = Pt(12)
         list_bullet_font.bold = False
 
+        # настройка форматирования для нумерованного списка
+        self.document.styles['List Number'].font.size = Pt(12)
+
+        # компактный стиль абзацев в ячейках таблиц-перечней
+        table_style = self.document.styles.add_style('Table Text', WD_STYLE_TYPE.PARAGRAPH)
+        table_style.font.name = 'times new roman'
+        table_style.font.size = Pt(9)
+        table_style.paragraph_format.line_spacing = 1
+        table_style.paragraph_format.space_after = Pt(0)
+
     def __write_header(self, header):
         header_obj = self.document.add_paragraph(style='Normal')
         header_obj.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -734,40 +904,390 @@ class ReportGenerator(FormatterMixin):
         run.bold = True
         header_obj.add_run('\n')
 
+    def __build_section(self, section: str) -> Section:
+        """
+        Формирование модели пункта отчёта
+        :param section: название пункта (SECTIONS)
+        :return: объект Section
+        """
+        writer = self.general_writer
+        if section == 'general':
+            return writer.write_general_section()
+        if section == 'page_views':
+            return writer.write_page_views_section()
+        if section == 'funnel_graph':
+            return writer.write_funnel_graph_section()
+        if section == 'outliers':
+            return writer.write_outliers_section(self.outlier_rate)
+        if section == 'groups':
+            return writer.write_groups_section(self.outlier_rate)
+        raise ValueError(f'Неизвестный пункт отчёта: {section}')
+
+    def __fragment_key(self, section: str) -> str | None:
+        """
+        Ключ фрагмента пункта в кэше (None - кэш не подключен)
+        :param section: название пункта (ключ SectionWriter.SECTION_INPUTS)
+        :return: ключ
+        """
+        if self.fragment_cache is None:
+            return None
+        digests = [self.input_digests[name] for name in SectionWriter.SECTION_INPUTS[section]]
+        # состав пункта зависит от количества подробно описываемых элементов
+        digests.append(f'detailed_items={self.general_writer.detailed_items}')
+        return self.fragment_cache.make_key(section, digests, self.outlier_rate)
+
+    def __build_graph(self, sections: list[str], to_document: bool, chart_executor: Executor = None) -> SectionGraph:
+        """
+        Граф формирования пунктов: разбор входных данных -> модели пунктов -> диаграммы пунктов.
+        Пункты зависят только от своих входных данных, поэтому формируются независимо друг от друга
+        :param sections: названия пунктов, которые нужно сформировать
+        :param to_document: строить диаграммы (только для записи в docx-документ)
+        :param chart_executor: исполнитель для построения диаграмм (None - в задаче графа)
+        :return: объект SectionGraph
+        """
+        writer = self.general_writer
+        graph = SectionGraph()
+        inputs = sorted({name for section in sections for name in SectionWriter.SECTION_INPUTS[section]})
+        for name in inputs:
+            # DataFrame считывается при первом обращении к свойству <name>_df
+            graph.add(f'input:{name}', lambda results, name=name: getattr(writer, f'{name}_df') is not None)
+
+        def build(results, section):
+            if self.deadline is not None and self.deadline.skip_section():
+                return None
+            return self.__build_section(section)
+
+        def draw(results, section):
+            section_model = results[f'section:{section}']
+            if section_model is None:
+                return []
+            images, pending = [], deque()
+            for paragraph in section_model.paragraphs:
+                for run in paragraph.runs:
+                    if run.chart is None:
+                        continue
+                    # в пул передаётся не больше диаграмм, чем в нём процессов: ограничение проверяется
+                    # перед каждой диаграммой, и при нехватке времени лишние диаграммы не строятся
+                    if pending and len(pending) >= self.chart_processes:
+                        images.append(pending.popleft().result())
+                    limit = self.deadline.chart_limit() if self.deadline is not None else None
+                    if limit is not None and len(images) + len(pending) >= limit:
+                        return images + [future.result() for future in pending]
+                    if chart_executor is None:
+                        images.append(self.draw_chart(run.chart))
+                    else:
+                        pending.append(chart_executor.submit(self.draw_chart, run.chart))
+            return images + [future.result() for future in pending]
+
+        for section in sections:
+            deps = [f'input:{name}' for name in SectionWriter.SECTION_INPUTS[section]]
+            graph.add(f'section:{section}', lambda results, section=section: build(results, section), *deps)
+            if to_document:
+                graph.add(f'charts:{section}', lambda results, section=section: draw(results, section),
+                          f'section:{section}')
+        return graph
+
+    def __write_sections(self, sections: list[str], to_document: bool = True):
+        """
+        Запись пунктов отчёта в модель и (опционально) в документ. При подключенном кэше фрагментов пункт,
+        входные данные которого не изменились, берётся из кэша, остальные пункты формируются одновременно
+        (см. __build_graph) и записываются в документ в установленном порядке, после чего сохраняются в кэш
+        :param sections: названия пунктов (ключи SectionWriter.SECTION_INPUTS) в порядке следования
+        :param to_document: записывать пункты в docx-документ
+        :return: None
+        """
+        keys = {section: self.__fragment_key(section) for section in sections}
+        fragments = {section: self.fragment_cache.get(key) for section, key in keys.items() if key is not None}
+        to_build = [section for section in sections if fragments.get(section) is None]
+
+        results = {}
+        if to_build:
+            graph_executor = ThreadPoolExecutor(self.section_workers) if self.section_workers > 1 else None
+            chart_executor = chart_pool(self.chart_processes) if to_document else None
+            try:
+                results = self.__build_graph(to_build, to_document, chart_executor).run(graph_executor)
+            finally:
+                if graph_executor is not None:
+                    graph_executor.shutdown(cancel_futures=True)
+
+        for section in sections:
+            fragment = fragments.get(section)
+            if fragment is not None:
+                self.model.sections.append(fragment.section)
+                if to_document:
+                    fragment.restore(self.document)
+                continue
+
+            section_model = results[f'section:{section}']
+            if section_model is None:
+                self.deadline.shorten(section, 'не сформирован - истекло время формирования отчёта')
+                continue
+            self.model.sections.append(section_model)
+            if not to_document:
+                continue
+            start = len(Fragment.body_elements(self.document))
+            self.__render_section(section_model, results[f'charts:{section}'])
+            # упрощённые из-за нехватки времени пункты в кэш не сохраняются
+            key = keys[section]
+            if key is not None and (self.deadline is None or section not in self.deadline.degraded):
+                self.fragment_cache.put(key, Fragment.capture(self.document, start, section_model))
+
+    def __render_section(self, section: Section, images: list = None):
+        """
+        Запись модели пункта в документ
+        :param section: объект Section
+        :param images: построенные заранее диаграммы пункта (результаты draw_chart в порядке следования),
+        остальные диаграммы строятся при записи
+        :return: None
+        """
+        charts = drawn = 0
+        for paragraph in section.paragraphs:
+            p = self.document.add_paragraph(style=paragraph.style)
+            if paragraph.left_indent is not None:
+                p.paragraph_format.left_indent = Inches(paragraph.left_indent)
+            if paragraph.line_spacing is not None:
+                p.paragraph_format.line_spacing = paragraph.line_spacing
+            for run in paragraph.runs:
+                if run.chart is not None:
+                    charts += 1
+                    # при нехватке времени строятся только первые диаграммы
+                    limit = self.deadline.chart_limit() if self.deadline is not None else None
+                    if limit is not None and drawn >= limit:
+                        continue
+                    img, annotation = images[drawn] if images and drawn < len(images) else self.draw_chart(run.chart)
+                    drawn += 1
+                    p.add_run().add_picture(img, width=Cm(16.2), height=Cm(10.8))
+                    if annotation:
+                        p.add_run(annotation)
+                    continue
+                docx_run = p.add_run(run.text)
+                if run.bold:
+                    docx_run.bold = True
+                if run.italic:
+                    docx_run.italic = True
+                if run.page_break:
+                    docx_run.add_break(WD_BREAK.PAGE)
+            if paragraph.table is not None:
+                self.__write_table(paragraph.table)
+        if drawn < charts:
+            self.deadline.shorten(section.name, f'построено {drawn} из {charts} диаграмм')
+
+    def __write_table(self, table: Table):
+        """
+        Запись таблицы в документ. XML таблицы формируется одной строкой и разбирается целиком -
+        построение через объекты python-docx (add_row, cell) замедляется с ростом таблицы.
+        Ширина столбцов фиксирована (первый столбец - названия - шире остальных), что избавляет
+        Word от расчёта ширины по содержимому всех строк при открытии документа
+        :param table: объект Table
+        :return: None
+        """
+        def row_xml(values, header: bool = False) -> str:
+            run_pr = '<w:rPr><w:b/></w:rPr>' if header else ''
+            # строка заголовка повторяется на каждой странице
+            row_pr = '<w:trPr><w:tblHeader/></w:trPr>' if header else ''
+            cells = ''.join(f'<w:tc><w:p><w:pPr><w:pStyle w:val="TableText"/></w:pPr><w:r>{run_pr}'
+                            f'<w:t{preserve if value != value.strip() else ""}>{escape(value)}</w:t></w:r></w:p></w:tc>'
+                            for value in values)
+            return f'<w:tr>{row_pr}{cells}</w:tr>'
+
+        preserve = ' xml:space="preserve"'
+        section = self.document.sections[-1]
+        width = Emu(section.page_width - section.left_margin - section.right_margin).twips
+        first = width * 2 // 5 if len(table.columns) > 1 else width
+        other = (width - first) // max(1, len(table.columns) - 1)
+        grid = f'<w:gridCol w:w="{first}"/>' + f'<w:gridCol w:w="{other}"/>' * (len(table.columns) - 1)
+        rows = ''.join(row_xml(row) for row in table.rows)
+        xml = (f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="{width}" w:type="dxa"/>'
+               f'<w:tblLayout w:type="fixed"/></w:tblPr><w:tblGrid>{grid}</w:tblGrid>'
+               f'{row_xml(table.columns, header=True)}{rows}</w:tbl>')
+        self.document.element.body.sectPr.addprevious(parse_xml(xml))
+
+    @staticmethod
+    def draw_chart(chart: Chart) -> tuple[io.BytesIO, str | None]:
+        """
+        Построение столбчатой диаграммы
+        :param chart: описание диаграммы
+        :return: изображение в формате png и подпись с расшифровкой номеров (если подписи не помещаются)
+        """
+        # объектный интерфейс matplotlib вместо pyplot: pyplot хранит общее для всех потоков состояние
+        # (текущую диаграмму), а диаграммы пунктов строятся одновременно (см. __build_graph)
+        fig = Figure(figsize=(12, 8))
+        ax = fig.add_subplot()
+
+        # код для создания воронок
+        # y = [1, 3.6]
+        # x1 = [8, 12]
+        # x2 = [6, 2]
+        # for i in range(len(df)):
+        #     # cmap = plt.get_cmap('summer')
+        #     plt.fill_betweenx(y=y, x1=x1, x2=x2, color=colors[i % 5])
+        #     y = [i + 3 for i in y]
+        #     x1 = [i + 4.3 for i in x1]
+        #     x2 = [i - 4.3 for i in x2]
+        # plt.xticks([], [])
+        # plt.yticks([i for i in range(2, len(df) * 3, 3)], df["action"].apply(lambda s: s.split(': ')[1])[::-1],
+        #            wrap=True, fontsize=18)
+        #
+        # for y, value in zip([i for i in range(2, len(df) * 3, 3)],
+        #                     df["views"].apply(self.number_formatter)[::-1]):
+        #     plt.text(7.3, y, value, fontsize=17, fontweight="bold", color="white", ha="center")
+        #
+        # # plt.ylabel("Stages")
+        #
+        # plt.title(f'Воронка трафика "{action}"', loc="center", fontsize=18, fontweight="bold", pad=30)
+        # plt.subplots_adjust(left=0.3)
+
+        # код для создания столбчатой диаграммы
+        # порядок меняется на обратный, чтобы первое действие блока было вверху диаграммы
+        labels, values = chart.labels[::-1], chart.values[::-1]
+        ax.set_title(chart.title, loc="center", fontsize=18, fontweight="bold", pad=30)
+        fig.subplots_adjust(left=0.2)
+        ax.tick_params(labelsize=14)
+        ax.set_xlabel(chart.xlabel, fontsize=16)
+        # градиентная окраска столбцов в зависимости от величины значений
+        # norm = Normalize(min(values), max(values))
+        # normilized_values = norm(values)
+        # cmap = plt.cm.plasma
+        # colors = cmap(normilized_values)
+
+        annotation = None
+
+        if len(labels) <= 6 or len(''.join(labels)) <= 200:
+            wraps_labels = [textwrap.fill(label, width=19) for label in labels]
+            ax.barh(wraps_labels, values, color='skyblue')
+
+        # если слишком много элементов, метки не влезают. Поэтому решил делать аннотацию под рисунком
+        else:
+            annotation = '; '.join([f"{i+1} - {label}" for i, label in enumerate(chart.labels)])
+            num_labels = [str(i + 1) for i in range(len(labels))]
+            ax.barh(num_labels[::-1], values, color='skyblue')
+
+        # сохранение графика
+        img = io.BytesIO()
+        fig.savefig(img)
+        img.seek(0)
+        return img, annotation
+
     def write_general_params(self):
         """
         Общие показатели
         :return:
         """
-        self.general_writer.write_general_section()
+        self.__write_sections(['general'])
 
     def write_page_views(self):
         """
         Просмотр страниц
         :return:
         """
-        self.general_writer.write_page_views_section()
+        self.__write_sections(['page_views'])
 
     def write_funnel_graph_section(self):
         """
         Графики-воронки
         :return:
         """
-        self.general_writer.write_funnel_graph_section()
+        self.__write_sections(['funnel_graph'])
 
     def write_outliers_section(self):
         """
         Анализ выбросов, наилучших и наихудших параметров для действий
         :return:
         """
-        self.general_writer.write_outliers_section(self.outlier_rate)
+        self.__write_sections(['outliers'])
 
     def write_groups_section(self):
         """
         Анализ выбросов, наилучших и наихудших параметров для групп/кампаний
         :return:
         """
-        self.general_writer.write_groups_section(self.outlier_rate)
+        self.__write_sections(['groups'])
+
+    def write_sections(self, profile: str = None, to_document: bool = True):
+        """
+        Запись пунктов отчёта в установленном порядке
+        :param profile: профиль пунктов (см. resolve_sections), None - все пункты
+        :param to_document: записывать пункты в docx-документ (False - только в модель self.model)
+        :return:
+        """
+        sections = self.resolve_sections(profile)
+        self.__write_sections([section for section in self.SECTIONS if section in sections], to_document)
+
+        if profile == 'draft':
+            note = Section('note')
+            note.add_paragraph().add_run('Предварительная версия отчёта: диаграммы будут добавлены позднее.',
+                                         italic=True)
+            self.__write_note(note, to_document)
+
+        if self.deadline is not None and self.deadline.notes:
+            note = Section('note')
+            note.add_paragraph().add_run(f'Отчёт сокращён: время формирования ограничено '
+                                         f'{self.deadline.budget:g} сек.', italic=True)
+            for text in self.deadline.notes:
+                note.add_paragraph(style='List Bullet').add_run(text, italic=True)
+            self.__write_note(note, to_document)
+
+    def __write_note(self, note: Section, to_document: bool):
+        """
+        Запись примечания в конец отчёта (в кэш фрагментов не сохраняется)
+        :param note: объект Section
+        :param to_document: записывать примечание в docx-документ
+        :return: None
+        """
+        self.model.sections.append(note)
+        if to_document:
+            self.__render_section(note)
+
+    def build_model(self, profile: str = None) -> ReportModel:
+        """
+        Формирование модели отчёта без записи в docx-документ (диаграммы не строятся)
+        :param profile: профиль пунктов (см. resolve_sections)
+        :return: объект ReportModel
+        """
+        self.write_sections(profile, to_document=False)
+        return self.model
+
+    @classmethod
+    def resolve_sections(cls, profile: str = None) -> tuple[str, ...]:
+        """
+        Определяет пункты отчёта по профилю
+        :param profile: название профиля (PROFILES) или перечисление пунктов через запятую (SECTIONS),
+        None или пустая строка - все пункты
+        :return: названия пунктов
+        """
+        if not profile:
+            return cls.SECTIONS
+        if profile in cls.PROFILES:
+            return cls.PROFILES[profile]
+
+        sections = tuple(section.strip() for section in profile.split(',') if section.strip())
+        unknown = set(sections) - set(cls.SECTIONS)
+        if unknown:
+            raise ValueError(f'Неизвестные пункты отчёта: {", ".join(sorted(unknown))}')
+        return sections
+
+    @staticmethod
+    def file_name(header: str, report_id: int, extension: str = 'docx') -> str:
+        """
+        Имя файла отчёта
+        :param header: заголовок отчёта (название продукта)
+        :param report_id: идентификатор отчёта
+        :param extension: расширение файла (docx, json, html)
+        :return: имя файла
+        """
+        return f'Отчет_{header.replace(" ", "_")}_{report_id}.{extension}'
+
+    def usage_stats(self) -> dict[str, int | float]:
+        """
+        Показатели объёма отчёта для учёта ресурсов (см. accounting.UsageRecord)
+        :return: словарь - количество строк входных данных (всего и текущей РК) и диаграмм в документе,
+        превышение ограничения времени (сек) и количество упрощённых из-за нехватки времени пунктов
+        """
+        rows = self.general_writer.data.row_counts()
+        return {'input_rows': sum(rows.values()), 'action_rows': rows.get('cur_rk', 0),
+                'chart_count': len(self.document.inline_shapes),
+                'overrun_seconds': self.deadline.overrun if self.deadline is not None else 0.0,
+                'degraded_sections': len(self.deadline.degraded) if self.deadline is not None else 0}
 
     def save_report(self, doc_name: str, binary: bool) -> None | io.BytesIO:
         """
@@ -785,6 +1305,88 @@ class ReportGenerator(FormatterMixin):
         self.document.save(doc_name)
 
 
+# общий для всех отчетов процесса пул построения диаграмм (см. chart_pool)
+_chart_pool: ProcessPoolExecutor | None = None
+# процесс, создавший пул, и количество процессов пула
+_chart_pool_owner: tuple[int, int] | None = None
+_chart_pool_lock = threading.Lock()
+
+
+def chart_pool(processes: int) -> ProcessPoolExecutor | None:
+    """
+    Пул процессов для построения диаграмм. Пул создаётся при первом обращении и используется всеми
+    последующими отчетами процесса: запуск процессов и импорт matplotlib в них выполняются один раз.
+    Процессы запускаются через spawn - диаграммы строятся из потоков пунктов, а fork процесса
+    с несколькими потоками небезопасен
+    :param processes: количество процессов (0 или 1 - без пула)
+    :return: ProcessPoolExecutor или None
+    """
+    global _chart_pool, _chart_pool_owner
+    if processes <= 1:
+        return None
+    with _chart_pool_lock:
+        if _chart_pool_owner == (os.getpid(), processes):
+            return _chart_pool
+        # пул, унаследованный от родительского процесса через fork, не используется
+        if _chart_pool is not None and _chart_pool_owner[0] == os.getpid():
+            _chart_pool.shutdown(wait=False)
+        _chart_pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+        _chart_pool_owner = (os.getpid(), processes)
+        return _chart_pool
+
+
+def disable_chart_pool():
+    """
+    Отключение пула построения диаграмм в процессе (инициализатор процессов-исполнителей, формирующих
+    отчеты одновременно: процессы уже загружают все ядра, и отдельный пул в каждом из них лишь добавил бы
+    процессов)
+    """
+    global REPORT_CHART_PROCESSES
+    REPORT_CHART_PROCESSES = 0
+
+
+def render_report(data: dict, header: str, report_id: int, outlier_rate: float = 1.5,
+                  fragment_cache: FragmentCache = None, profile: str = None,
+                  deadline: float = REPORT_DEADLINE, stats: dict = None) -> io.BytesIO:
+    """
+    Формирование docx-файла отчёта в ОЗУ
+    :param data: словарь - имя параметра ReportGenerator: csv-данные
+    :param header: заголовок отчёта (название продукта)
+    :param report_id: идентификатор отчёта
+    :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
+    :param fragment_cache: кэш пунктов отчёта
+    :param profile: профиль пунктов отчёта (см. ReportGenerator.resolve_sections)
+    :param deadline: время на формирование отчёта, сек (0 - без ограничения)
+    :param stats: словарь, в который записываются показатели объёма отчёта (ReportGenerator.usage_stats)
+    :return: docx-файл в ОЗУ (имя файла в атрибуте name)
+    """
+    report = ReportGenerator(header=header, outlier_rate=outlier_rate, fragment_cache=fragment_cache,
+                             deadline=deadline, **data)
+    report.write_sections(profile)
+    if report.deadline is not None and (report.deadline.notes or report.deadline.overrun):
+        logger.warning(f'Отчет [{report_id}] сформирован за {report.deadline.elapsed():.1f} сек '
+                       f'при ограничении {deadline:g} сек (превышение {report.deadline.overrun:.1f} сек), '
+                       f'упрощения: {"; ".join(report.deadline.notes) or "нет"}')
+    if stats is not None:
+        stats.update(report.usage_stats())
+    return report.save_report(ReportGenerator.file_name(header, report_id), binary=True)
+
+
+def render_report_model(data: dict, header: str, outlier_rate: float = 1.5, fragment_cache: FragmentCache = None,
+                        profile: str = None) -> ReportModel:
+    """
+    Формирование модели отчёта (для выгрузки в JSON/HTML без формирования docx-файла)
+    :param data: словарь - имя параметра ReportGenerator: csv-данные
+    :param header: заголовок отчёта (название продукта)
+    :param outlier_rate: множитель, отвечающий за величину отклонения данных, которые будут считаться выбросом
+    :param fragment_cache: кэш пунктов отчёта (модели пунктов берутся из сохранённых фрагментов)
+    :param profile: профиль пунктов отчёта (см. ReportGenerator.resolve_sections)
+    :return: объект ReportModel
+    """
+    report = ReportGenerator(header=header, outlier_rate=outlier_rate, fragment_cache=fragment_cache, **data)
+    return report.build_model(profile)
+
+
 if __name__ == '__main__':
     hash_names = {
         'Все кампании.csv': 'campaigns',
@@ -795,7 +1397,7 @@ if __name__ == '__main__':
     }
     data = {}
     for f in os.scandir('example/input_data/'):
-        with open(f, encoding='utf-8') as f:
+        with open(f, 'rb') as f:
             key = hash_names[f.name.split('/')[-1]]
             data[key] = f.read()
     data['header'] = 'тестовая кампания'
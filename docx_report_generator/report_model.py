@@ -0,0 +1,171 @@
+import html
+import json
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class Chart:
+    """
+    Описание столбчатой диаграммы (строится только при формировании docx-файла)
+    """
+    title: str
+    labels: list[str]
+    values: list[int]
+    xlabel: str = ''
+
+
+@dataclass
+class Table:
+    """
+    Таблица-перечень (элементы сверх подробно описанных в тексте): заголовки столбцов и строки
+    """
+    columns: list[str]
+    rows: list[list[str]]
+
+
+@dataclass
+class Run:
+    """
+    Фрагмент текста абзаца с единым форматированием (или диаграмма)
+    """
+    text: str = ''
+    bold: bool = False
+    italic: bool = False
+    page_break: bool = False
+    chart: Chart | None = None
+
+
+@dataclass
+class Paragraph:
+    """
+    Абзац пункта отчёта
+    """
+    style: str | None = None
+    runs: list[Run] = field(default_factory=list)
+    # отступ слева, дюймы
+    left_indent: float | None = None
+    line_spacing: float | None = None
+    # таблица, следующая за абзацем (абзац - её подпись)
+    table: Table | None = None
+
+    def add_run(self, text: str = '', bold: bool = False, italic: bool = False, page_break: bool = False,
+                chart: Chart = None) -> Run:
+        run = Run(text, bold, italic, page_break, chart)
+        self.runs.append(run)
+        return run
+
+    @property
+    def text(self) -> str:
+        return ''.join(run.text for run in self.runs)
+
+
+@dataclass
+class Section:
+    """
+    Пункт отчёта: название (ключ ReportGenerator.SECTIONS) и абзацы
+    """
+    name: str
+    paragraphs: list[Paragraph] = field(default_factory=list)
+
+    def add_paragraph(self, text: str = '', style: str = None, left_indent: float = None,
+                      line_spacing: float = None) -> Paragraph:
+        paragraph = Paragraph(style, [], left_indent, line_spacing)
+        if text:
+            paragraph.add_run(text)
+        self.paragraphs.append(paragraph)
+        return paragraph
+
+    def add_table(self, columns: list[str], rows: list[list[str]], caption: str = '',
+                  left_indent: float = None) -> Paragraph:
+        """
+        Добавляет таблицу с подписью
+        :param columns: заголовки столбцов
+        :param rows: строки (значения - строки)
+        :param caption: подпись таблицы
+        :param left_indent: отступ подписи слева, дюймы
+        :return: абзац-подпись (с таблицей в атрибуте table)
+        """
+        paragraph = self.add_paragraph(caption, left_indent=left_indent)
+        paragraph.table = Table(columns, rows)
+        return paragraph
+
+
+@dataclass
+class ReportModel:
+    """
+    Промежуточная модель отчёта: выводы по пунктам без привязки к формату выходного файла.
+    Из модели формируется docx-файл, а также JSON и HTML (без построения диаграмм и упаковки docx)
+    """
+    header: str
+    sections: list[Section] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_html(self) -> str:
+        """
+        Упрощённое HTML-представление отчёта (для предпросмотра): диаграммы выводятся таблицами
+        :return: HTML-документ
+        """
+        lines = [
+            '<!DOCTYPE html>',
+            '<html lang="ru"><head><meta charset="utf-8">',
+            f'<title>{html.escape(self.header)}</title></head><body>',
+            f'<h1>Выводы по контекстной кампании "{html.escape(self.header)}"</h1>',
+        ]
+        number = 0
+        in_list = False
+        for section in self.sections:
+            for paragraph in section.paragraphs:
+                is_bullet = paragraph.style == 'List Bullet'
+                if in_list and not is_bullet:
+                    lines.append('</ul>')
+                elif is_bullet and not in_list:
+                    lines.append('<ul>')
+                in_list = is_bullet
+
+                content = ''.join(self.__run_to_html(run) for run in paragraph.runs)
+                if paragraph.table is not None:
+                    if content:
+                        lines.append(f'<p>{content}</p>')
+                    lines.append(self.__table_to_html(paragraph.table))
+                    continue
+                if not content:
+                    continue
+                if paragraph.style == 'List Number':
+                    number += 1
+                    lines.append(f'<h2>{number}. {content}</h2>')
+                    continue
+                indent = f' style="margin-left: {paragraph.left_indent}in"' if paragraph.left_indent else ''
+                # диаграммы (figure) не могут находиться внутри <p>
+                tag = 'li' if is_bullet else 'div' if any(run.chart for run in paragraph.runs) else 'p'
+                lines.append(f'<{tag}{indent}>{content}</{tag}>')
+        if in_list:
+            lines.append('</ul>')
+        lines.append('</body></html>')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def __table_to_html(table: Table) -> str:
+        header = ''.join(f'<th>{html.escape(column)}</th>' for column in table.columns)
+        rows = ''.join('<tr>' + ''.join(f'<td>{html.escape(value)}</td>' for value in row) + '</tr>'
+                       for row in table.rows)
+        return f'<table><tr>{header}</tr>{rows}</table>'
+
+    @staticmethod
+    def __run_to_html(run: Run) -> str:
+        if run.chart is not None:
+            chart = run.chart
+            rows = ''.join(f'<tr><td>{html.escape(label)}</td><td>{value}</td></tr>'
+                           for label, value in zip(chart.labels, chart.values))
+            return (f'<figure><figcaption>{html.escape(chart.title)}</figcaption>'
+                    f'<table><tr><th></th><th>{html.escape(chart.xlabel)}</th></tr>{rows}</table></figure>')
+        text = html.escape(run.text)
+        if run.bold and text:
+            text = f'<b>{text}</b>'
+        if run.italic and text:
+            text = f'<i>{text}</i>'
+        return text
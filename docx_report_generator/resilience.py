@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+from settings import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET_RATIO,
+    RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Обращение к зависимости (БД, хранилищу) не выполнялось: зависимость признана недоступной
+    """
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold ошибок подряд обращения к зависимости прекращаются на reset_timeout
+    секунд, после чего пропускается одно пробное обращение - при успехе зависимость снова считается доступной
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """
+        :param name: название зависимости (для логов)
+        :param failure_threshold: количество ошибок подряд, после которого зависимость считается недоступной
+        :param reset_timeout: время до пробного обращения, сек
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """
+        Время до пробного обращения к недоступной зависимости, сек (0 - зависимость доступна)
+        """
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Проверка возможности обращения к зависимости. После истечения reset_timeout
+        разрешается только одно пробное обращение до получения его результата
+        :return: True, если обращение разрешено
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probe or self.remaining() > 0:
+                return False
+            self._probe = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f'{self.name}: зависимость снова доступна')
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f'{self.name}: зависимость недоступна, обращения приостановлены '
+                               f'на {self.reset_timeout:g} сек')
+                self.opened_at = time.monotonic()
+            self._probe = False
+
+
+class RetryBudget:
+    """
+    Бюджет повторных попыток: каждое обращение добавляет ratio попытки, каждый повтор расходует одну.
+    При массовых ошибках повторяется не больше ratio обращений, что не даёт повторам умножать нагрузку
+    """
+
+    def __init__(self, ratio: float, min_tokens: float = 10.0):
+        """
+        :param ratio: доля обращений, для которых допускается повтор
+        :param min_tokens: начальный запас повторов
+        """
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 100 * ratio)
+        self.tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Dependency:
+    """
+    Внешняя зависимость (БД, S3-хранилище): повтор обращений с экспоненциальной задержкой и случайным
+    разбросом (jitter), бюджет повторов и предохранитель
+    """
+
+    def __init__(self, name: str, is_transient: Callable[[Exception], bool] = None, attempts: int = RETRY_ATTEMPTS,
+                 base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY,
+                 budget_ratio: float = RETRY_BUDGET_RATIO, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        """
+        :param name: название зависимости
+        :param is_transient: проверка, является ли ошибка временной (сбой зависимости) - такие ошибки
+        повторяются и учитываются предохранителем; по-умолчанию - любая ошибка
+        :param attempts: максимальное количество попыток
+        :param base_delay: задержка перед первым повтором, сек (удваивается с каждой попыткой)
+        :param max_delay: максимальная задержка, сек
+        :param budget_ratio: доля обращений, для которых допускается повтор (RetryBudget)
+        :param failure_threshold: количество ошибок подряд, после которого зависимость считается недоступной
+        :param reset_timeout: время до пробного обращения к недоступной зависимости, сек
+        """
+        self.name = name
+        self.is_transient = is_transient or (lambda err: True)
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = RetryBudget(budget_ratio)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Задержка перед повтором (full jitter): случайное значение от 0 до base_delay * 2^attempt
+        :param attempt: номер выполненной попытки, начиная с 0
+        :return: задержка, сек
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func: Callable, *args, retry: bool = True, on_error: Callable = None, **kwargs):
+        """
+        Обращение к зависимости
+        :param func: функция обращения
+        :param retry: повторять обращение при временных ошибках (False - для неидемпотентных операций)
+        :param on_error: функция, вызываемая после неудачной попытки перед повтором (например, откат транзакции)
+        :return: результат func
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f'{self.name} недоступно, повтор через {self.breaker.remaining():.0f} сек')
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:
+                # зависимость ответила ошибкой запроса - она доступна, повтор бесполезен
+                if not self.is_transient(err):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if on_error is not None:
+                    on_error()
+                attempt += 1
+                if not retry or attempt >= self.attempts or not self.budget.withdraw():
+                    raise
+                delay = self.backoff(attempt - 1)
+                logger.warning(f'{self.name}: {err}; повтор {attempt} через {delay:.2f} сек')
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+
+def wait_for(*dependencies: Dependency) -> float:
+    """
+    Время, через которое все зависимости будут доступны для пробного обращения
+    :param dependencies: зависимости
+    :return: время ожидания, сек (0 - все зависимости доступны)
+    """
+    return max((dependency.breaker.remaining() for dependency in dependencies), default=0.0)
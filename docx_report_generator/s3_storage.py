@@ -11,9 +11,35 @@ from docx_report_generator.settings import (
     SECRET_KEY,
 )
 from minio import Minio
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error, ServerError
+from urllib3.exceptions import HTTPError
+
+from resilience import Dependency
 
 logger = logging.getLogger(__name__)
 
+# максимальное количество объектов в одном запросе удаления (ограничение API DeleteObjects)
+REMOVE_BATCH_SIZE = 1000
+# ответы хранилища с ошибкой запроса (например, отсутствие файла) не повторяются
+TRANSIENT_S3_CODES = {'SlowDown', 'InternalError', 'ServiceUnavailable', 'RequestTimeout'}
+
+
+def is_transient(err: Exception) -> bool:
+    """
+    Временными считаются сетевые ошибки и ответы хранилища с кодом 5xx или о перегрузке. Ошибки запросов
+    (например, отсутствие файла) и ошибки программы (TypeError, KeyError...) не повторяются
+    и не учитываются предохранителем
+    """
+    if isinstance(err, S3Error):
+        return err.code in TRANSIENT_S3_CODES or (err.response is not None and err.response.status >= 500)
+    if isinstance(err, ServerError):
+        return err.status_code >= 500
+    return isinstance(err, (HTTPError, OSError))
+
+
+s3 = Dependency('S3', is_transient=is_transient)
+
 
 class MyStorage:
     def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket_name: str, secure: bool = False):
@@ -35,7 +61,7 @@ class MyStorage:
         :param file_path: путь к файлу в файловой системе
         :return: None
         """
-        self.client.fput_object(self.bucket_name, file_name, file_path)
+        s3.call(self.client.fput_object, self.bucket_name, file_name, file_path)
 
     def upload_memory_file(self, file_name: str, data: BytesIO, length: int):
         """
@@ -45,19 +71,59 @@ class MyStorage:
         :param length:
         :return:
         """
-        self.client.put_object(self.bucket_name, file_name, data, length)
+        # при повторе файл отправляется с начала
+        s3.call(self.client.put_object, self.bucket_name, file_name, data, length, on_error=lambda: data.seek(0))
 
     def download_file(self, obj_name) -> tuple | bool:
+        """
+        Скачивание файла из хранилища
+        :param obj_name: путь к файлу в хранилище
+        :return: содержимое файла (bytes, без декодирования) и HTTP-статус ответа
+        """
+        return s3.call(self._download_file, obj_name)
+
+    def _download_file(self, obj_name) -> tuple:
         response = self.client.get_object(self.bucket_name, obj_name)
-        data, status = response.read().decode('utf-8'), response.status
-        response.release_conn()
-        response.close()
-        return data, status
+        # соединение возвращается в пул и при ошибке чтения (иначе каждый повтор оставлял бы занятое соединение)
+        try:
+            return response.read(), response.status
+        finally:
+            response.close()
+            response.release_conn()
 
-    def get_list_objects(self, path: str = None):
+    def get_list_objects(self, path: str = None) -> list:
+        # list_objects возвращает генератор - запросы выполняются при его обходе
         if path:
-            return self.client.list_objects(self.bucket_name, prefix=path)
-        return self.client.list_objects(self.bucket_name)
+            return s3.call(lambda: list(self.client.list_objects(self.bucket_name, prefix=path)))
+        return s3.call(lambda: list(self.client.list_objects(self.bucket_name)))
+
+    def list_object_names(self, prefix: str) -> list[str]:
+        """
+        Имена всех объектов с префиксом, включая вложенные "каталоги"
+        :param prefix: префикс (путь в хранилище)
+        :return: список имён объектов
+        """
+        return s3.call(lambda: [obj.object_name for obj in
+                                self.client.list_objects(self.bucket_name, prefix=prefix, recursive=True)])
+
+    def remove_objects(self, obj_names: list[str]):
+        """
+        Удаление объектов одним запросом (не более REMOVE_BATCH_SIZE объектов).
+        Удаление отсутствующего объекта не считается ошибкой, поэтому запрос безопасно повторяется
+        :param obj_names: имена объектов
+        :return: None
+        """
+        if len(obj_names) > REMOVE_BATCH_SIZE:
+            raise ValueError(f'Не более {REMOVE_BATCH_SIZE} объектов в одном запросе удаления')
+
+        def remove():
+            # remove_objects возвращает генератор ошибок - запрос выполняется при его обходе
+            errors = list(self.client.remove_objects(self.bucket_name, [DeleteObject(name) for name in obj_names]))
+            if errors:
+                raise IOError(f'Не удалось удалить {len(errors)} объектов: '
+                              f'{errors[0].name} - {errors[0].code} {errors[0].message}')
+
+        s3.call(remove)
 
     def share_file_from_bucket(self, file_name, expire=timedelta(seconds=60)):
         """
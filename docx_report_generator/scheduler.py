@@ -0,0 +1,76 @@
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# средний размер строки входных csv-файлов, байт (для оценки количества строк по размеру файла)
+AVG_ROW_BYTES = 250
+# вес строки каждого из входных файлов в стоимости отчёта: строки текущей РК участвуют в нескольких
+# пунктах (посещаемость, диаграммы, выбросы), у предыдущей РК и органики используется только первая строка
+INPUT_WEIGHTS = {'cur_rk': 3.0, 'campaigns': 2.0, 'groups': 2.0, 'prev_rk': 0.1, 'org': 0.1}
+# постоянная часть стоимости отчёта (создание документа, скачивание, отправка) в строках
+BASE_COST = 100.0
+
+
+class ReportScheduler:
+    """
+    Планировщик очереди отчетов: сначала обрабатываются наименее затратные отчеты (shortest-job-first),
+    приоритет отчёта растёт со временем ожидания (aging), поэтому крупные отчеты не откладываются бесконечно.
+    За один цикл обрабатываются отчеты суммарной стоимостью не больше batch_budget - после этого очередь
+    запрашивается заново, и появившиеся за это время небольшие отчеты не ждут завершения всего пакета
+    """
+
+    def __init__(self, aging_rate: float, batch_budget: float):
+        """
+        :param aging_rate: на сколько единиц стоимости снижается приоритет отчёта за секунду ожидания
+        :param batch_budget: максимальная суммарная стоимость отчетов за один цикл (0 - без ограничения)
+        """
+        self.aging_rate = aging_rate
+        self.batch_budget = batch_budget
+        self.first_seen: dict[int, float] = {}
+        self.deferred = 0
+
+    @staticmethod
+    def estimate_cost(sizes: dict[str, int]) -> float:
+        """
+        Оценка стоимости формирования отчёта (во взвешенных строках входных данных)
+        :param sizes: размеры входных файлов - имя параметра ReportGenerator: размер, байт
+        :return: стоимость
+        """
+        rows = sum(INPUT_WEIGHTS.get(key, 1.0) * size / AVG_ROW_BYTES for key, size in sizes.items())
+        return BASE_COST + rows
+
+    def plan(self, reports, get_sizes: Callable[[int], dict[str, int]]) -> list:
+        """
+        Упорядочивает отчеты и отбирает пакет для текущего цикла
+        :param reports: строки (идентификатор отчёта, заголовок)
+        :param get_sizes: функция, возвращающая размеры входных файлов отчёта
+        :return: отчеты для обработки в порядке очереди
+        """
+        now = time.monotonic()
+        report_ids = {report[0] for report in reports}
+        self.first_seen = {k: v for k, v in self.first_seen.items() if k in report_ids}
+
+        scored = []
+        for report in reports:
+            report_id = report[0]
+            waited = now - self.first_seen.setdefault(report_id, now)
+            try:
+                cost = self.estimate_cost(get_sizes(report_id))
+            except Exception as err:
+                logger.warning(f'Не удалось оценить размер отчета [{report_id}]: {err}')
+                cost = BASE_COST
+            scored.append((cost - self.aging_rate * waited, cost, report))
+        scored.sort(key=lambda item: item[0])
+
+        planned, total = [], 0.0
+        for _, cost, report in scored:
+            if planned and self.batch_budget and total + cost > self.batch_budget:
+                break
+            planned.append(report)
+            total += cost
+        self.deferred = len(scored) - len(planned)
+        if self.deferred:
+            logger.info(f'Отложено до следующего цикла: {self.deferred} отчетов')
+        return planned
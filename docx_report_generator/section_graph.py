@@ -0,0 +1,55 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable
+
+
+class SectionGraph:
+    """
+    Граф задач формирования отчёта (разбор входных данных, модели пунктов, диаграммы): задача запускается
+    после завершения задач, от которых она зависит, независимые задачи выполняются одновременно
+    """
+
+    def __init__(self):
+        # название задачи: (функция, названия задач-зависимостей)
+        self.nodes: dict[str, tuple[Callable[[dict], object], tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: Callable[[dict], object], *deps: str):
+        """
+        Добавляет задачу
+        :param name: название задачи
+        :param func: функция задачи, принимает словарь результатов выполненных задач
+        :param deps: названия задач, от которых зависит задача (должны быть добавлены ранее)
+        :return: None
+        """
+        unknown = [dep for dep in deps if dep not in self.nodes]
+        if unknown:
+            raise ValueError(f'Неизвестные зависимости задачи {name}: {", ".join(unknown)}')
+        self.nodes[name] = (func, deps)
+
+    def run(self, executor: Executor = None) -> dict:
+        """
+        Выполнение задач
+        :param executor: исполнитель (None - задачи выполняются последовательно в порядке добавления)
+        :return: словарь - название задачи: результат
+        """
+        results = {}
+        if executor is None:
+            for name, (func, _) in self.nodes.items():
+                results[name] = func(results)
+            return results
+
+        waiting = dict(self.nodes)
+        running: dict[Future, str] = {}
+        try:
+            while waiting or running:
+                for name, (func, deps) in list(waiting.items()):
+                    if all(dep in results for dep in deps):
+                        running[executor.submit(func, results)] = name
+                        del waiting[name]
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # ошибка задачи прерывает формирование отчёта
+                    results[running.pop(future)] = future.result()
+        finally:
+            for future in running:
+                future.cancel()
+        return results
@@ -1,4 +1,5 @@
 import os
+import socket
 
 import dotenv
 
@@ -12,6 +13,11 @@ DB_HOST = os.getenv('DB_HOST')
 DB_PORT = os.getenv('DB_PORT')
 DB_SCHEME = 'campaign_stats'
 
+# Источник входных данных отчетов: s3 - csv-файлы из хранилища, postgres - запросы к БД (COPY ... TO STDOUT)
+INPUT_SOURCE = os.getenv('INPUT_SOURCE', 's3')
+# json-файл с запросами входных данных (см. database/inputs.py), по-умолчанию - представления report_input_*
+DB_INPUT_QUERIES = os.getenv('DB_INPUT_QUERIES')
+
 # Minio
 ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
 OUTER_ENDPOINT_URL = os.getenv('S3_OUTER_ENDPOINT_URL')
@@ -19,3 +25,72 @@ ACCESS_KEY = os.getenv('S3_ACCESS_KEY')
 SECRET_KEY = os.getenv('S3_SECRET_KEY')
 BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
 SECURE = os.getenv('S3_SECURE')
+
+# Кэш пунктов отчёта
+FRAGMENT_CACHE_DIR = os.getenv('FRAGMENT_CACHE_DIR')
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Конвейерная обработка отчетов
+PIPELINE_MODE = os.getenv('WORKER_MODE', 'sequential') == 'pipeline'
+PIPELINE_RENDER_WORKERS = int(os.getenv('PIPELINE_RENDER_WORKERS', os.cpu_count() or 1))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 2))
+PIPELINE_IO_CONCURRENCY = int(os.getenv('PIPELINE_IO_CONCURRENCY', 4))
+
+# Планировщик очереди отчетов
+SCHEDULER_AGING_RATE = float(os.getenv('SCHEDULER_AGING_RATE', 50))
+SCHEDULER_BATCH_BUDGET = float(os.getenv('SCHEDULER_BATCH_BUDGET', 0))
+
+# Перезапуск процесса-обработчика для контроля потребления памяти
+WORKER_MAX_REPORTS = int(os.getenv('WORKER_MAX_REPORTS', 0))
+WORKER_MAX_RSS_MB = int(os.getenv('WORKER_MAX_RSS_MB', 0))
+WORKER_TRACEMALLOC = os.getenv('WORKER_TRACEMALLOC', '').lower() in ('1', 'true', 'yes')
+
+# Интервал между поисками новых запросов, сек
+WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', 60))
+
+# Ограничение времени формирования отчёта, сек (0 - без ограничения), количество диаграмм
+# и элементов каждого перечня при нехватке времени
+REPORT_DEADLINE = float(os.getenv('REPORT_DEADLINE', 0))
+REPORT_DEGRADED_CHARTS = int(os.getenv('REPORT_DEGRADED_CHARTS', 3))
+REPORT_DEGRADED_ITEMS = int(os.getenv('REPORT_DEGRADED_ITEMS', 10))
+
+# Количество элементов перечней (действия, группы, кампании), описываемых подробно: остальные выводятся
+# компактной таблицей (0 - все элементы описываются подробно)
+REPORT_DETAILED_ITEMS = int(os.getenv('REPORT_DETAILED_ITEMS', 50))
+
+# Количество потоков, в которых одновременно формируются пункты отчёта (1 - последовательно), и процессов
+# общего пула для построения диаграмм (0 или 1 - диаграммы строятся в потоке пункта; по-умолчанию - количество
+# ядер; в процессах конвейера и пакетной генерации пул не используется)
+REPORT_SECTION_WORKERS = int(os.getenv('REPORT_SECTION_WORKERS', 4))
+REPORT_CHART_PROCESSES = int(os.getenv('REPORT_CHART_PROCESSES', os.cpu_count() or 1))
+
+# Повтор обращений к БД и хранилищу: попыток, задержка перед первым повтором и максимальная задержка (сек),
+# доля обращений, для которых допускается повтор
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 10))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.2))
+# Предохранитель: ошибок подряд до приостановки обращений и длительность приостановки, сек
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
+
+# Распределение отчетов между репликами по product_id (согласованное хэширование)
+SHARDING_MODE = os.getenv('SHARDING_MODE', '').lower() in ('1', 'true', 'yes')
+REPLICA_ID = os.getenv('REPLICA_ID') or socket.gethostname()
+SHARD_HEARTBEAT_TTL = float(os.getenv('SHARD_HEARTBEAT_TTL', 3 * WORKER_POLL_INTERVAL))
+SHARD_VNODES = int(os.getenv('SHARD_VNODES', 64))
+SHARD_STEAL_AFTER = float(os.getenv('SHARD_STEAL_AFTER', 2 * WORKER_POLL_INTERVAL))
+SHARD_STEAL_LIMIT = int(os.getenv('SHARD_STEAL_LIMIT', 1))
+
+# Удаление из хранилища файлов отчетов с флагом to_delete (WORKER_MODE=reaper): отчетов за цикл,
+# объектов в секунду и интервал между поисками отчетов, сек
+REAPER_MODE = os.getenv('WORKER_MODE', 'sequential') == 'reaper'
+REAPER_BATCH_SIZE = int(os.getenv('REAPER_BATCH_SIZE', 200))
+REAPER_OBJECTS_PER_SECOND = float(os.getenv('REAPER_OBJECTS_PER_SECOND', 500))
+REAPER_INTERVAL = float(os.getenv('REAPER_INTERVAL', 10 * WORKER_POLL_INTERVAL))
+
+# Учёт затрат ресурсов на каждый отчёт (таблица report_usage, migrations/004_report_usage.sql), по-умолчанию отключён
+USAGE_ACCOUNTING = os.getenv('USAGE_ACCOUNTING', '0').lower() in ('1', 'true', 'yes')
+
+# Статус черновика отчёта (без диаграмм), ожидающего полной генерации
+DRAFT_STATUS_ID = int(os.getenv('DRAFT_STATUS_ID', 6))
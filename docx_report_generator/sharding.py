@@ -0,0 +1,124 @@
+import bisect
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from database.db import db, session_maker
+from database.models import WorkerHeartbeat
+
+logger = logging.getLogger(__name__)
+
+
+def stable_hash(key: str) -> int:
+    """
+    Хэш, не зависящий от процесса (встроенный hash() для строк различается между запусками)
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Кольцо согласованного хэширования: при появлении или отключении реплики
+    переназначается только часть продуктов, а не все
+    """
+
+    def __init__(self, nodes, vnodes: int):
+        """
+        :param nodes: идентификаторы реплик
+        :param vnodes: количество точек каждой реплики на кольце (чем больше, тем равномернее распределение)
+        """
+        self.nodes = sorted(set(nodes))
+        points = sorted((stable_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    def owner(self, key) -> str | None:
+        """
+        Реплика, ответственная за ключ
+        :param key: ключ (идентификатор продукта)
+        :return: идентификатор реплики или None, если кольцо пустое
+        """
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, stable_hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+class ShardRouter:
+    """
+    Распределение отчетов между репликами по product_id: отчеты одного продукта используют во многом
+    одни и те же данные, поэтому их обработка одной репликой повышает попадания в её кэши.
+    Набор живых реплик определяется по таблице worker_heartbeat. Реплика, у которой нет своих отчетов,
+    забирает отчеты других реплик, ожидающие обработки дольше steal_after секунд
+    """
+
+    def __init__(self, replica_id: str, ttl: float, vnodes: int, steal_after: float, steal_limit: int):
+        """
+        :param replica_id: идентификатор реплики
+        :param ttl: время, в течение которого реплика без отметки о работе считается живой, сек
+        :param vnodes: количество точек каждой реплики на кольце
+        :param steal_after: время ожидания отчёта другой реплики, после которого его можно забрать, сек
+        :param steal_limit: максимальное количество отчетов других реплик за один цикл
+        """
+        self.replica_id = replica_id
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.steal_after = steal_after
+        self.steal_limit = steal_limit
+        self.ring = HashRing([replica_id], vnodes)
+        self.first_seen: dict[int, float] = {}
+
+    def heartbeat(self):
+        """
+        Отмечает реплику как живую и обновляет кольцо по списку живых реплик.
+        При недоступности БД используется прежнее кольцо
+        """
+        stmt = insert(WorkerHeartbeat).values(replica_id=self.replica_id, heartbeat_at=func.now())
+        stmt = stmt.on_conflict_do_update(index_elements=[WorkerHeartbeat.replica_id],
+                                          set_={'heartbeat_at': stmt.excluded.heartbeat_at})
+        alive = select(WorkerHeartbeat.replica_id).where(
+            WorkerHeartbeat.heartbeat_at > func.now() - timedelta(seconds=self.ttl))
+
+        def execute(session):
+            session.execute(stmt)
+            replicas = session.scalars(alive).all()
+            session.commit()
+            return replicas
+
+        try:
+            with session_maker() as session:
+                replicas = db.call(execute, session, on_error=session.rollback)
+        except Exception as err:
+            logger.warning(f'Не удалось обновить список реплик: {err}')
+            return
+        if set(replicas) | {self.replica_id} != set(self.ring.nodes):
+            self.ring = HashRing([*replicas, self.replica_id], self.vnodes)
+            logger.info(f'Живые реплики: {", ".join(self.ring.nodes)}')
+
+    def select(self, reports) -> list:
+        """
+        Отбирает отчеты реплики
+        :param reports: строки get_reports (с полем product_id)
+        :return: отчеты продуктов реплики или, если их нет, отчеты других реплик, ожидающие дольше steal_after
+        """
+        now = time.monotonic()
+        report_ids = {report.id for report in reports}
+        self.first_seen = {k: v for k, v in self.first_seen.items() if k in report_ids}
+
+        own, foreign = [], []
+        for report in reports:
+            waited = now - self.first_seen.setdefault(report.id, now)
+            if self.ring.owner(report.product_id) == self.replica_id:
+                own.append(report)
+            elif waited >= self.steal_after:
+                foreign.append(report)
+        if own or not foreign:
+            return own
+
+        stolen = sorted(foreign, key=lambda report: self.first_seen[report.id])[:self.steal_limit]
+        logger.info(f'Нет собственных отчетов, взяты отчеты других реплик: {[report.id for report in stolen]}')
+        return stolen
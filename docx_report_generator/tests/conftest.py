@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# модули проекта импортируются без пакета, как в main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.db создаёт engine при импорте (соединение при этом не открывается)
+for name, value in {'DB_HOST': 'localhost', 'DB_PORT': '5432', 'DB_NAME': 'test', 'DB_USER': 'test',
+                    'DB_PASSWORD': 'test'}.items():
+    os.environ.setdefault(name, value)
+
+# входные данные примера отчёта: имя параметра ReportGenerator - файл
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example', 'input_data')
+EXAMPLE_FILES = {'cur_rk': 'Текущая РК.csv', 'prev_rk': 'Предыдущая РК.csv', 'org': 'Органический трафик.csv',
+                 'groups': 'Группы по типу РК.csv', 'campaigns': 'Все кампании.csv'}
+
+
+class Clock:
+    """
+    Управляемое время для модулей, использующих time.monotonic и time.sleep: sleep не ждёт,
+    а сдвигает время и запоминает задержку
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+    def install(self, monkeypatch, module):
+        """
+        Подменяет time.monotonic и time.sleep, используемые модулем
+        :param monkeypatch: фикстура monkeypatch
+        :param module: модуль проекта (импортирующий time)
+        """
+        monkeypatch.setattr(module.time, 'monotonic', self)
+        monkeypatch.setattr(module.time, 'sleep', self.sleep)
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def example_data() -> dict[str, bytes]:
+    """
+    Входные данные примера отчёта (example/input_data): имя параметра ReportGenerator - содержимое файла
+    """
+    data = {}
+    for key, name in EXAMPLE_FILES.items():
+        with open(os.path.join(EXAMPLE_DIR, name), 'rb') as f:
+            data[key] = f.read()
+    return data
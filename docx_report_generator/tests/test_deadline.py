@@ -0,0 +1,78 @@
+import pytest
+
+import deadline
+from deadline import ReportDeadline
+from report_generator import ReportGenerator
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    clock.install(monkeypatch, deadline)
+
+
+@pytest.mark.parametrize('elapsed, level', [
+    (0, ReportDeadline.FULL),
+    (49.9, ReportDeadline.FULL),
+    (50.1, ReportDeadline.FEWER_CHARTS),
+    (74.9, ReportDeadline.FEWER_CHARTS),
+    (75.1, ReportDeadline.TOP_ITEMS),
+    (99.9, ReportDeadline.TOP_ITEMS),
+    (100, ReportDeadline.SKIP_SECTIONS),
+    (150, ReportDeadline.SKIP_SECTIONS),
+])
+def test_level_thresholds(clock, elapsed, level):
+    report_deadline = ReportDeadline(100, max_charts=3, top_items=5)
+    clock.now += elapsed
+    assert report_deadline.level() == level
+
+
+def test_limits_follow_level(clock):
+    report_deadline = ReportDeadline(100, max_charts=3, top_items=5)
+    assert (report_deadline.chart_limit(), report_deadline.item_limit(), report_deadline.skip_section()) \
+           == (None, None, False)
+    clock.now += 60
+    assert (report_deadline.chart_limit(), report_deadline.item_limit(), report_deadline.skip_section()) \
+           == (3, None, False)
+    clock.now += 20
+    assert (report_deadline.chart_limit(), report_deadline.item_limit(), report_deadline.skip_section()) \
+           == (3, 5, False)
+    clock.now += 20
+    assert (report_deadline.chart_limit(), report_deadline.item_limit(), report_deadline.skip_section()) \
+           == (3, 5, True)
+    assert report_deadline.overrun == 0
+    clock.now += 7
+    assert report_deadline.overrun == pytest.approx(7)
+
+
+def test_no_budget_means_no_limits(clock):
+    report_deadline = ReportDeadline(0)
+    clock.now += 10 ** 6
+    assert report_deadline.level() == ReportDeadline.FULL
+    assert report_deadline.chart_limit() is None and report_deadline.overrun == 0
+
+
+def test_shorten_records_unique_notes(clock):
+    report_deadline = ReportDeadline(100)
+    report_deadline.shorten('groups', 'показаны первые 5 групп')
+    report_deadline.shorten('groups', 'показаны первые 5 групп')
+    report_deadline.shorten('custom', 'пропущен')
+    assert report_deadline.degraded == {'groups', 'custom'}
+    assert report_deadline.notes == ['пункт «Группы»: показаны первые 5 групп', 'пункт «custom»: пропущен']
+
+
+def test_chart_limit_is_checked_before_each_chart(monkeypatch, example_data):
+    drawn = []
+    draw_chart = ReportGenerator.draw_chart
+
+    def counting_draw_chart(chart):
+        drawn.append(chart)
+        return draw_chart(chart)
+
+    # время заканчивается после построения первой диаграммы пункта
+    monkeypatch.setattr(ReportGenerator, 'draw_chart', staticmethod(counting_draw_chart))
+    monkeypatch.setattr(ReportDeadline, 'chart_limit', lambda self: 1 if drawn else None)
+    report = ReportGenerator('тест', deadline=100, section_workers=1, chart_processes=0, **example_data)
+    report.write_sections('funnel_graph')
+    assert len(drawn) == 1
+    assert report.deadline.notes == ['пункт «Диаграммы выполнения целевых действий»: построено 1 из 3 диаграмм']
+    assert report.usage_stats()['degraded_sections'] == 1
@@ -0,0 +1,66 @@
+from docx import Document
+
+import fragment_cache
+from fragment_cache import Fragment, FragmentCache
+
+
+def fragment(size: int) -> Fragment:
+    return Fragment([b'x' * size], {})
+
+
+def test_lru_eviction():
+    cache = FragmentCache(max_size=30)
+    for key in 'abc':
+        cache.put(key, fragment(10))
+    # обращение к a делает его последним использованным - вытесняется b
+    assert cache.get('a') is not None
+    cache.put('d', fragment(10))
+    assert cache.get('b') is None
+    assert [key for key in 'acd' if cache.get(key) is not None] == ['a', 'c', 'd']
+
+
+def test_oversized_fragment_not_stored():
+    cache = FragmentCache(max_size=5)
+    cache.put('a', fragment(10))
+    assert cache.get('a') is None
+
+
+def test_replace_keeps_size():
+    cache = FragmentCache(max_size=30)
+    cache.put('a', fragment(10))
+    cache.put('a', fragment(20))
+    cache.put('b', fragment(10))
+    assert cache.get('a') is not None and cache.get('b') is not None
+
+
+def test_key_depends_on_inputs_and_outlier_rate():
+    key = FragmentCache.make_key('general', ['1', '2'], 1.5)
+    assert key == FragmentCache.make_key('general', ['1', '2'], 1.5)
+    assert key != FragmentCache.make_key('general', ['1', '3'], 1.5)
+    assert key != FragmentCache.make_key('general', ['1', '2'], 2)
+    assert key != FragmentCache.make_key('groups', ['1', '2'], 1.5)
+
+
+def test_version_invalidates_keys(monkeypatch):
+    key = FragmentCache.make_key('general', ['1'], 1.5)
+    monkeypatch.setattr(fragment_cache, 'FRAGMENT_VERSION', fragment_cache.FRAGMENT_VERSION + 1)
+    assert FragmentCache.make_key('general', ['1'], 1.5) != key
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    FragmentCache(max_size=100, cache_dir=str(tmp_path)).put('a', fragment(10))
+    restored = FragmentCache(max_size=100, cache_dir=str(tmp_path)).get('a')
+    assert restored is not None and restored.elements == [b'x' * 10]
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_capture_and_restore():
+    source = Document()
+    source.add_paragraph('до пункта')
+    start = len(Fragment.body_elements(source))
+    source.add_paragraph('текст пункта')
+    captured = Fragment.capture(source, start)
+
+    target = Document()
+    captured.restore(target)
+    assert [p.text for p in target.paragraphs] == ['текст пункта']
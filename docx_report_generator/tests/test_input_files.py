@@ -0,0 +1,48 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+import zstandard
+
+from input_files import SIZE_RATIO, match_input_file, select_input_files, split_input_file
+from report_generator import Data
+
+
+def test_split_input_file():
+    assert split_input_file('products_report_generator/1/csv_exports/Текущая РК.csv') == ('cur_rk', 'csv')
+    assert split_input_file('ВСЕ КАМПАНИИ.CSV.GZ') == ('campaigns', 'csv.gz')
+    assert split_input_file('dir\\Органический трафик.parquet') == ('org', 'parquet')
+    assert split_input_file('Текущая РК.xlsx') == (None, None)
+    assert match_input_file('Прочее.csv') is None
+
+
+def test_select_prefers_compact_formats():
+    selected = select_input_files(['Текущая РК.csv', 'Текущая РК.csv.gz', 'Текущая РК.parquet',
+                                   'Группы по типу РК.csv', 'Группы по типу РК.csv.zst', 'readme.txt'])
+    assert selected == {'cur_rk': ('Текущая РК.parquet', 'parquet'),
+                        'groups': ('Группы по типу РК.csv.zst', 'csv.zst')}
+
+
+def test_size_ratio_estimates_csv_size(example_data):
+    content = example_data['cur_rk']
+    # оценка объёма csv по размеру сжатого файла - в пределах порядка величины
+    for input_format, compressed in (('csv', content), ('csv.gz', gzip.compress(content)),
+                                     ('csv.zst', zstandard.ZstdCompressor().compress(content))):
+        estimate = len(compressed) * SIZE_RATIO[input_format]
+        assert len(content) / 10 < estimate < len(content) * 10
+
+
+@pytest.mark.parametrize('input_format', ['csv', 'csv.gz', 'csv.zst', 'parquet'])
+def test_formats_read_identically(example_data, input_format):
+    content = example_data['cur_rk']
+    expected = Data.read_table(content)
+    if input_format == 'csv.gz':
+        content = gzip.compress(content)
+    elif input_format == 'csv.zst':
+        content = zstandard.ZstdCompressor().compress(content)
+    elif input_format == 'parquet':
+        buffer = io.BytesIO()
+        expected.to_parquet(buffer)
+        content = buffer.getvalue()
+    pd.testing.assert_frame_equal(Data.read_table(content, input_format=input_format), expected)
@@ -0,0 +1,41 @@
+import glob
+import os
+import re
+
+from settings import DRAFT_STATUS_ID
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# статусы исходной схемы, существующие в БД до применения migrations
+BASE_STATUS_IDS = {0, 1, 2, 3, 4, 5}
+STATUS_INSERT = re.compile(r'INSERT INTO campaign_stats\.status\s*\(id, "name", description\)\s*'
+                           r"VALUES\s*\((\d+), '([^']*)', '([^']*)'\)\s*(ON CONFLICT \(id\) DO NOTHING)?", re.I)
+
+
+def read(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def migrations() -> dict[str, str]:
+    paths = sorted(glob.glob(os.path.join(ROOT_DIR, 'migrations', '*.sql')))
+    return {os.path.basename(path): read(path) for path in paths}
+
+
+def test_migrations_add_new_status_rows():
+    # сравнение схем (pg_dump -s) не замечает отсутствующих строк справочников
+    schema_sql = read(os.path.join(ROOT_DIR, 'campaign_stats.sql'))
+    schema = {int(match[0]): match[1:3] for match in STATUS_INSERT.findall(schema_sql)}
+    assert DRAFT_STATUS_ID in schema
+    migrated = {}
+    for name, sql in migrations().items():
+        for match in STATUS_INSERT.findall(sql):
+            assert match[3], f'{name}: повторное применение добавления статуса {match[0]} должно быть безопасным'
+            migrated[int(match[0])] = match[1:3]
+    assert migrated == {status_id: row for status_id, row in schema.items() if status_id not in BASE_STATUS_IDS}
+
+
+def test_migrations_are_idempotent():
+    statement = re.compile(r'^\s*(CREATE TABLE|CREATE INDEX|ALTER TABLE \S+ ADD COLUMN)\s+(?!IF NOT EXISTS)(\S+)',
+                           re.I | re.M)
+    for name, sql in migrations().items():
+        assert not statement.findall(sql), name
@@ -0,0 +1,73 @@
+import asyncio
+import os
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from memory import MemoryMonitor
+from pipeline import ReportPipeline, render_executor
+
+Report = namedtuple('Report', ['id', 'header', 'product_id'])
+
+
+class FakeProcessor:
+    def __init__(self, data: dict):
+        self.data = data
+        self.uploaded: dict[int, bytes] = {}
+
+    def report_profile(self, report) -> str:
+        return 'text'
+
+    def get_data_content(self, report_id: int) -> dict:
+        return self.data
+
+    def upload_to_s3(self, file, file_name: str, report_id: int) -> str:
+        self.uploaded[report_id] = file.getvalue()
+        return f'products_report_generator/{report_id}/docx_report/{file_name}'
+
+
+def run_batch(processor: FakeProcessor, executor, report_ids) -> ReportPipeline:
+    report_pipeline = ReportPipeline(processor, executor, render_concurrency=2)
+    asyncio.run(report_pipeline.run([Report(report_id, 'тест', 1) for report_id in report_ids]))
+    return report_pipeline
+
+
+@pytest.fixture
+def executor():
+    executors = [render_executor(2)]
+    yield executors
+    for executor in executors:
+        executor.shutdown(cancel_futures=True)
+
+
+def test_batch_renders(example_data, executor):
+    processor = FakeProcessor(example_data)
+    report_pipeline = run_batch(processor, executor[0], [1, 2])
+    assert set(report_pipeline.completed) == {1, 2} and not report_pipeline.errors
+    assert not report_pipeline.broken
+    assert all(content.startswith(b'PK') for content in processor.uploaded.values())
+
+
+def test_killed_worker_breaks_pool_and_new_pool_renders(example_data, executor):
+    processor = FakeProcessor(example_data)
+    # аварийное завершение процесса-исполнителя (как при OOM) делает пул непригодным
+    with pytest.raises(BrokenProcessPool):
+        executor[0].submit(os._exit, 1).result()
+    report_pipeline = run_batch(processor, executor[0], [1, 2])
+    assert report_pipeline.broken and not report_pipeline.completed
+    assert set(report_pipeline.errors) == {'1', '2'}
+
+    # main_cycle пересоздаёт пул, следующий пакет формируется
+    executor.append(render_executor(2))
+    report_pipeline = run_batch(processor, executor[-1], [1, 2])
+    assert set(report_pipeline.completed) == {1, 2} and not report_pipeline.broken
+
+
+def test_worker_rss_is_checked_against_limit(example_data, executor):
+    report_pipeline = run_batch(FakeProcessor(example_data), executor[0], [1])
+    # RSS процесса-исполнителя, формировавшего отчёт, а не основного процесса
+    assert report_pipeline.max_worker_rss > 0
+    assert MemoryMonitor(max_rss_mb=1).rss_exceeded(report_pipeline.max_worker_rss)
+    assert not MemoryMonitor(max_rss_mb=10 ** 6).rss_exceeded(report_pipeline.max_worker_rss)
+    assert not MemoryMonitor().rss_exceeded(report_pipeline.max_worker_rss)
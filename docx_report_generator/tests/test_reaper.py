@@ -0,0 +1,110 @@
+import importlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from resilience import Dependency
+
+
+class FakeStorage:
+    def __init__(self, objects: dict[int, int]):
+        # идентификатор отчёта: количество файлов
+        self.objects = {report_id: [f'products_report_generator/{report_id}/{i}.csv' for i in range(count)]
+                        for report_id, count in objects.items()}
+        self.removed: list[list[str]] = []
+        self.error: Exception | None = None
+
+    def list_object_names(self, prefix: str) -> list[str]:
+        return [name for names in self.objects.values() for name in names if name.startswith(prefix)]
+
+    def remove_objects(self, obj_names: list[str]):
+        if self.error is not None:
+            raise self.error
+        self.removed.append(list(obj_names))
+
+
+class FakeSession:
+    def __init__(self, report_ids: list[int]):
+        self.report_ids = report_ids
+        self.statements = []
+        self.commits = 0
+
+    def scalars(self, stmt):
+        return SimpleNamespace(all=lambda: self.report_ids)
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect(),
+                                                compile_kwargs={'literal_binds': True})))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def reaper(monkeypatch, clock):
+    # s3_storage подключается к хранилищу при импорте
+    monkeypatch.setitem(sys.modules, 's3_storage', SimpleNamespace(REMOVE_BATCH_SIZE=1000, s3=Dependency('S3'),
+                                                                   storage=None))
+    monkeypatch.delitem(sys.modules, 'reaper', raising=False)
+    module = importlib.import_module('reaper')
+    clock.install(monkeypatch, module)
+    yield module
+    sys.modules.pop('reaper', None)
+
+
+def test_rate_limiter(reaper, clock):
+    limiter = reaper.RateLimiter(100)
+    limiter.acquire(50)
+    limiter.acquire(100)
+    limiter.acquire(1)
+    assert clock.sleeps == [0.5, 1.0]
+    # простой не накапливается в запас
+    clock.now += 60
+    limiter.acquire(100)
+    limiter.acquire(1)
+    assert clock.sleeps == [0.5, 1.0, 1.0]
+    reaper.RateLimiter(0).acquire(10 ** 6)
+    assert len(clock.sleeps) == 3
+
+
+def test_purge_batches_objects_across_reports(reaper, monkeypatch):
+    storage = FakeStorage({1: 600, 2: 700, 3: 5, 4: 1200})
+    monkeypatch.setattr(reaper, 'storage', storage)
+    session = FakeSession([1, 2, 3, 4])
+    assert reaper.S3Reaper(batch_size=10, objects_per_second=0).purge(session) == 4
+    # объекты нескольких отчетов удаляются общими запросами не больше REMOVE_BATCH_SIZE объектов
+    assert [len(chunk) for chunk in storage.removed] == [1000, 1000, 505]
+    assert sorted(name for chunk in storage.removed for name in chunk) == \
+           sorted(name for names in storage.objects.values() for name in names)
+    assert len(session.statements) == 1 and session.commits == 1
+    assert 's3_purged_at=now()' in session.statements[0] and 'IN (1, 2, 3, 4)' in session.statements[0]
+
+
+def test_purge_rate_limit(reaper, monkeypatch, clock):
+    monkeypatch.setattr(reaper, 'storage', FakeStorage({1: 1500}))
+    reaper.S3Reaper(batch_size=10, objects_per_second=1000).purge(FakeSession([1]))
+    # листинг (1 объект), затем 1000 и 500 объектов
+    assert clock.sleeps == [pytest.approx(0.001), pytest.approx(1.0)]
+
+
+def test_purge_without_reports(reaper, monkeypatch):
+    storage = FakeStorage({})
+    monkeypatch.setattr(reaper, 'storage', storage)
+    session = FakeSession([])
+    assert reaper.S3Reaper().purge(session) == 0
+    assert not storage.removed and not session.statements and not session.commits
+
+
+def test_failed_remove_leaves_reports_unmarked(reaper, monkeypatch):
+    storage = FakeStorage({1: 3})
+    storage.error = ConnectionError('timeout')
+    monkeypatch.setattr(reaper, 'storage', storage)
+    session = FakeSession([1])
+    with pytest.raises(ConnectionError):
+        reaper.S3Reaper(objects_per_second=0).purge(session)
+    assert not session.statements and not session.commits
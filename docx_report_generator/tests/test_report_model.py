@@ -0,0 +1,48 @@
+import json
+
+from report_generator import render_report_model
+from report_model import Chart, ReportModel, Section
+
+def sample_model() -> ReportModel:
+    section = Section('general')
+    section.add_paragraph('Общие <показатели>', style='List Number')
+    paragraph = section.add_paragraph(style='List Bullet')
+    paragraph.add_run('Визиты: ')
+    paragraph.add_run('10', bold=True)
+    section.add_paragraph(style='List Bullet').add_run('Отказы', italic=True)
+    section.add_paragraph().add_run(chart=Chart('Воронка', ['Шаг 1', 'Шаг 2'], [10, 5], 'Посетители'))
+    section.add_table(['Название', 'Визитов'], [['Кампания & 1', '3']], caption='Остальные кампании')
+    return ReportModel('Продукт', [section])
+
+
+def test_paragraph_text_joins_runs():
+    assert sample_model().sections[0].paragraphs[1].text == 'Визиты: 10'
+
+
+def test_json_contains_structure():
+    data = json.loads(sample_model().to_json())
+    paragraphs = data['sections'][0]['paragraphs']
+    assert data['header'] == 'Продукт'
+    assert paragraphs[3]['runs'][0]['chart']['values'] == [10, 5]
+    assert paragraphs[4]['table']['rows'] == [['Кампания & 1', '3']]
+
+
+def test_html_rendering():
+    html = sample_model().to_html()
+    assert '<h2>1. Общие &lt;показатели&gt;</h2>' in html
+    # подряд идущие пункты списка объединяются в один <ul>
+    assert html.count('<ul>') == 1 and html.count('</ul>') == 1
+    assert '<li>Визиты: <b>10</b></li>' in html
+    assert '<li><i>Отказы</i></li>' in html
+    assert '<figure><figcaption>Воронка</figcaption>' in html and '<td>Шаг 2</td><td>5</td>' in html
+    assert '<p>Остальные кампании</p>' in html and '<td>Кампания &amp; 1</td>' in html
+
+
+def test_example_report_model(example_data):
+    model = render_report_model(example_data, 'тестовая кампания')
+    assert [section.name for section in model.sections] == ['general', 'page_views', 'funnel_graph', 'outliers',
+                                                            'groups']
+    charts = [run.chart for section in model.sections for paragraph in section.paragraphs
+              for run in paragraph.runs if run.chart is not None]
+    assert len(charts) == 3
+    assert 'тестовая кампания' in model.to_html()
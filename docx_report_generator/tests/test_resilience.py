@@ -0,0 +1,124 @@
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, Dependency, RetryBudget, wait_for
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    clock.install(monkeypatch, resilience)
+
+
+def test_breaker_open_half_open_closed(clock):
+    breaker = CircuitBreaker('БД', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    assert breaker.remaining() == 30
+    clock.now += 30
+    # после reset_timeout пропускается только одно пробное обращение
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+    assert breaker.remaining() == 0
+
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker('S3', failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    assert breaker.remaining() == 10
+
+
+def test_retry_budget_exhaustion():
+    budget = RetryBudget(ratio=0.5, min_tokens=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_call_retries_transient_errors(clock):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError('timeout')
+        return 'ok'
+
+    rollbacks = []
+    dependency = Dependency('БД', attempts=3, base_delay=1, max_delay=10, failure_threshold=5)
+    assert dependency.call(flaky, on_error=lambda: rollbacks.append(1)) == 'ok'
+    assert len(calls) == 3 and len(rollbacks) == 2
+    assert len(clock.sleeps) == 2 and clock.sleeps[0] <= 1 and clock.sleeps[1] <= 2
+    assert dependency.breaker.failures == 0
+
+
+def test_call_stops_when_budget_is_exhausted(clock):
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError('timeout')
+
+    dependency = Dependency('S3', attempts=100, base_delay=0, budget_ratio=0, failure_threshold=1000)
+    dependency.budget.tokens = 3
+    with pytest.raises(ConnectionError):
+        dependency.call(failing)
+    # первая попытка и три повтора из бюджета
+    assert len(calls) == 4
+    with pytest.raises(ConnectionError):
+        dependency.call(failing)
+    assert len(calls) == 5
+
+
+def test_non_transient_error_is_not_retried(clock):
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ValueError('нет такого отчёта')
+
+    dependency = Dependency('БД', is_transient=lambda err: isinstance(err, ConnectionError), failure_threshold=1)
+    with pytest.raises(ValueError):
+        dependency.call(bad_request)
+    assert len(calls) == 1 and not clock.sleeps
+    assert dependency.breaker.allow()
+
+
+def refused():
+    raise ConnectionError('refused')
+
+
+def test_open_breaker_rejects_calls(clock):
+    db = Dependency('БД', attempts=1, failure_threshold=1, reset_timeout=20)
+    s3 = Dependency('S3')
+    with pytest.raises(ConnectionError):
+        db.call(refused)
+    with pytest.raises(CircuitOpenError):
+        db.call(lambda: 'ok')
+    assert wait_for(db, s3) == 20
+    clock.now += 20
+    assert wait_for(db, s3) == 0
+    assert db.call(lambda: 'ok') == 'ok'
+
+
+def test_call_without_retry(clock):
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError('timeout')
+
+    with pytest.raises(ConnectionError):
+        Dependency('S3', attempts=5).call(failing, retry=False)
+    assert len(calls) == 1
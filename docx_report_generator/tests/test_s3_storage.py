@@ -0,0 +1,89 @@
+import importlib
+import os
+import sys
+from types import SimpleNamespace
+
+import minio
+import pytest
+from minio.error import S3Error, ServerError
+from urllib3.exceptions import MaxRetryError, ProtocolError
+
+import resilience
+
+
+class FakeResponse:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.status = 200
+        self.closed = self.released = False
+
+    def read(self) -> bytes:
+        if self.error is not None:
+            raise self.error
+        return b'data'
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    def __init__(self, **kwargs):
+        self.responses: list[FakeResponse] = []
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return True
+
+    def get_object(self, bucket_name: str, obj_name: str) -> FakeResponse:
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def s3_storage(monkeypatch, clock):
+    # модуль подключается к хранилищу при импорте
+    monkeypatch.setattr(minio, 'Minio', FakeMinio)
+    monkeypatch.syspath_prepend(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    monkeypatch.delitem(sys.modules, 's3_storage', raising=False)
+    clock.install(monkeypatch, resilience)
+    yield importlib.import_module('s3_storage')
+    sys.modules.pop('s3_storage', None)
+
+
+def s3_error(code: str, status: int) -> S3Error:
+    return S3Error(SimpleNamespace(status=status), code, 'ошибка', '/bucket/file', None, None)
+
+
+@pytest.mark.parametrize('err, transient', [
+    (ConnectionError('refused'), True),
+    (TimeoutError('timeout'), True),
+    (ProtocolError('connection reset'), True),
+    (MaxRetryError(None, '/bucket/file'), True),
+    (s3_error('SlowDown', 503), True),
+    (s3_error('NotImplemented', 501), True),
+    (ServerError('bad gateway', 502), True),
+    (s3_error('NoSuchKey', 404), False),
+    (s3_error('AccessDenied', 403), False),
+    (TypeError('unexpected argument'), False),
+    (KeyError('name'), False),
+    (ValueError('bad value'), False),
+])
+def test_is_transient(s3_storage, err, transient):
+    assert s3_storage.is_transient(err) == transient
+
+
+def test_download_releases_connection_on_retry(s3_storage):
+    failed, ok = FakeResponse(ProtocolError('connection reset')), FakeResponse()
+    s3_storage.storage.client.responses = [failed, ok]
+    assert s3_storage.storage.download_file('file.csv') == (b'data', 200)
+    assert failed.closed and failed.released and ok.closed and ok.released
+
+
+def test_programming_error_is_not_retried(s3_storage):
+    response = FakeResponse(TypeError('unexpected argument'))
+    s3_storage.storage.client.responses = [response, FakeResponse()]
+    with pytest.raises(TypeError):
+        s3_storage.storage.download_file('file.csv')
+    assert response.released and len(s3_storage.storage.client.responses) == 1
+    assert s3_storage.s3.breaker.failures == 0
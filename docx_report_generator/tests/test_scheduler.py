@@ -0,0 +1,65 @@
+import scheduler
+from scheduler import AVG_ROW_BYTES, BASE_COST, INPUT_WEIGHTS, ReportScheduler
+
+SIZES = {1: {'cur_rk': 1000 * AVG_ROW_BYTES}, 2: {'cur_rk': 10 * AVG_ROW_BYTES}, 3: {'cur_rk': 100 * AVG_ROW_BYTES}}
+
+
+def plan_ids(planner: ReportScheduler, ids) -> list[int]:
+    return [report[0] for report in planner.plan([(report_id, 'тест') for report_id in ids], SIZES.__getitem__)]
+
+
+def test_estimate_cost_uses_input_weights():
+    cost = ReportScheduler.estimate_cost({'cur_rk': 10 * AVG_ROW_BYTES, 'org': 10 * AVG_ROW_BYTES})
+    assert cost == BASE_COST + 10 * INPUT_WEIGHTS['cur_rk'] + 10 * INPUT_WEIGHTS['org']
+
+
+def test_shortest_job_first(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+    assert plan_ids(ReportScheduler(aging_rate=0, batch_budget=0), [1, 2, 3]) == [2, 3, 1]
+
+
+def test_aging_promotes_waiting_report(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+    planner = ReportScheduler(aging_rate=10, batch_budget=0)
+    assert plan_ids(planner, [1, 2]) == [2, 1]
+    # отчеты ждут одинаково - порядок не меняется
+    clock.now += 1000
+    assert plan_ids(planner, [1, 2]) == [2, 1]
+    # отчёт 2 появился позже: за время ожидания приоритет отчёта 1 вырос больше разницы стоимостей
+    clock.now += 100
+    planner.first_seen[2] = clock.now
+    assert plan_ids(planner, [1, 2]) == [1, 2]
+
+
+def test_forgotten_reports_lose_waiting_time(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+    planner = ReportScheduler(aging_rate=10, batch_budget=0)
+    plan_ids(planner, [1, 2])
+    clock.now += 1000
+    plan_ids(planner, [2])
+    assert set(planner.first_seen) == {2}
+
+
+def test_batch_budget_defers_reports(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+    planner = ReportScheduler(aging_rate=0, batch_budget=2 * BASE_COST + 400)
+    assert plan_ids(planner, [1, 2, 3]) == [2, 3]
+    assert planner.deferred == 1
+
+
+def test_first_report_planned_even_over_budget(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+    planner = ReportScheduler(aging_rate=0, batch_budget=1)
+    assert plan_ids(planner, [1]) == [1]
+
+
+def test_size_error_uses_base_cost(monkeypatch, clock):
+    clock.install(monkeypatch, scheduler)
+
+    def sizes(report_id):
+        if report_id == 4:
+            raise IOError('нет доступа')
+        return SIZES[report_id]
+
+    planned = ReportScheduler(aging_rate=0, batch_budget=0).plan([(1, ''), (4, '')], sizes)
+    assert [report[0] for report in planned] == [4, 1]
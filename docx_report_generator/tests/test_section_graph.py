@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from section_graph import SectionGraph
+
+
+def make_graph(order: list, fail: str = None) -> SectionGraph:
+    lock = threading.Lock()
+
+    def task(name, *deps):
+        def func(results):
+            assert all(dep in results for dep in deps)
+            with lock:
+                order.append(name)
+            if name == fail:
+                raise RuntimeError(f'ошибка {name}')
+            return name.upper()
+        return func
+
+    graph = SectionGraph()
+    graph.add('input:a', task('input:a'))
+    graph.add('input:b', task('input:b'))
+    graph.add('section:x', task('section:x', 'input:a'), 'input:a')
+    graph.add('section:y', task('section:y', 'input:a', 'input:b'), 'input:a', 'input:b')
+    graph.add('charts:x', task('charts:x', 'section:x'), 'section:x')
+    return graph
+
+
+def test_sequential_run_follows_insertion_order():
+    order = []
+    results = make_graph(order).run()
+    assert order == ['input:a', 'input:b', 'section:x', 'section:y', 'charts:x']
+    assert results == {name: name.upper() for name in order}
+
+
+def test_parallel_run_respects_dependencies():
+    order = []
+    with ThreadPoolExecutor(4) as executor:
+        results = make_graph(order).run(executor)
+    assert sorted(results) == sorted(order) and len(order) == 5
+    assert order.index('section:x') < order.index('charts:x')
+    assert order.index('input:b') < order.index('section:y')
+
+
+@pytest.mark.parametrize('workers', [0, 4])
+def test_error_propagates_and_stops_dependents(workers):
+    order = []
+    graph = make_graph(order, fail='section:x')
+    with pytest.raises(RuntimeError, match='section:x'):
+        if workers:
+            with ThreadPoolExecutor(workers) as executor:
+                graph.run(executor)
+        else:
+            graph.run()
+    assert 'charts:x' not in order
+
+
+def test_unknown_dependency():
+    graph = SectionGraph()
+    with pytest.raises(ValueError, match='input:a'):
+        graph.add('section:x', lambda results: None, 'input:a')
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import sharding
+from sharding import HashRing, ShardRouter, stable_hash
+
+KEYS = range(10000)
+
+
+def test_stable_hash_is_deterministic():
+    # значение не зависит от процесса и запуска (в отличие от hash())
+    assert stable_hash('42') == 6319743179241711738
+    assert stable_hash('42') != stable_hash('43')
+
+
+def test_ring_is_independent_of_node_order():
+    first = HashRing(['a', 'b', 'c'], vnodes=64)
+    second = HashRing(['c', 'a', 'b', 'a'], vnodes=64)
+    assert all(first.owner(key) == second.owner(key) for key in KEYS)
+    assert HashRing([], vnodes=64).owner(1) is None
+
+
+def test_adding_node_moves_keys_only_to_new_node():
+    before = HashRing(['a', 'b', 'c'], vnodes=64)
+    after = HashRing(['a', 'b', 'c', 'd'], vnodes=64)
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    assert all(after.owner(key) == 'd' for key in moved)
+    # к новой реплике переходит около 1/4 ключей
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_keys_are_spread_across_nodes():
+    ring = HashRing(['a', 'b', 'c'], vnodes=64)
+    owners = [ring.owner(key) for key in KEYS]
+    assert all(0.2 < owners.count(node) / len(KEYS) < 0.47 for node in 'abc')
+
+
+def reports(router: ShardRouter, owned: bool, count: int, start: int = 0) -> list:
+    result = []
+    product_id = 0
+    while len(result) < count:
+        product_id += 1
+        if (router.ring.owner(product_id) == router.replica_id) == owned:
+            result.append(SimpleNamespace(id=start + len(result), product_id=product_id))
+    return result
+
+
+def test_select_own_reports(monkeypatch, clock):
+    clock.install(monkeypatch, sharding)
+    router = ShardRouter('a', ttl=30, vnodes=64, steal_after=60, steal_limit=2)
+    router.ring = HashRing(['a', 'b'], vnodes=64)
+    own, foreign = reports(router, True, 3), reports(router, False, 3, start=100)
+    assert router.select(own + foreign) == own
+
+
+def test_select_steals_waiting_reports(monkeypatch, clock):
+    clock.install(monkeypatch, sharding)
+    router = ShardRouter('a', ttl=30, vnodes=64, steal_after=60, steal_limit=2)
+    router.ring = HashRing(['a', 'b'], vnodes=64)
+    foreign = reports(router, False, 3)
+    assert router.select(foreign[1:]) == []
+    clock.now += 30
+    assert router.select(foreign) == []
+    # отчеты 1 и 2 ждут дольше steal_after, отчёт 0 появился позже
+    clock.now += 30
+    assert router.select(foreign) == foreign[1:]
+    # обработанные отчеты забываются
+    assert router.select(foreign[:1]) == []
+    assert set(router.first_seen) == {foreign[0].id}
@@ -0,0 +1,10 @@
+-- Профиль пунктов docx-отчёта (full, text, draft или пункты через запятую)
+
+ALTER TABLE campaign_stats.report ADD COLUMN IF NOT EXISTS sections text NULL;
+COMMENT ON COLUMN campaign_stats.report.sections IS 'Профиль пунктов docx-отчёта (full, text, draft или пункты через запятую)';
+
+-- Статус черновика отчёта (DRAFT_STATUS_ID): без него завершение черновика нарушает report_status_id_fkey
+INSERT INTO campaign_stats.status
+(id, "name", description)
+VALUES(6, 'draft ready', 'Сформирован черновик docx-отчета (без диаграмм), ожидает полной генерации')
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,11 @@
+-- Живые реплики генератора docx-отчетов (распределение отчетов по product_id)
+
+CREATE TABLE IF NOT EXISTS campaign_stats.worker_heartbeat (
+	replica_id text NOT NULL, -- Идентификатор реплики генератора docx-отчетов
+	heartbeat_at timestamp DEFAULT now() NOT NULL, -- Дата-время последней отметки о работе
+	CONSTRAINT worker_heartbeat_pkey PRIMARY KEY (replica_id)
+);
+COMMENT ON TABLE campaign_stats.worker_heartbeat IS 'Живые реплики генератора docx-отчетов (распределение отчетов по product_id)';
+
+COMMENT ON COLUMN campaign_stats.worker_heartbeat.replica_id IS 'Идентификатор реплики генератора docx-отчетов';
+COMMENT ON COLUMN campaign_stats.worker_heartbeat.heartbeat_at IS 'Дата-время последней отметки о работе';
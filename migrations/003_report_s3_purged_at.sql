@@ -0,0 +1,7 @@
+-- Отметка об удалении файлов удалённого отчёта из хранилища (S3Reaper)
+
+ALTER TABLE campaign_stats.report ADD COLUMN IF NOT EXISTS s3_purged_at timestamp NULL;
+COMMENT ON COLUMN campaign_stats.report.s3_purged_at IS 'Дата-время удаления файлов удалённого отчёта из хранилища';
+
+-- На больших таблицах индекс можно создать без блокировки записи: CREATE INDEX CONCURRENTLY (вне транзакции)
+CREATE INDEX IF NOT EXISTS idx_report_to_purge ON campaign_stats.report USING btree (id) WHERE (to_delete AND s3_purged_at IS NULL);
@@ -0,0 +1,50 @@
+-- Затраты ресурсов на обработку отчётов (USAGE_ACCOUNTING, accounting.py)
+
+CREATE TABLE IF NOT EXISTS campaign_stats.report_usage (
+	id int8 GENERATED ALWAYS AS IDENTITY( INCREMENT BY 1 MINVALUE 1 MAXVALUE 9223372036854775807 START 1 CACHE 1 NO CYCLE) NOT NULL, -- Уникальный идентификатор
+	report_id int8 NOT NULL, -- Айди отчёта
+	product_id int4 NULL, -- Айди продукта
+	replica_id text NULL, -- Идентификатор реплики генератора docx-отчетов
+	created_at timestamp DEFAULT now() NOT NULL, -- Дата-время обработки
+	profile text NULL, -- Профиль пунктов docx-отчёта
+	success bool NOT NULL, -- Отчёт сформирован и отправлен в хранилище
+	fetch_seconds float8 NULL, -- Время загрузки входных данных, сек
+	render_seconds float8 NULL, -- Время формирования docx-файла, сек
+	upload_seconds float8 NULL, -- Время отправки docx-файла в хранилище, сек
+	total_seconds float8 NULL, -- Общее время обработки, сек
+	cpu_seconds float8 NULL, -- Процессорное время, сек
+	peak_rss_bytes int8 NULL, -- Пиковый объём памяти (RSS) процесса при формировании, байт
+	input_bytes int8 NULL, -- Объём входных данных, байт
+	input_rows int8 NULL, -- Количество строк входных данных
+	action_rows int4 NULL, -- Количество строк текущей РК (действий)
+	chart_count int4 NULL, -- Количество диаграмм
+	output_bytes int8 NULL, -- Размер docx-файла, байт
+	overrun_seconds float8 NULL, -- Превышение ограничения времени формирования (REPORT_DEADLINE), сек
+	degraded_sections int4 NULL, -- Количество пунктов, упрощённых или пропущенных из-за нехватки времени
+	CONSTRAINT report_usage_pkey PRIMARY KEY (id),
+	CONSTRAINT report_usage_report_id_fkey FOREIGN KEY (report_id) REFERENCES campaign_stats.report(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_report_usage_created_at ON campaign_stats.report_usage USING btree (created_at);
+CREATE INDEX IF NOT EXISTS idx_report_usage_report_id ON campaign_stats.report_usage USING btree (report_id);
+COMMENT ON TABLE campaign_stats.report_usage IS 'Затраты ресурсов на обработку отчётов (одна запись на каждую обработку)';
+
+COMMENT ON COLUMN campaign_stats.report_usage.id IS 'Уникальный идентификатор';
+COMMENT ON COLUMN campaign_stats.report_usage.report_id IS 'Айди отчёта';
+COMMENT ON COLUMN campaign_stats.report_usage.product_id IS 'Айди продукта';
+COMMENT ON COLUMN campaign_stats.report_usage.replica_id IS 'Идентификатор реплики генератора docx-отчетов';
+COMMENT ON COLUMN campaign_stats.report_usage.created_at IS 'Дата-время обработки';
+COMMENT ON COLUMN campaign_stats.report_usage.profile IS 'Профиль пунктов docx-отчёта';
+COMMENT ON COLUMN campaign_stats.report_usage.success IS 'Отчёт сформирован и отправлен в хранилище';
+COMMENT ON COLUMN campaign_stats.report_usage.fetch_seconds IS 'Время загрузки входных данных, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.render_seconds IS 'Время формирования docx-файла, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.upload_seconds IS 'Время отправки docx-файла в хранилище, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.total_seconds IS 'Общее время обработки, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.cpu_seconds IS 'Процессорное время, сек';
+COMMENT ON COLUMN campaign_stats.report_usage.peak_rss_bytes IS 'Пиковый объём памяти (RSS) процесса при формировании, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.input_bytes IS 'Объём входных данных, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.input_rows IS 'Количество строк входных данных';
+COMMENT ON COLUMN campaign_stats.report_usage.action_rows IS 'Количество строк текущей РК (действий)';
+COMMENT ON COLUMN campaign_stats.report_usage.chart_count IS 'Количество диаграмм';
+COMMENT ON COLUMN campaign_stats.report_usage.output_bytes IS 'Размер docx-файла, байт';
+COMMENT ON COLUMN campaign_stats.report_usage.overrun_seconds IS 'Превышение ограничения времени формирования (REPORT_DEADLINE), сек';
+COMMENT ON COLUMN campaign_stats.report_usage.degraded_sections IS 'Количество пунктов, упрощённых или пропущенных из-за нехватки времени';